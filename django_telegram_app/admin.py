@@ -1,13 +1,140 @@
-"""Telegram admin."""
+"""Telegram admin.
 
-from django.contrib import admin
+The tables of this app grow large, so the admin avoids full table scans: the paginator estimates the number of rows,
+the list filters use indexed columns and the previews of the json fields are computed by the database.
+"""
 
-from django_telegram_app import get_telegram_settings_model
+from django.contrib import admin, messages
+from django.contrib.auth import get_permission_codename
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet, TextField
+from django.db.models.functions import Cast, Left
+from django.utils.functional import cached_property
+from django.utils.translation import gettext
+from django.utils.translation import gettext_lazy as _
+
+from django_telegram_app import get_telegram_settings_model, queue
+from django_telegram_app.bot import get_commands
 from django_telegram_app.conf import settings
-from django_telegram_app.models import CallbackData, Message
+from django_telegram_app.models import CallbackData, CallbackKeyboard, Message, TelegramFile
 
 TelegramSettingModel = get_telegram_settings_model()
 
+ESTIMATED_COUNT_THRESHOLD = 10000
+PREVIEW_LENGTH = 100
+REPROCESS_WORKERS = 4
+
+
+def get_estimated_count(queryset: QuerySet) -> int | None:
+    """Return the number of rows of the queryset's table according to the database statistics.
+
+    Return None if the queryset is filtered or the database keeps no estimate (only PostgreSQL and MySQL do).
+    """
+    if queryset.query.where:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+    elif connection.vendor == "mysql":
+        sql = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the database statistics instead of COUNT(*) for large, unfiltered tables.
+
+    Small tables and filtered querysets are still counted exactly.
+    """
+
+    @cached_property
+    def count(self) -> int:  # type: ignore[reportIncompatibleMethodOverride]  # A cached_property in Django itself
+        """Return the estimated number of rows if the table is large, the exact number otherwise."""
+        estimate = get_estimated_count(self.object_list)
+        if estimate is not None and estimate > ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
+
+
+class IntegerSearchMixin:
+    """Search an indexed integer column for exact matches.
+
+    Search terms that are not integers return no results instead of failing or casting the column to text, which
+    would prevent the use of its index.
+    """
+
+    integer_search_field: str
+
+    def get_search_results(self, request, queryset, search_term):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Return the rows whose integer search field equals the search term."""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        try:
+            value = int(search_term)
+        except ValueError:
+            return queryset.none(), False
+        return queryset.filter(**{self.integer_search_field: value}), False
+
+
+class OutcomeListFilter(admin.SimpleListFilter):
+    """Filter messages on whether they were handled successfully, using the indexed status column."""
+
+    title = _("outcome")
+    parameter_name = "outcome"
+
+    def lookups(self, request, model_admin):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Return the filter options."""
+        return [("ok", gettext("ok")), ("error", gettext("error"))]
+
+    def queryset(self, request, queryset):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Filter the messages on their status."""
+        if self.value() == "ok":
+            return queryset.filter(status=Message.Status.PROCESSED)
+        if self.value() == "error":
+            return queryset.filter(status=Message.Status.FAILED)
+        return queryset
+
+
+class CommandListFilter(admin.SimpleListFilter):
+    """Filter on the registered commands, instead of selecting the distinct values of the command column."""
+
+    title = _("command")
+    parameter_name = "command"
+
+    def lookups(self, request, model_admin):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Return the registered commands."""
+        return [(f"/{name}", f"/{name}") for name in sorted(get_commands())]
+
+    def queryset(self, request, queryset):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Filter on the selected command."""
+        if self.value():
+            return queryset.filter(command=self.value())
+        return queryset
+
+
+def truncate_preview(preview: str | None) -> str:
+    """Return the preview truncated to PREVIEW_LENGTH characters."""
+    if preview is None:
+        return ""
+    if len(preview) > PREVIEW_LENGTH:
+        return preview[: PREVIEW_LENGTH - 3] + "..."
+    return preview
+
+
+def json_preview(field_name: str) -> Left:
+    """Return an expression for the first characters of a json field as text.
+
+    One character more than PREVIEW_LENGTH is selected, so truncate_preview can tell whether the text was truncated.
+    """
+    return Left(Cast(field_name, output_field=TextField()), PREVIEW_LENGTH + 1)  # type: ignore[reportArgumentType]
+
 
 class TelegramSettingInline(admin.TabularInline):
     """Represent a telegram setting inline in the admin."""
@@ -15,14 +142,29 @@ class TelegramSettingInline(admin.TabularInline):
     model = TelegramSettingModel
 
 
-class TelegramSettingsAdmin(admin.ModelAdmin):
+class TelegramSettingsAdmin(IntegerSearchMixin, admin.ModelAdmin):
     """Represent the TelegramSettings admin."""
 
+    search_fields = ("chat_id",)
+    integer_search_field = "chat_id"
+
 
 class CallbackDataAdmin(admin.ModelAdmin):
     """Represent the CallbackData admin."""
 
-    list_display = ("token", "data_truncated")
+    list_display = ("token", "command", "data_preview", "created_at")
+    list_filter = (CommandListFilter, "created_at")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        """Compute the data preview in the database instead of loading the data."""
+        return super().get_queryset(request).defer("data").annotate(data_preview=json_preview("data"))
+
+    @admin.display(description=_("callback data"))
+    def data_preview(self, obj):
+        """Return the truncated data."""
+        return truncate_preview(obj.data_preview)
 
     def has_add_permission(self, request):  # noqa: ARG002  # pylint: disable=unused-argument
         """Do not allow to add callback_data."""
@@ -37,10 +179,86 @@ class CallbackDataAdmin(admin.ModelAdmin):
         return False
 
 
-class MessageAdmin(admin.ModelAdmin):
+class CallbackKeyboardAdmin(admin.ModelAdmin):
+    """Represent the CallbackKeyboard admin."""
+
+    list_display = ("key", "command", "created_at")
+
+    def has_add_permission(self, request):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Do not allow to add callback keyboards."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Do not allow to delete callback keyboards."""
+        return False
+
+    def has_change_permission(self, request, obj=None):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Do not allow to change callback keyboards."""
+        return False
+
+
+class TelegramFileAdmin(admin.ModelAdmin):
+    """Represent the TelegramFile admin."""
+
+    list_display = ("content_hash", "kind", "bot", "file_id", "created_at")
+    list_filter = ("kind", "bot")
+    search_fields = ("=content_hash",)
+
+    def has_add_permission(self, request):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Do not allow to add telegram files."""
+        return False
+
+    def has_change_permission(self, request, obj=None):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Do not allow to change telegram files."""
+        return False
+
+
+class MessageAdmin(IntegerSearchMixin, admin.ModelAdmin):
     """Represent the Message admin."""
 
-    list_display = ("update_id", "message_truncated", "error")
+    list_display = ("telegram_update_id", "message_preview", "status", "error", "created_at")
+    list_filter = (OutcomeListFilter, "status", "created_at")
+    search_fields = ("telegram_update_id",)
+    search_help_text = _("Search by update id.")
+    integer_search_field = "telegram_update_id"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ["reprocess_failed"]
+
+    def get_queryset(self, request):
+        """Compute the message preview in the database instead of loading the raw message."""
+        return super().get_queryset(request).defer("raw_message").annotate(message_preview=json_preview("raw_message"))
+
+    @admin.display(description=_("raw message"))
+    def message_preview(self, obj):
+        """Return the truncated raw message."""
+        return truncate_preview(obj.message_preview)
+
+    @admin.action(description=_("Reprocess selected failed messages"), permissions=["reprocess"])
+    def reprocess_failed(self, request, queryset):
+        """Handle the selected failed messages again.
+
+        If `QUEUE_UPDATES` is enabled, the messages are made pending again for the workers. Otherwise they are handled
+        right away, in parallel per chat.
+        """
+        if settings.QUEUE_UPDATES:
+            count = queryset.filter(status=Message.Status.FAILED).update(
+                status=Message.Status.PENDING, claimed_at=None, attempts=0
+            )
+            self.message_user(request, _("Queued %(count)d messages for reprocessing.") % {"count": count})
+            return
+        processed, failed = queue.reprocess_failed(queryset, workers=REPROCESS_WORKERS)
+        self.message_user(
+            request,
+            _("Reprocessed %(total)d messages, %(failed)d failed again.")
+            % {"total": processed + failed, "failed": failed},
+            level=messages.WARNING if failed else messages.SUCCESS,
+        )
+
+    def has_reprocess_permission(self, request):
+        """Allow users that may change messages to reprocess them, even though messages are read-only."""
+        codename = get_permission_codename("change", self.opts)
+        return request.user.has_perm(f"{self.opts.app_label}.{codename}")
 
     def has_add_permission(self, request):  # noqa: ARG002  # pylint: disable=unused-argument
         """Do not allow to add messages."""
@@ -56,6 +274,8 @@ class MessageAdmin(admin.ModelAdmin):
 
 
 admin.site.register(CallbackData, CallbackDataAdmin)
+admin.site.register(CallbackKeyboard, CallbackKeyboardAdmin)
 admin.site.register(Message, MessageAdmin)
+admin.site.register(TelegramFile, TelegramFileAdmin)
 if settings.REGISTER_DEFAULT_ADMIN:
     admin.site.register(TelegramSettingModel, TelegramSettingsAdmin)
@@ -11,5 +11,11 @@ class TelegramConfig(AppConfig):
     label = "django_telegram_app"
 
     def ready(self):
-        """Import checks."""
+        """Import checks and warm up if `WARMUP_ON_READY` is enabled."""
         import django_telegram_app.checks  # noqa: F401
+        from django_telegram_app.conf import settings
+
+        if settings.WARMUP_ON_READY:
+            from django_telegram_app.bot.warmup import warmup
+
+            warmup(connect=False)  # Connections must not be shared with processes forked later
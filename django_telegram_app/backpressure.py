@@ -0,0 +1,148 @@
+"""Protect the webhook against overload.
+
+When the database or the Bot API is slow, updates pile up in the web workers until every worker is stuck. Past the
+in-flight limits, the webhook refuses updates with a retryable status instead, so Telegram backs off and delivers them
+again later. The in-flight limits apply per process.
+
+Senders that flood the bot with updates are throttled: past `FLOOD_RATE_LIMIT` updates per `FLOOD_WINDOW` seconds,
+their updates are dropped before any database work. The counters are kept in the cache configured by `CACHE_ALIAS`,
+so they are shared by all processes that use the same cache.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+import time
+
+import requests
+from django.core.cache import caches
+
+from django_telegram_app.bot import bot, resilience
+from django_telegram_app.conf import settings
+
+CHAT_UPDATE_KEYS = ("message", "edited_message", "channel_post", "edited_channel_post")
+GROUP_CHAT_TYPES = ("group", "supergroup")
+FLOOD_KEY_PREFIX = "django_telegram_app:flood"
+
+
+class InFlightLimiter:
+    """Count the updates in flight, in total and per chat, and refuse updates past the limits.
+
+    A limit of None means no limit.
+    """
+
+    def __init__(self, limit: int | None = None, per_chat_limit: int | None = None):
+        """Initialize the limiter."""
+        self.limit = limit
+        self.per_chat_limit = per_chat_limit
+        self.in_flight = 0
+        self.shed = 0
+        self._per_chat: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, chat_id: int | None = None) -> bool:
+        """Admit an update of the given chat and return True, or count it as shed and return False."""
+        with self._lock:
+            chat_in_flight = self._per_chat.get(chat_id, 0) if chat_id is not None else 0
+            if (self.limit is not None and self.in_flight >= self.limit) or (
+                self.per_chat_limit is not None and chat_in_flight >= self.per_chat_limit
+            ):
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            if chat_id is not None:
+                self._per_chat[chat_id] = chat_in_flight + 1
+            return True
+
+    def release(self, chat_id: int | None = None):
+        """Mark an admitted update of the given chat as finished."""
+        with self._lock:
+            self.in_flight -= 1
+            if chat_id is None:
+                return
+            if self._per_chat[chat_id] > 1:
+                self._per_chat[chat_id] -= 1
+            else:
+                del self._per_chat[chat_id]
+
+    def get_stats(self) -> dict[str, int]:
+        """Return the number of updates in flight, of chats with updates in flight and of updates shed so far."""
+        with self._lock:
+            return {"in_flight": self.in_flight, "chats_in_flight": len(self._per_chat), "shed": self.shed}
+
+
+@functools.cache
+def get_limiter() -> InFlightLimiter:
+    """Return the limiter of the webhook, configured by `WEBHOOK_MAX_IN_FLIGHT` and its per chat variant."""
+    return InFlightLimiter(settings.WEBHOOK_MAX_IN_FLIGHT, settings.WEBHOOK_MAX_IN_FLIGHT_PER_CHAT)
+
+
+def get_chat_id(update: object) -> int | None:
+    """Return the id of the chat of the update without validating it, or None if the update has no chat.
+
+    The update is the parsed request body, which is not necessarily a dict.
+    """
+    try:
+        return int(_get_chat(update)["id"])  # type: ignore[index]
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def get_sender_id(update: dict) -> int | None:
+    """Return the id of whoever sent the update: the user in groups, the chat otherwise, or None if unknown."""
+    chat = _get_chat(update)
+    if isinstance(chat, dict) and chat.get("type") in GROUP_CHAT_TYPES:
+        sender = update.get("callback_query") or next((update[key] for key in CHAT_UPDATE_KEYS if key in update), {})
+        try:
+            return int(sender["from"]["id"])
+        except (TypeError, KeyError, ValueError):
+            pass
+    return get_chat_id(update)
+
+
+def is_throttled(update: dict, bot_name: str) -> bool:
+    """Count the update for its sender and return whether the sender exceeds `FLOOD_RATE_LIMIT`.
+
+    Only the cache is used, so throttled updates are cheap to drop. The first throttled update of a window gets the
+    `FLOOD_REPLY_TEXT`, if it is set.
+    """
+    sender_id = get_sender_id(update)
+    if settings.FLOOD_RATE_LIMIT is None or sender_id is None:
+        return False
+    window = settings.FLOOD_WINDOW
+    key = f"{FLOOD_KEY_PREFIX}:{bot_name}:{sender_id}:{int(time.time() // window)}"
+    cache = caches[settings.CACHE_ALIAS]
+    cache.add(key, 0, window)
+    try:
+        count = cache.incr(key)
+    except ValueError:  # The key expired in the meantime
+        cache.set(key, 1, window)
+        count = 1
+    if count <= settings.FLOOD_RATE_LIMIT:
+        return False
+    if count == settings.FLOOD_RATE_LIMIT + 1:
+        logging.warning(f"Throttling updates of {sender_id} for bot {bot_name}")
+        _send_flood_reply(update, bot_name)
+    return True
+
+
+def _send_flood_reply(update: dict, bot_name: str):
+    chat_id = get_chat_id(update)
+    if not settings.FLOOD_REPLY_TEXT or chat_id is None:
+        return
+    with bot.use_bot(bot_name):
+        try:
+            bot.send_message(str(settings.FLOOD_REPLY_TEXT), chat_id)
+        except (requests.RequestException, resilience.CircuitOpenError) as exc:
+            logging.warning(f"Could not send the flood reply to chat {chat_id}: {exc!r}")
+
+
+def _get_chat(update: object) -> dict | None:
+    if not isinstance(update, dict):
+        return None
+    message = next((update[key] for key in CHAT_UPDATE_KEYS if isinstance(update.get(key), dict)), None)
+    if message is None and isinstance(update.get("callback_query"), dict):
+        message = update["callback_query"].get("message")
+    return message.get("chat") if isinstance(message, dict) else None
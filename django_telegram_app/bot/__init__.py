@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import functools
+import json
 import pkgutil
 from importlib import import_module
 from pathlib import Path
@@ -10,9 +11,13 @@ from typing import TYPE_CHECKING
 
 from django.apps import apps
 from django.conf import settings
+from django.utils.translation import override
+
+from django_telegram_app.conf import settings as app_settings
 
 if TYPE_CHECKING:
     from django_telegram_app.bot.base import BaseBotCommand
+    from django_telegram_app.conf import BotSettings
     from django_telegram_app.models import AbstractTelegramSettings
 
 
@@ -49,6 +54,9 @@ def get_commands():
 
     All user-defined commands from the specified settings module are included.
 
+    If the `COMMAND_MANIFEST` setting is configured, the commands are read from the manifest instead, which avoids
+    scanning the filesystem. See the `buildcommandmanifest` management command.
+
     The dictionary is in the format {command_name: app_name}. Key-value
     pairs from this dictionary can then be used in calls to
     load_command_class(app_name, command_name)
@@ -60,8 +68,56 @@ def get_commands():
     if not settings.configured:
         return commands
 
+    if app_settings.COMMAND_MANIFEST:
+        return {name: info["app"] for name, info in load_command_manifest().items()}
+    return discover_commands()
+
+
+def get_bot_commands(bot_settings: BotSettings) -> dict[str, str]:
+    """Return the commands available to the given bot, in the same format as get_commands().
+
+    If the bot's COMMANDS setting is None, all commands are available.
+    """
+    commands = get_commands()
+    if bot_settings.COMMANDS is None:
+        return commands
+    return {name: app_name for name, app_name in commands.items() if name in bot_settings.COMMANDS}
+
+
+def discover_commands() -> dict[str, str]:
+    """Scan the telegrambot.commands package of each installed application and return {command_name: app_name}."""
+    commands: dict[str, str] = {}
     for app_config in apps.get_app_configs():
         path = Path(app_config.path) / "telegrambot"
         commands.update({name: app_config.name for name in find_commands(path)})
-
     return commands
+
+
+def build_command_manifest() -> dict[str, dict]:
+    """Discover and import all commands and return their metadata, keyed by command name.
+
+    Descriptions are stored untranslated, so they can be translated when they are used.
+    """
+    manifest = {}
+    with override(None):
+        for name, app_name in discover_commands().items():
+            command = get_command_class(app_name, name)
+            manifest[name] = {
+                "app": app_name,
+                "class": f"{command.__module__}.{command.__qualname__}",
+                "command": command.get_command_string(),
+                "description": str(command.description),
+                "exclude_from_help": command.exclude_from_help,
+                "translate": command.translate,
+            }
+    return manifest
+
+
+@functools.cache
+def load_command_manifest() -> dict[str, dict]:
+    """Return the command metadata from the manifest configured in `COMMAND_MANIFEST`.
+
+    The manifest is read on the first call and reused on subsequent calls.
+    """
+    with open(app_settings.COMMAND_MANIFEST, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)["commands"]
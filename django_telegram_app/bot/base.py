@@ -5,20 +5,38 @@ telegrambot commands are named commands which can execute operations in response
 
 from __future__ import annotations
 
+import functools
 import logging
 import uuid
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
 from contextlib import nullcontext
 from typing import TYPE_CHECKING, Any, cast
 
+from django.db import router, transaction
+from django.utils.translation import get_language, gettext_lazy, override
 from django.utils.translation import gettext as _
-from django.utils.translation import override
 
-from django_telegram_app.models import CallbackData
+from django_telegram_app.bot import callbackcache
+from django_telegram_app.bot.callbacks import (
+    KEYBOARD_TOKEN_SEPARATOR,
+    delete_correlated_callbacks,
+    get_keyboard_key,
+    get_keyboard_token,
+    resolve_callback,
+)
+from django_telegram_app.bot.unitofwork import get_unit_of_work, save_settings
+from django_telegram_app.conf import DEFAULT_BOT
+from django_telegram_app.models import CallbackData, CallbackKeyboard
 
 if TYPE_CHECKING:
     from django_telegram_app.models import AbstractTelegramSettings
 
+BOT_STATE_PREFIX = "_bot:"
+
+# The reply markup of static keyboards, keyed by bot, command string, step name and language, see
+# Step.get_static_reply_markup
+_static_reply_markups: dict[tuple[str, str, str, str | None], dict[str, Any]] = {}
+
 
 class BaseBotCommand:
     """Represent a base Telegram bot command.
@@ -81,18 +99,56 @@ class BaseBotCommand:
         return current_step(telegram_update)
 
     def create_callback(self, step_name: str, action: str, **kwargs):
-        """Create callback data for the current command and return the token."""
+        """Create callback data for the current command and return the token.
+
+        Within a unit of work, the callback data is inserted when the unit of work is flushed.
+        """
         if not kwargs:
             kwargs = self._get_default_callback_data()
         if "correlation_key" not in kwargs:
             kwargs.update(self._get_default_callback_data())
-        callback_data = CallbackData(command=self.get_command_string(), step=step_name, action=action, data=kwargs)
-        callback_data.save()
+        callback_data = CallbackData(
+            command=self.get_command_string(),
+            step=step_name,
+            action=action,
+            data=kwargs,
+            correlation_key=kwargs["correlation_key"],
+        )
+        work = get_unit_of_work()
+        if work is None:
+            callback_data.save()
+            callbackcache.add(callbacks=[callback_data])
+        else:
+            work.add_callback(callback_data)
         return str(callback_data.token)
 
+    def create_callback_keyboard(self, data: dict[str, Any], buttons: list[dict[str, Any]]):
+        """Store the callback data of a keyboard's buttons and return the keyboard's key.
+
+        An identical keyboard is stored only once, rendering it again reuses the existing row.
+        """
+        command = self.get_command_string()
+        key = get_keyboard_key(command, data, buttons)
+        defaults = {
+            "command": command,
+            "data": data,
+            "buttons": buttons,
+            "correlation_key": data.get("correlation_key"),
+        }
+        work = get_unit_of_work()
+        if work is None:
+            keyboard, _created = CallbackKeyboard.objects.get_or_create(key=key, defaults=defaults)
+            callbackcache.add(keyboards=[keyboard])
+        else:
+            work.add_keyboard(CallbackKeyboard(key=key, **defaults))
+        return key
+
     def get_callback(self, token: str):
-        """Return the callback for the given token."""
-        return CallbackData.objects.get(token=token)
+        """Return the callback for the given token.
+
+        Raise CallbackData.DoesNotExist if the token does not refer to any callback data.
+        """
+        return resolve_callback(token)
 
     def get_callback_data(self, callback_token: str) -> dict[str, Any]:
         """Get callback data from the callback token.
@@ -127,15 +183,23 @@ class BaseBotCommand:
         return {"correlation_key": str(uuid.uuid4())}
 
     def _clear_state(self):
-        """Clear the command state."""
-        self.settings.data = {}
-        self.settings.save()
+        """Clear the command state of the current bot, the state of other bots is kept."""
+        from django_telegram_app.bot.bot import get_current_bot
+
+        bot_name = get_current_bot().name
+        if bot_name == DEFAULT_BOT:
+            self.settings.data = {k: v for k, v in self.settings.data.items() if k.startswith(BOT_STATE_PREFIX)}
+        else:
+            self.settings.data.pop(f"{BOT_STATE_PREFIX}{bot_name}", None)
+        save_settings(self.settings)
 
     def _clear_callback_data(self, telegram_update: TelegramUpdate):
-        """Clear callback data for the current command."""
-        step_data = self.get_callback_data(telegram_update.callback_data)
-        correlation_key = step_data.get("correlation_key", "non_existent_key")
-        CallbackData.objects.filter(data__correlation_key=correlation_key).delete()
+        """Clear callback data for the current command.
+
+        All callback data sharing the correlation key of the update's callback token is deleted.
+        """
+        if telegram_update.callback_data:
+            delete_correlated_callbacks(telegram_update.callback_data)
 
     def _steps_to_str(self):
         return [step.name for step in self.steps]
@@ -147,6 +211,10 @@ class Step:
     This is the base class for all user-defined steps.
     """
 
+    offload_result_key: str = "result"
+    offload_working_text: str = gettext_lazy("Working…")
+    offload_error_text: str = gettext_lazy("Something went wrong, please try again.")
+
     def __init__(self, command: BaseBotCommand, unique_id: str | None = None, translate: bool | None = None):
         """Initialize the step.
 
@@ -199,32 +267,98 @@ class Step:
         """Get callback data from the telegram_update.
 
         If the update is a message and not a command, check if we are waiting for user input.
-        If so, retrieve the callback data using the waiting_for token and store the message text
-        in the appropriate key in the callback data.
+        If so, retrieve the callback data using the waiting_for token and store the message text in the appropriate key
+        in the callback data. If the waiting step accepts files, the file the user sent is stored instead.
 
         Otherwise, retrieve the callback data using the callback token from the update.
         If no callback token is provided, return default callback data.
         """
         if not telegram_update.callback_data and telegram_update.is_message() and not telegram_update.is_command():
-            waiting_for = self.command.settings.data.get("_waiting_for", None)
+            waiting_for = get_conversation_state(self.command.settings).get("_waiting_for", None)
             if waiting_for:
                 callback_token = waiting_for
                 callback_data = self.command.get_callback_data(callback_token)
-                key = callback_data["_message_key"]  # Move the message_text to this key
-                callback_data[key] = telegram_update.message_text.strip()
+                key = callback_data["_message_key"]  # Move the message_text or the sent file to this key
+                if telegram_update.file and callback_data.get("_accepts_files"):
+                    callback_data[key] = telegram_update.file
+                else:
+                    callback_data[key] = telegram_update.message_text.strip()
                 return callback_data
 
         callback_token = telegram_update.callback_data
         return self.command.get_callback_data(callback_token)
 
-    def add_waiting_for(self, message_key: str, data: dict[str, Any] | None = None):
+    def create_keyboard(self, data: dict[str, Any] | None = None):
+        """Return an InlineKeyboard for this step whose buttons share the provided data."""
+        return InlineKeyboard(self, data)
+
+    def build_static_keyboard(self, keyboard: StaticKeyboard):
+        """Add the rows of the step's static keyboard to the keyboard, see get_static_reply_markup."""
+        raise NotImplementedError("Steps with a static keyboard must override this method.")
+
+    def get_static_reply_markup(self) -> dict[str, Any]:
+        """Return the reply markup of the step's static keyboard, built by build_static_keyboard.
+
+        A static keyboard is the same for every chat, like a main menu. Its buttons carry no conversation data, so their
+        tokens are shared by all chats and never expire. The keyboard is stored the first time it is rendered and its
+        reply markup is cached per process, bot and language once that is committed, so rendering it again costs no
+        database queries. The returned reply markup is shared and must not be modified.
+        """
+        from django_telegram_app.bot.bot import get_current_bot
+
+        cache_key = (get_current_bot().name, self.command.get_command_string(), self.name, get_language())
+        reply_markup = _static_reply_markups.get(cache_key)
+        if reply_markup is None:
+            keyboard = StaticKeyboard(self)
+            self.build_static_keyboard(keyboard)
+            reply_markup = keyboard.to_reply_markup()
+            transaction.on_commit(
+                functools.partial(_static_reply_markups.__setitem__, cache_key, reply_markup),
+                using=router.db_for_write(CallbackKeyboard),
+            )
+        return reply_markup
+
+    def add_waiting_for(self, message_key: str, data: dict[str, Any] | None = None, accepts_files: bool = False):
         """Add waiting_for to the command settings.
 
         The message_key will be used to store the user input in the callback data of the next step.
+        If accepts_files is True, a document or photo the user sends is stored instead of the text, see
+        `TelegramUpdate.file`. Otherwise files are answered with a request to send text and the step keeps waiting.
         """
         data = data or {}
-        self.command.settings.data["_waiting_for"] = self.next_step_callback(data, _message_key=message_key)
-        self.command.settings.save()
+        extra = {"_accepts_files": True} if accepts_files else {}
+        state = get_conversation_state(self.command.settings)
+        state["_waiting_for"] = self.next_step_callback(data, _message_key=message_key, **extra)
+        save_settings(self.command.settings)
+
+    def offload(self, telegram_update: TelegramUpdate, fn: Callable[..., Any], *args, **kwargs):
+        """Run fn(*args, **kwargs) in the offload executor and continue with the next step when it is done.
+
+        Use this for work that takes longer than Telegram waits for the webhook, like rendering charts. The work starts
+        once the update is committed. Meanwhile the clicked message (or a new message) shows offload_working_text and
+        the chat shows a typing indicator. The next step receives the result under offload_result_key in its callback
+        data and edits the working message when it passes telegram_update.message_id to send_message.
+
+        The result must be JSON serializable. With the "process" executor, fn and its arguments must be picklable.
+        """
+        from django_telegram_app.bot import offload
+        from django_telegram_app.bot.bot import get_current_bot
+
+        data = self.get_callback_data(telegram_update)
+        job = offload.OffloadJob(
+            bot_name=get_current_bot().name,
+            chat_id=self.command.settings.chat_id,
+            message_id=telegram_update.message_id,
+            language_code=telegram_update.language_code,
+            token=self.next_step_callback(data),
+            result_key=self.offload_result_key,
+            working_text=str(self.offload_working_text),
+            error_text=str(self.offload_error_text),
+            fn=fn,
+            args=args,
+            kwargs=kwargs,
+        )
+        offload.submit(job)
 
     @property
     def name(self):
@@ -238,6 +372,217 @@ class Step:
         return self.command.create_callback(self.name, action, **data)
 
 
+def get_conversation_state(telegram_settings: AbstractTelegramSettings) -> dict[str, Any]:
+    """Return the conversation state of the current bot, stored in the telegram settings' data, for updating in place.
+
+    Bots share the telegram settings of a chat. The state of the default bot is stored in the data itself, that of
+    every other bot under "_bot:<name>", so bots never consume or clear each other's conversations.
+    """
+    from django_telegram_app.bot.bot import get_current_bot
+
+    bot_name = get_current_bot().name
+    if bot_name == DEFAULT_BOT:
+        return telegram_settings.data
+    return telegram_settings.data.setdefault(f"{BOT_STATE_PREFIX}{bot_name}", {})
+
+
+def offloaded(method: Callable[[Any, dict[str, Any]], Any]) -> Callable[..., None]:
+    """Turn a method computing a result from the callback data into a handle() that runs it with Step.offload.
+
+    Example:
+        class BuildReport(Step):
+            @offloaded
+            def handle(self, data):
+                return render_report(data["period"])
+
+    The callback data is read before the work is offloaded, the method itself should not use the database.
+    With the "process" executor, use Step.offload with a module-level function instead.
+    """
+
+    @functools.wraps(method)
+    def handle(self: Step, telegram_update: TelegramUpdate):
+        self.offload(telegram_update, method, self, self.get_callback_data(telegram_update))
+
+    return handle
+
+
+class InlineKeyboard:
+    """Build an inline keyboard whose callback data is stored in a single CallbackKeyboard row.
+
+    The shared data is stored once for the whole keyboard, each button only stores the data passed to it.
+    Buttons receive compact "<key>:<index>" tokens instead of a CallbackData row each.
+
+    Example:
+        keyboard = self.create_keyboard(data)
+        keyboard.add_row(keyboard.next_step_button("✅ Yes", confirmed=True))
+        keyboard.add_row(keyboard.cancel_button("❌ No"))
+        bot.send_message(text, chat_id, reply_markup=keyboard.to_reply_markup())
+    """
+
+    def __init__(self, step: Step, data: dict[str, Any] | None = None):
+        """Initialize the keyboard.
+
+        Args:
+            step: The step the buttons belong to.
+            data: The data shared by all buttons. A correlation key is added if it is missing.
+        """
+        self.step = step
+        self.data = dict(data or {})
+        if "correlation_key" not in self.data:
+            self.data.update(step.command._get_default_callback_data())
+        self.rows: list[list[dict[str, Any]]] = []
+        self._buttons: list[dict[str, Any]] = []
+
+    def add_row(self, *buttons: dict[str, Any]):
+        """Add a row of buttons to the keyboard.
+
+        Buttons can be created with the *_button methods or be plain inline keyboard buttons (e.g. url buttons).
+        """
+        self.rows.append(list(buttons))
+
+    def button(self, text: str, action: str, **kwargs):
+        """Return a button that calls the given action of the command, with the shared data updated by kwargs."""
+        self._buttons.append({"step": self.step.name, "action": action, "data": kwargs})
+        return {"text": text, "_button_index": len(self._buttons) - 1}
+
+    def next_step_button(self, text: str, **kwargs):
+        """Return a button to advance to the next step."""
+        return self.button(text, "next_step", **kwargs)
+
+    def previous_step_button(self, text: str, steps_back: int, **kwargs):
+        """Return a button to return to the previous step."""
+        return self.button(text, "previous_step", _steps_back=steps_back, **kwargs)
+
+    def current_step_button(self, text: str, **kwargs):
+        """Return a button to reload the current step."""
+        return self.button(text, "current_step", **kwargs)
+
+    def cancel_button(self, text: str, **kwargs):
+        """Return a button to cancel the command."""
+        return self.button(text, "cancel", **kwargs)
+
+    def to_reply_markup(self):
+        """Store the keyboard and return it as reply markup."""
+        key = self.step.command.create_callback_keyboard(self.data, self._buttons) if self._buttons else ""
+        inline_keyboard = [[self._render_button(button, key) for button in row] for row in self.rows]
+        return {"inline_keyboard": inline_keyboard}
+
+    @staticmethod
+    def _render_button(button: dict[str, Any], key: str):
+        if "_button_index" not in button:
+            return button
+        rendered = {k: v for k, v in button.items() if k != "_button_index"}
+        rendered["callback_data"] = get_keyboard_token(key, button["_button_index"])
+        return rendered
+
+
+class StaticKeyboard(InlineKeyboard):
+    """Build an inline keyboard that is shared by all chats, see Step.get_static_reply_markup.
+
+    The buttons store no shared data and no correlation key, only the data passed to them. Finishing a conversation
+    does not delete a static keyboard, and a step reached through one of its buttons starts a new conversation.
+
+    Example:
+        class MainMenu(Step):
+            def build_static_keyboard(self, keyboard):
+                keyboard.add_row(keyboard.next_step_button(_("⚙️ Settings"), menu="settings"))
+                keyboard.add_row(keyboard.next_step_button(_("❓ Help"), menu="help"))
+
+            def handle(self, telegram_update):
+                bot.send_message(_("Main menu"), self.command.settings.chat_id, reply_markup=self.get_static_reply_markup())
+    """
+
+    def __init__(self, step: Step):
+        """Initialize the keyboard without shared data."""
+        super().__init__(step)
+        self.data = {}
+
+
+class PaginatedChoiceStep(Step):
+    """Let the user pick one of a long list of choices, one page at a time.
+
+    The choices are stored once per conversation, in a single CallbackKeyboard row shared by all pages. The buttons
+    receive "<key>:<index>:<argument>" tokens holding the page or the index of the choice, so turning a page stores
+    nothing. The value of the chosen option is passed to the next step under choice_key.
+
+    Example:
+        class AskSport(PaginatedChoiceStep):
+            choice_key = "sport"
+
+            def get_choices(self, data):
+                return [(sport.name, sport.pk) for sport in Sport.objects.order_by("name")]
+
+            def get_text(self, data):
+                return "What is your favourite sport?"
+    """
+
+    choice_key: str = "choice"
+    page_size: int = 5
+    previous_page_text: str = gettext_lazy("⬅️ Back")
+    next_page_text: str = gettext_lazy("➡️ Next")
+
+    page_key = "_page"
+    choices_key = "_choices"
+
+    def get_choices(self, data: dict[str, Any]) -> Sequence[tuple[str, Any]]:
+        """Return the (text, value) pairs to choose from. Called once, when the step is entered."""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def get_text(self, data: dict[str, Any]) -> str:
+        """Return the text of the message above the choices."""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def handle(self, telegram_update: TelegramUpdate):
+        """Send the page of choices the user asked for, or the first page when the step is entered."""
+        from django_telegram_app.bot.bot import send_message
+
+        data = self.get_callback_data(telegram_update)
+        page = data.pop(self.page_key, None)
+        token = telegram_update.callback_data or ""
+        if page is None or self.choices_key not in data or KEYBOARD_TOKEN_SEPARATOR not in token:
+            data.pop(self.choice_key, None)  # Remove any previous selection
+            data[self.choices_key] = [[text, value] for text, value in self.get_choices(data)]
+            key = self.command.create_callback_keyboard(data, self._get_buttons())
+            page = 0
+        else:
+            key = token.partition(KEYBOARD_TOKEN_SEPARATOR)[0]  # Same keyboard, only the page differs
+        send_message(
+            self.get_text(data),
+            self.command.settings.chat_id,
+            reply_markup=self._get_reply_markup(key, data[self.choices_key], page),
+            message_id=telegram_update.message_id,
+        )
+
+    def _get_buttons(self):
+        """Return the two stored buttons: one to turn the page and one to choose."""
+        return [
+            {"step": self.name, "action": "current_step", "data": {}, "parameter": {"key": self.page_key}},
+            {
+                "step": self.name,
+                "action": "next_step",
+                "data": {},
+                "parameter": {"key": self.choice_key, "choices": self.choices_key},
+            },
+        ]
+
+    def _get_reply_markup(self, key: str, choices: list[list[Any]], page: int):
+        start = page * self.page_size
+        end = start + self.page_size
+        inline_keyboard = [
+            [{"text": text, "callback_data": get_keyboard_token(key, 1, index)}]
+            for index, (text, _value) in enumerate(choices[start:end], start=start)
+        ]
+        if page > 0:
+            inline_keyboard.append(
+                [{"text": str(self.previous_page_text), "callback_data": get_keyboard_token(key, 0, page - 1)}]
+            )
+        if len(choices) > end:
+            inline_keyboard.append(
+                [{"text": str(self.next_page_text), "callback_data": get_keyboard_token(key, 0, page + 1)}]
+            )
+        return {"inline_keyboard": inline_keyboard}
+
+
 class TelegramUpdate:
     """Represent a normalized Telegram update."""
 
@@ -246,10 +591,14 @@ class TelegramUpdate:
         self.message = cast(dict | None, update.get("message"))
         self.callback_query = cast(dict | None, update.get("callback_query"))
 
-        if self.message and "text" in self.message:
+        self.document = cast(dict | None, self.message.get("document")) if self.message else None
+        photo_sizes = self.message.get("photo") if self.message else None
+        self.photo = cast(dict | None, photo_sizes[-1]) if photo_sizes else None  # The largest size
+
+        if self.message and ("text" in self.message or self.document or self.photo):
             self.chat_id = int(self.message["chat"]["id"])
             self.message_id = 0
-            self.message_text = str(self.message["text"])
+            self.message_text = str(self.message.get("text", self.message.get("caption", "")))
             self.callback_data = ""
             self.language_code = str(self.message.get("from", {}).get("language_code", "")) or None
         elif self.callback_query:
@@ -272,3 +621,11 @@ class TelegramUpdate:
     def is_command(self):
         """Check if the update is a command."""
         return self.is_message() and self.message_text.startswith("/")
+
+    @property
+    def file(self) -> dict | None:
+        """Return the document or the largest size of the photo the user sent, if any.
+
+        Pass it to `django_telegram_app.bot.media.download_file` to download the file.
+        """
+        return self.document or self.photo
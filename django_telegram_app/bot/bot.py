@@ -2,16 +2,35 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import functools
+import itertools
+import logging
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, TypeVar
 
 import requests
+from django.db.models import QuerySet
 from django.utils.module_loading import import_string
-from django.utils.translation import override
-
-from django_telegram_app import get_telegram_settings_model
-from django_telegram_app.bot import get_commands, load_command_class
-from django_telegram_app.bot.base import TelegramUpdate
-from django_telegram_app.conf import settings
+from django.utils.translation import gettext, override
+from requests.adapters import HTTPAdapter
+
+from django_telegram_app import backpressure, get_telegram_settings_model, routers
+from django_telegram_app.bot import (
+    clicks,
+    get_bot_commands,
+    load_command_class,
+    load_command_manifest,
+    resilience,
+    unitofwork,
+)
+from django_telegram_app.bot.base import TelegramUpdate, get_conversation_state
+from django_telegram_app.bot.callbacks import resolve_callback
+from django_telegram_app.conf import DEFAULT_BOT, BotSettings, settings
 from django_telegram_app.models import CallbackData
 
 if TYPE_CHECKING:
@@ -19,23 +38,209 @@ if TYPE_CHECKING:
 
 DO_NOTHING = "noop"
 
+T = TypeVar("T")
+
+
+class MessageBuffer:
+    """Collect outbound messages, keeping only the final state of each edited message.
+
+    Edits are keyed by (chat_id, message_id), so a later edit of the same message replaces the earlier one. The final
+    edit is sent in the position of the last edit, so calls are sent in the order the user would have seen them.
+    New messages and deferred calls, such as media uploads, are always kept, in the order they were sent.
+    """
+
+    def __init__(self):
+        """Initialize an empty buffer."""
+        self._calls: dict[tuple, tuple[str, dict] | Callable[[], object]] = {}
+        self._counter = itertools.count()
+
+    def add(self, endpoint: str, payload: dict):
+        """Add a call to the buffer."""
+        if endpoint == "editMessageText":
+            key = (endpoint, payload["chat_id"], payload["message_id"])
+        else:
+            key = (endpoint, next(self._counter))
+        self._calls.pop(key, None)  # Move a replaced edit to the end
+        self._calls[key] = (endpoint, payload)
+
+    def defer(self, send: Callable[[], object]):
+        """Add a call that is made by send, for calls that are not a plain post of a payload."""
+        self._calls[("deferred", next(self._counter))] = send
+
+    def flush(self):
+        """Post all buffered calls and empty the buffer."""
+        calls, self._calls = self._calls, {}
+        for call in calls.values():
+            if callable(call):
+                call()
+            else:
+                endpoint, payload = call
+                post(endpoint, payload=payload)
+
+
+@dataclass
+class SendResult:
+    """The outcome of sending a message to a single chat."""
+
+    chat_id: int
+    status: str  # "sent", "blocked" or "failed"
+    message_id: int | None = None
+    error: str | None = None
+
+
+@dataclass
+class SendSummary:
+    """The outcome of sending a message to many chats."""
+
+    results: list[SendResult] = field(default_factory=list)
+
+    def _chat_ids(self, status: str) -> list[int]:
+        return [result.chat_id for result in self.results if result.status == status]
+
+    @property
+    def sent(self) -> list[int]:
+        """Return the chat ids the message was sent to."""
+        return self._chat_ids("sent")
+
+    @property
+    def blocked(self) -> list[int]:
+        """Return the chat ids of users that blocked the bot, deactivated their account or removed the bot."""
+        return self._chat_ids("blocked")
+
+    @property
+    def failed(self) -> list[int]:
+        """Return the chat ids the message could not be sent to for other reasons."""
+        return self._chat_ids("failed")
+
+    def __str__(self):
+        """Return a one-line summary."""
+        return f"Sent {len(self.sent)} messages, {len(self.blocked)} blocked, {len(self.failed)} failed."
+
+
+_message_buffer: ContextVar[MessageBuffer | None] = ContextVar("message_buffer", default=None)
+_current_bot: ContextVar[str] = ContextVar("current_bot", default=DEFAULT_BOT)
+
+
+@contextmanager
+def use_bot(bot_name: str) -> Iterator[BotSettings]:
+    """Make the bot with the given name the current bot within the context.
+
+    All outbound calls and command lookups within the context use the current bot's settings.
+    """
+    bot_settings = settings.get_bot(bot_name)
+    token = _current_bot.set(bot_name)
+    try:
+        yield bot_settings
+    finally:
+        _current_bot.reset(token)
+
+
+def get_current_bot() -> BotSettings:
+    """Return the settings of the current bot."""
+    return settings.get_bot(_current_bot.get())
+
+
+@functools.cache
+def get_session(bot_name: str) -> requests.Session:  # noqa: ARG001  # pylint: disable=unused-argument
+    """Return the pooled HTTP session of the given bot.
+
+    The bot name is only used as cache key, so every bot keeps its own connection pool.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@contextmanager
+def buffer_messages() -> Iterator[MessageBuffer]:
+    """Buffer all messages sent within the context and flush them when the context exits without errors.
+
+    When an exception is raised, the buffered messages are discarded.
+    Nested contexts share the outermost buffer.
+    """
+    buffer = _message_buffer.get()
+    if buffer is not None:
+        yield buffer
+        return
+
+    buffer = MessageBuffer()
+    token = _message_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _message_buffer.reset(token)
+    buffer.flush()
+
+
+def flush_messages():
+    """Send all buffered messages immediately.
+
+    Steps can call this when a message must be delivered before the update is finished, e.g. before a slow operation.
+    Messages flushed this way are sent before the update's transaction commits.
+    """
+    buffer = _message_buffer.get()
+    if buffer is not None:
+        buffer.flush()
+
+
+def is_buffering() -> bool:
+    """Return whether messages are buffered, i.e. sent after the update's transaction commits."""
+    return _message_buffer.get() is not None
+
+
+def send_deferred(send: Callable[[], T]) -> T | None:
+    """Call send when the buffered messages are sent, in order with them, or immediately if no buffer is active.
+
+    Use this for calls that cannot be buffered as a plain payload, such as file uploads.
+    Return the result of send if it was called immediately and None if it was buffered.
+    """
+    buffer = _message_buffer.get()
+    if buffer is not None:
+        buffer.defer(send)
+        return None
+    return send()
+
 
 def is_valid_token(token: str | None):
     """Return whether the webhook token is valid.
 
+    The token is compared with the WEBHOOK_TOKEN of the current bot.
     If no token is configured, the token is considered valid.
 
     Note:
         This token is not the CallbackData token but a token used to validate the webhook.
         This enables us to differentiate original telegram requests from spam
     """
-    if not settings.WEBHOOK_TOKEN:
+    webhook_token = get_current_bot().WEBHOOK_TOKEN
+    if not webhook_token:
         return True
-    return token == settings.WEBHOOK_TOKEN
+    return token == webhook_token
+
 
+def handle_update(update: dict, telegram_settings: AbstractTelegramSettings | None = None, bot_name: str | None = None):
+    """Handle the update.
 
-def handle_update(update: dict, telegram_settings: AbstractTelegramSettings | None = None):
-    """Handle the update."""
+    If bot_name is provided, the update is handled by that bot, otherwise by the current bot.
+    Messages sent while handling the update are buffered and sent when the update is finished, see `buffer_messages`.
+    If `ATOMIC_UPDATES` is enabled, the update is handled in a single transaction that gathers the writes to the
+    telegram settings and callback data, see `unitofwork`. The buffered messages are only sent after it commits.
+    Clicks on a message that is still being handled, or that was clicked again since, are skipped, see `clicks`.
+    Reads of the chat may go to read replicas, see `routers`.
+    """
+    bot_name = bot_name or _current_bot.get()
+    chat_id = backpressure.get_chat_id(update)
+    with use_bot(bot_name), routers.use_chat(chat_id), clicks.claim_click(update, bot_name) as claimed:
+        if not claimed:
+            return
+        work = unitofwork.unit_of_work() if settings.ATOMIC_UPDATES else nullcontext()
+        with buffer_messages(), work:
+            _dispatch_update(update, telegram_settings)
+
+
+def _dispatch_update(update: dict, telegram_settings: AbstractTelegramSettings | None = None):
+    """Route the update to the right command, step or help message."""
     telegram_update = TelegramUpdate(update)
     telegram_settings = _get_or_create_telegram_settings(telegram_update, telegram_settings)
 
@@ -43,13 +248,27 @@ def handle_update(update: dict, telegram_settings: AbstractTelegramSettings | No
         _start_command_or_send_help(telegram_update, telegram_settings)
     elif telegram_update.is_callback_query():
         _call_command_step(telegram_update.callback_data, telegram_settings, telegram_update)
-    elif telegram_settings.data.get("_waiting_for"):
-        token = telegram_settings.data["_waiting_for"]
-        _call_command_step(token, telegram_settings, telegram_update)
+    elif waiting_for := get_conversation_state(telegram_settings).get("_waiting_for"):
+        if telegram_update.file and not _accepts_files(waiting_for):
+            with override(telegram_update.language_code):
+                send_message(gettext("Please send your answer as text."), telegram_update.chat_id)
+            return
+        _call_command_step(waiting_for, telegram_settings, telegram_update)
     else:
         send_help(telegram_update, telegram_settings)
 
 
+def _accepts_files(waiting_for: str) -> bool:
+    """Return whether the step waiting for input accepts files, see `Step.add_waiting_for`.
+
+    Expired tokens are let through, so the user is told that the command has expired.
+    """
+    try:
+        return bool(resolve_callback(waiting_for).data.get("_accepts_files"))
+    except CallbackData.DoesNotExist:
+        return True
+
+
 def send_help(telegram_update: TelegramUpdate, telegram_settings: "AbstractTelegramSettings"):
     """Send a help message to the user.
 
@@ -57,11 +276,11 @@ def send_help(telegram_update: TelegramUpdate, telegram_settings: "AbstractTeleg
     To completely customize the help text, set HELP_RENDERER in settings.
     """
     with override(telegram_update.language_code):
-        help_text = _get_help_text(telegram_settings)
+        help_text = get_help_text(telegram_settings)
         send_message(help_text, telegram_update.chat_id)
 
 
-def _get_help_text(telegram_settings: "AbstractTelegramSettings") -> str:
+def get_help_text(telegram_settings: "AbstractTelegramSettings") -> str:
     """Return the help text."""
     help_text_callable = _get_help_text_callable()
     return help_text_callable(telegram_settings)
@@ -80,13 +299,20 @@ def _default_help_text_renderer(telegram_settings: "AbstractTelegramSettings") -
 
     This function constructs a help text listing all available commands,
     excluding those marked with `exclude_from_help = True`.
+    If `COMMAND_MANIFEST` is configured, the commands are listed from the manifest without importing them.
     """
     command_info_list = []
-    for command_name, app_name in get_commands().items():
-        command = load_command_class(app_name, command_name, telegram_settings)
-        if command.exclude_from_help:
-            continue
-        command_info_list.append(f"{command.get_command_string()} - {command.description}")
+    if settings.COMMAND_MANIFEST:
+        available_commands = get_bot_commands(get_current_bot())
+        for name, info in load_command_manifest().items():
+            if name in available_commands and not info["exclude_from_help"]:
+                command_info_list.append(f"{info['command']} - {gettext(info['description'])}")
+    else:
+        for command_name, app_name in get_bot_commands(get_current_bot()).items():
+            command = load_command_class(app_name, command_name, telegram_settings)
+            if command.exclude_from_help:
+                continue
+            command_info_list.append(f"{command.get_command_string()} - {command.description}")
 
     commands_text = "\n".join(command_info_list)
     help_text = f"{settings.HELP_TEXT_INTRO}\n{commands_text}"
@@ -97,6 +323,7 @@ def send_message(text: str, chat_id: int, reply_markup: dict | None = None, mess
     """Send a message to the user.
 
     If message_id is provided, it will edit the existing message instead.
+    While an update is being handled, the message is buffered and only the final edit of each message is sent.
 
     References:
     https://core.telegram.org/bots/api#sendmessage
@@ -109,21 +336,117 @@ def send_message(text: str, chat_id: int, reply_markup: dict | None = None, mess
 
     if reply_markup:
         payload["reply_markup"] = reply_markup
+
+    buffer = _message_buffer.get()
+    if buffer is not None:
+        buffer.add(endpoint, payload)
+        return
     post(endpoint, payload=payload)
 
 
-def post(endpoint: str, payload: dict, timeout: int = 5):
-    """Post the payload to the given endpoint."""
+def send_message_many(
+    text: str,
+    chat_ids: Iterable[Any],
+    reply_markup: dict | None = None,
+    concurrency: int | None = None,
+    rate_limit: float | None = None,
+) -> SendSummary:
+    """Send the same message to many chats and return the outcome per chat.
+
+    See `send_rendered_message_many` for the arguments.
+    """
+    return send_rendered_message_many(lambda _recipient: text, chat_ids, reply_markup, concurrency, rate_limit)
+
+
+def send_rendered_message_many(
+    render: Callable[[Any], str],
+    recipients: Iterable[Any],
+    reply_markup: dict | None = None,
+    concurrency: int | None = None,
+    rate_limit: float | None = None,
+) -> SendSummary:
+    """Send a message rendered per recipient to many chats and return the outcome per chat.
+
+    Recipients are chat ids or objects with a chat_id attribute, like telegram settings. Querysets are streamed with
+    `iterator()`, so they are never loaded at once. render is called with each recipient and returns the text for it.
+
+    Messages are sent by the current bot, with up to `concurrency` (default: `HTTP_POOL_SIZE`) calls in flight over
+    the bot's pooled session and at most `rate_limit` (default: `BROADCAST_RATE_LIMIT`) messages per second.
+    Messages are never buffered. Users that blocked the bot are reported as blocked instead of failed.
+    """
+    concurrency = concurrency or settings.HTTP_POOL_SIZE
+    limiter = resilience.RateLimiter(rate_limit or settings.BROADCAST_RATE_LIMIT)
+    bot_name = _current_bot.get()
+    if isinstance(recipients, QuerySet):
+        recipients = recipients.iterator(chunk_size=2000)
+
+    def send(chat_id: int, text: str) -> SendResult:
+        limiter.wait()
+        payload: dict[str, Any] = {"chat_id": chat_id, "text": text}
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        with use_bot(bot_name):
+            return _send_to_chat(chat_id, payload)
+
+    summary = SendSummary()
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = []
+        for recipient in recipients:
+            in_flight.acquire()
+            future = executor.submit(send, getattr(recipient, "chat_id", recipient), render(recipient))
+            future.add_done_callback(lambda _future: in_flight.release())
+            futures.append(future)
+        summary.results = [future.result() for future in futures]
+    return summary
+
+
+def _send_to_chat(chat_id: int, payload: dict) -> SendResult:
+    """Send a single message of a broadcast and return its outcome."""
+    try:
+        response = post("sendMessage", payload=payload)
+    except requests.HTTPError as exc:
+        status_code = exc.response.status_code if exc.response is not None else None
+        status = "blocked" if status_code == 403 else "failed"
+        return SendResult(chat_id, status, error=get_error_description(exc))
+    except (requests.RequestException, resilience.CircuitOpenError) as exc:
+        logging.warning(f"Could not send a message to chat {chat_id}: {exc!r}")
+        return SendResult(chat_id, "failed", error=str(exc))
+    try:
+        message_id = response.json()["result"]["message_id"]
+    except (ValueError, KeyError, TypeError):
+        message_id = None
+    return SendResult(chat_id, "sent", message_id=message_id)
+
+
+def get_error_description(exc: requests.HTTPError) -> str:
+    """Return Telegram's description of the error, if any."""
+    if exc.response is None:
+        return str(exc)
+    try:
+        return exc.response.json()["description"]
+    except (ValueError, KeyError, TypeError):
+        return str(exc)
+
+
+def post(endpoint: str, payload: dict, timeout: float | None = None):
+    """Post the payload to the given endpoint.
+
+    Transient errors are retried and calls fail fast while the endpoint's circuit is open, see `API_POLICIES`.
+    If timeout is not provided, the timeout of the endpoint's policy is used.
+    """
     url = _construct_endpoint(endpoint)
-    response = requests.post(url, json=payload, timeout=timeout)
-    response.raise_for_status()
-    return response
+    bot_name = _current_bot.get()
+    session = get_session(bot_name)
+    return resilience.call(
+        endpoint, lambda policy_timeout: session.post(url, json=payload, timeout=timeout or policy_timeout), bot_name
+    )
 
 
 @staticmethod
 def _construct_endpoint(name: str):
     """Construct the endpoint for the given command."""
-    root_url = settings.BOT_URL.rstrip("/")
+    root_url = get_current_bot().BOT_URL.rstrip("/")
     return f"{root_url}/{name}"
 
 
@@ -132,7 +455,7 @@ def _start_command_or_send_help(telegram_update: TelegramUpdate, telegram_settin
     command_name = telegram_update.message_text.split(maxsplit=1)[0]
     command_str = command_name.lstrip("/")
     try:
-        app_name = get_commands()[command_str]
+        app_name = get_bot_commands(get_current_bot())[command_str]
     except KeyError:
         send_help(telegram_update, telegram_settings)
         return
@@ -143,20 +466,23 @@ def _start_command_or_send_help(telegram_update: TelegramUpdate, telegram_settin
 def _call_command_step(token: str, telegram_settings: "AbstractTelegramSettings", telegram_update: TelegramUpdate):
     """Call a command's step from the provided data.
 
+    Tokens that refer to nothing, or to a command the current bot does not have, are treated as expired.
     Return True if the step was called successfully, False otherwise.
     """
     if token == DO_NOTHING:
         return False
 
     try:
-        data = CallbackData.objects.get(token=token)
+        data = resolve_callback(token)
     except CallbackData.DoesNotExist:
+        data = None
+    command_name = data.command.lstrip("/") if data else ""
+    app_name = get_bot_commands(get_current_bot()).get(command_name)
+    if data is None or app_name is None:
         send_message("This command has expired.", telegram_update.chat_id, message_id=telegram_update.message_id)
         return False
 
-    command_name = data.command.lstrip("/")
-    command_info = get_commands()[command_name]
-    command = load_command_class(command_info, command_name, telegram_settings)
+    command = load_command_class(app_name, command_name, telegram_settings)
     getattr(command, data.action)(data.step, telegram_update)
     return True
 
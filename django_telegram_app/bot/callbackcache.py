@@ -0,0 +1,98 @@
+"""Cache tier in front of the CallbackData and CallbackKeyboard tables.
+
+Most clicks happen within seconds of the keyboard being rendered. When `CALLBACK_CACHE_TIMEOUT` is set, callback data
+and keyboards are written to the cache configured by `CACHE_ALIAS` when they are committed, and tokens are resolved
+from the cache before the database is queried. The database remains the source of truth: entries are stored as the JSON the
+database would return, missing entries are read from the database, and deleting the callback data of a conversation
+writes a tombstone for its correlation key, which hides the conversation's cached entries.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from typing import Any
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from django_telegram_app.conf import settings
+from django_telegram_app.models import CallbackData, CallbackKeyboard
+
+KEY_PREFIX = "django_telegram_app:callback"
+CALLBACK_FIELDS = ("token", "command", "step", "action", "data", "correlation_key")
+KEYBOARD_FIELDS = ("key", "command", "data", "buttons", "correlation_key")
+
+
+def is_enabled() -> bool:
+    """Return whether the cache tier is enabled."""
+    return settings.CALLBACK_CACHE_TIMEOUT is not None
+
+
+def add(callbacks: Iterable[CallbackData] = (), keyboards: Iterable[CallbackKeyboard] = ()):
+    """Write the saved callback data and keyboards to the cache once they are committed, if the cache tier is enabled.
+
+    The entries are written when the transaction of the database the rows were saved to commits, so rows that are
+    rolled back never resolve from the cache.
+    """
+    if not is_enabled():
+        return
+    callbacks, keyboards = list(callbacks), list(keyboards)
+    values = {_get_key("token", str(callback.token)): _dump(callback, CALLBACK_FIELDS) for callback in callbacks}
+    values.update({_get_key("keyboard", keyboard.key): _dump(keyboard, KEYBOARD_FIELDS) for keyboard in keyboards})
+    if values:
+        using = (callbacks or keyboards)[0]._state.db
+        transaction.on_commit(
+            lambda: caches[settings.CACHE_ALIAS].set_many(values, settings.CALLBACK_CACHE_TIMEOUT), using=using
+        )
+
+
+def evict(callbacks: Iterable[CallbackData]):
+    """Remove the callback data from the cache right away, for rows that were changed after they were cached.
+
+    The next lookup reads the row from the database and caches it again.
+    """
+    if is_enabled():
+        caches[settings.CACHE_ALIAS].delete_many([_get_key("token", str(callback.token)) for callback in callbacks])
+
+
+def get_callback(token: str) -> CallbackData | None:
+    """Return the cached callback data of the token, or None if it is not cached or its conversation was deleted."""
+    fields = _get("token", token)
+    return CallbackData(**fields) if fields is not None else None
+
+
+def get_keyboard(key: str) -> CallbackKeyboard | None:
+    """Return the cached keyboard with the key, or None if it is not cached or its conversation was deleted."""
+    fields = _get("keyboard", key)
+    return CallbackKeyboard(**fields) if fields is not None else None
+
+
+def delete_correlated(correlation_key: str | None):
+    """Hide all cached callback data and keyboards with the correlation key."""
+    if is_enabled() and correlation_key:
+        cache = caches[settings.CACHE_ALIAS]
+        cache.set(_get_key("deleted", correlation_key), True, settings.CALLBACK_CACHE_TIMEOUT)
+
+
+def _get(kind: str, key: str) -> dict[str, Any] | None:
+    if not is_enabled():
+        return None
+    cache = caches[settings.CACHE_ALIAS]
+    value = cache.get(_get_key(kind, key))
+    if value is None:
+        return None
+    fields = json.loads(value)
+    correlation_key = fields["correlation_key"]
+    if correlation_key and cache.get(_get_key("deleted", correlation_key)):
+        return None
+    return fields
+
+
+def _dump(instance: CallbackData | CallbackKeyboard, fields: tuple[str, ...]) -> str:
+    return json.dumps({field: getattr(instance, field) for field in fields}, cls=DjangoJSONEncoder)
+
+
+def _get_key(kind: str, key: str) -> str:
+    return f"{KEY_PREFIX}:{kind}:{key}"
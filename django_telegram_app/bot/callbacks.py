@@ -0,0 +1,127 @@
+"""Resolution of the tokens stored in the callback data of inline buttons.
+
+Two kinds of tokens exist:
+    - "<uuid>": refers to a single CallbackData row.
+    - "<key>:<index>": refers to a button of a CallbackKeyboard.
+    - "<key>:<index>:<argument>": refers to a button of a CallbackKeyboard that takes a numeric argument.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Subquery
+
+from django_telegram_app.bot import callbackcache, unitofwork
+from django_telegram_app.models import CallbackData, CallbackKeyboard
+
+KEYBOARD_TOKEN_SEPARATOR = ":"
+
+
+def resolve_callback(token: str) -> CallbackData:
+    """Return the callback data the token refers to.
+
+    Keyboard buttons resolve to an unsaved CallbackData instance with the keyboard's shared data merged with the
+    button's data. Callback data created in the current unit of work is found before it is written, and callback
+    data is read from the cache tier before the database is queried, see `callbackcache`.
+    Raise CallbackData.DoesNotExist if the token is malformed or refers to nothing.
+    """
+    if KEYBOARD_TOKEN_SEPARATOR in token:
+        return _resolve_keyboard_token(token)
+    try:
+        uuid.UUID(token)
+    except ValueError as exc:
+        raise CallbackData.DoesNotExist(f"Malformed callback token {token!r}.") from exc
+    work = unitofwork.get_unit_of_work()
+    if work is not None and token in work.callbacks:
+        return work.callbacks[token]
+    callback_data = callbackcache.get_callback(token)
+    if callback_data is None:
+        callback_data = CallbackData.objects.get(token=token)
+        callbackcache.add(callbacks=[callback_data])
+    return callback_data
+
+
+def delete_correlated_callbacks(token: str):
+    """Delete all callback data and keyboards that share the correlation key of the token's callback data.
+
+    Each table is cleared with a single DELETE on the indexed correlation_key column, the correlation key is looked
+    up in a subquery. The table the token refers to is cleared last, so the subquery still finds the token's row.
+    The deferred writes of the current unit of work are flushed first, so they are deleted as well.
+    """
+    unitofwork.flush()
+    if callbackcache.is_enabled():
+        try:
+            callbackcache.delete_correlated(resolve_callback(token).correlation_key)
+        except CallbackData.DoesNotExist:
+            pass
+    if KEYBOARD_TOKEN_SEPARATOR in token:
+        key, _, _ = token.partition(KEYBOARD_TOKEN_SEPARATOR)
+        source = CallbackKeyboard.objects.filter(key=key)
+        other_model = CallbackData
+    else:
+        try:
+            uuid.UUID(token)
+        except ValueError:
+            return
+        source = CallbackData.objects.filter(token=token)
+        other_model = CallbackKeyboard
+
+    correlation_key = Subquery(source.values("correlation_key")[:1])
+    other_model.objects.filter(correlation_key=correlation_key).delete()
+    if not connections[source.db].features.update_can_self_select:
+        # Backends like MySQL cannot select from the table they delete from, look the key up beforehand.
+        correlation_key = source.values_list("correlation_key", flat=True).first()
+        if correlation_key is None:
+            return
+    source.model.objects.filter(correlation_key=correlation_key).delete()
+
+
+def get_keyboard_key(command: str, data: dict, buttons: list[dict]) -> str:
+    """Return the content-addressed key of a keyboard.
+
+    The key is the URL-safe base64 encoding of the first 15 bytes of the SHA-256 of the keyboard's content.
+    """
+    content = json.dumps([command, data, buttons], cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(content.encode()).digest()[:15]
+    return base64.urlsafe_b64encode(digest).decode()
+
+
+def get_keyboard_token(key: str, index: int, argument: int | None = None) -> str:
+    """Return the token of the button at the given index of the keyboard with the given key.
+
+    Buttons with a parameter also get the argument, e.g. a page number, in their token.
+    """
+    token = f"{key}{KEYBOARD_TOKEN_SEPARATOR}{index}"
+    if argument is not None:
+        token += f"{KEYBOARD_TOKEN_SEPARATOR}{argument}"
+    return token
+
+
+def _resolve_keyboard_token(token: str) -> CallbackData:
+    key, _, rest = token.partition(KEYBOARD_TOKEN_SEPARATOR)
+    numbers = rest.split(KEYBOARD_TOKEN_SEPARATOR)
+    if len(numbers) > 2 or not all(number.isdigit() for number in numbers):
+        raise CallbackData.DoesNotExist(f"Malformed keyboard token {token!r}.")
+    index, argument = int(numbers[0]), int(numbers[1]) if len(numbers) == 2 else None
+    try:
+        return _get_keyboard(key).get_callback(index, argument)
+    except (CallbackKeyboard.DoesNotExist, IndexError) as exc:
+        raise CallbackData.DoesNotExist(f"No callback data for keyboard token {token!r}.") from exc
+
+
+def _get_keyboard(key: str) -> CallbackKeyboard:
+    """Return the keyboard from the current unit of work, the cache tier or the database, in that order."""
+    work = unitofwork.get_unit_of_work()
+    if work is not None and key in work.keyboards:
+        return work.keyboards[key]
+    keyboard = callbackcache.get_keyboard(key)
+    if keyboard is None:
+        keyboard = CallbackKeyboard.objects.get(key=key)
+        callbackcache.add(keyboards=[keyboard])
+    return keyboard
@@ -0,0 +1,84 @@
+"""Run each click on an inline button once and skip clicks superseded by a later click on the same message.
+
+Users tap buttons repeatedly while a slow step runs. A click is only handled when no other click on the same message
+is being handled, and when no later click on the message arrived in the meantime, e.g. while it waited in the queue.
+Skipped clicks are still answered, so the button stops showing its loading state.
+
+The claims and the latest click of each message are kept in the cache configured by `CACHE_ALIAS`, so they are shared
+by all processes that use the same cache.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import requests
+from django.core.cache import caches
+
+from django_telegram_app.bot import resilience
+from django_telegram_app.conf import settings
+
+KEY_PREFIX = "django_telegram_app:click"
+
+
+def record_click(update: object, bot_name: str):
+    """Remember the update as the latest click on its message, if it is a click with an update id.
+
+    The update is the parsed request body, which is not necessarily a dict.
+    """
+    key = _get_message_key(update, bot_name)
+    update_id = update.get("update_id") if isinstance(update, dict) else None
+    if key is not None and isinstance(update_id, int):
+        caches[settings.CACHE_ALIAS].set(f"{key}:latest", update_id, settings.CLICK_CLAIM_TIMEOUT)
+
+
+@contextmanager
+def claim_click(update: dict, bot_name: str) -> Iterator[bool]:
+    """Claim the click's message for the duration of the context and yield whether the click should be handled.
+
+    Updates that are not clicks are always handled, just like clicks without a callback query id, which are not sent
+    by Telegram but e.g. by `offload`. A click is not handled when another click on the same message is being handled
+    or when a later click on the message was recorded, it is answered instead.
+    """
+    key = _get_message_key(update, bot_name)
+    if key is None or not update["callback_query"].get("id") or not settings.CLICK_DEDUPLICATION:
+        yield True
+        return
+
+    cache = caches[settings.CACHE_ALIAS]
+    latest = cache.get(f"{key}:latest")
+    update_id = update.get("update_id")
+    superseded = isinstance(update_id, int) and isinstance(latest, int) and latest > update_id
+    if superseded or not cache.add(f"{key}:claim", update_id or 0, settings.CLICK_CLAIM_TIMEOUT):
+        logging.info(f"Skipping {'superseded' if superseded else 'concurrent'} click {update_id} on {key}")
+        answer_callback_query(update["callback_query"])
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        cache.delete(f"{key}:claim")
+
+
+def answer_callback_query(callback_query: dict):
+    """Answer the callback query, so Telegram stops showing the button's loading state."""
+    from django_telegram_app.bot.bot import post
+
+    try:
+        post("answerCallbackQuery", payload={"callback_query_id": callback_query["id"]})
+    except (requests.RequestException, resilience.CircuitOpenError) as exc:
+        logging.warning(f"Could not answer callback query {callback_query['id']}: {exc!r}")
+
+
+def _get_message_key(update: object, bot_name: str) -> str | None:
+    """Return the cache key of the message the click was on, or None if the update is not a click on a message."""
+    if not isinstance(update, dict):
+        return None
+    callback_query = update.get("callback_query")
+    try:
+        message = callback_query["message"]  # type: ignore[index]
+        return f"{KEY_PREFIX}:{bot_name}:{int(message['chat']['id'])}:{int(message['message_id'])}"
+    except (TypeError, KeyError, ValueError):
+        return None
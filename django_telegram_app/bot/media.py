@@ -0,0 +1,435 @@
+"""Sending photos and documents and downloading the files users send.
+
+Files are streamed from disk or from file-like objects in chunks of CHUNK_SIZE bytes, they are never loaded into
+memory at once. After a file is uploaded, the file_id Telegram returns is cached in `TelegramFile` under the SHA-256
+of the file's content, so sending the same file again only sends its file_id.
+
+Downloads are streamed to disk, to a file-like object or to a Django storage in chunks of CHUNK_SIZE bytes as well.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import uuid
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Protocol
+
+import requests
+from django.core.files import File
+from django.core.files.storage import Storage
+
+from django_telegram_app.bot import bot, resilience
+from django_telegram_app.models import TelegramFile
+
+CHUNK_SIZE = 64 * 1024
+MAX_DOWNLOAD_SIZE = 20 * 1024 * 1024  # The Bot API does not serve larger files.
+DOWNLOAD_WORKERS = 4
+# Parts of the error descriptions of Telegram that mean a file_id cannot be used (anymore).
+FILE_ID_ERRORS = ("file identifier", "file_id", "file reference")
+
+
+class BinaryFile(Protocol):
+    """A binary file-like object to upload, such as an open file, a BytesIO or an io.RawIOBase."""
+
+    def read(self, size: int = -1, /) -> bytes:
+        """Read up to size bytes, all remaining bytes if size is negative."""
+        ...
+
+    def seekable(self) -> bool:
+        """Return whether the file supports seek and tell."""
+        ...
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET, /) -> int:
+        """Change the position and return the new absolute position."""
+        ...
+
+    def tell(self) -> int:
+        """Return the current position."""
+        ...
+
+
+MediaSource = str | os.PathLike | BinaryFile
+
+
+def send_photo(photo: MediaSource, chat_id: int, caption: str | None = None, reply_markup: dict | None = None):
+    """Send a photo to the user and return Telegram's response, or None if it is buffered, see `_send_media`.
+
+    photo is a Path to a file on disk, a binary file-like object or, as a string, a file_id or URL known to Telegram.
+
+    References:
+    https://core.telegram.org/bots/api#sendphoto
+    """
+    return _send_media(TelegramFile.Kind.PHOTO, photo, chat_id, caption, reply_markup)
+
+
+def send_document(
+    document: MediaSource,
+    chat_id: int,
+    caption: str | None = None,
+    reply_markup: dict | None = None,
+    filename: str | None = None,
+):
+    """Send a document to the user and return Telegram's response, or None if it is buffered, see `_send_media`.
+
+    document is a Path to a file on disk, a binary file-like object or, as a string, a file_id or URL known to
+    Telegram. filename defaults to the name of the file.
+
+    References:
+    https://core.telegram.org/bots/api#senddocument
+    """
+    return _send_media(TelegramFile.Kind.DOCUMENT, document, chat_id, caption, reply_markup, filename)
+
+
+class MultipartStream:
+    """A multipart/form-data request body that streams its files in chunks.
+
+    requests sends objects with a length and a read method as the request body without reading them into memory.
+    """
+
+    def __init__(self, fields: dict[str, str], files: dict[str, tuple[str, BinaryFile, int]]):
+        """Initialize the stream, files map field names to a filename, a file object and its size in bytes.
+
+        If the size of a file is unknown (-1), the length of the stream is meaningless.
+        """
+        self.boundary = uuid.uuid4().hex
+        self._segments: list[bytes | BinaryFile] = []
+        self._length = 0
+        for name, value in fields.items():
+            self._add(self._part_header(f'name="{_quote(name)}"') + value.encode() + b"\r\n")
+        for name, (filename, fileobj, size) in files.items():
+            header = self._part_header(
+                f'name="{_quote(name)}"; filename="{_quote(filename)}"', "Content-Type: application/octet-stream\r\n"
+            )
+            self._add(header)
+            self._segments.append(fileobj)
+            self._length += max(size, 0)
+            self._add(b"\r\n")
+        self._add(f"--{self.boundary}--\r\n".encode())
+
+    @property
+    def content_type(self) -> str:
+        """Return the Content-Type header of the body."""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        """Return the length of the body in bytes."""
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Yield the body in chunks."""
+        while chunk := self.read(CHUNK_SIZE):
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to size bytes of the body, at most CHUNK_SIZE bytes of a file at a time."""
+        size = CHUNK_SIZE if size is None or size < 0 else size
+        while self._segments:
+            segment = self._segments[0]
+            if isinstance(segment, bytes):
+                self._segments[0] = segment[size:]
+                if not self._segments[0]:
+                    self._segments.pop(0)
+                if segment:
+                    return segment[:size]
+                continue
+            chunk = segment.read(min(size, CHUNK_SIZE))
+            if chunk:
+                return chunk
+            self._segments.pop(0)
+        return b""
+
+    def _add(self, data: bytes):
+        self._segments.append(data)
+        self._length += len(data)
+
+    def _part_header(self, disposition: str, extra_headers: str = "") -> bytes:
+        return f"--{self.boundary}\r\nContent-Disposition: form-data; {disposition}\r\n{extra_headers}\r\n".encode()
+
+
+def post_multipart(endpoint: str, fields: dict[str, Any], name: str, upload: Upload) -> requests.Response:
+    """Post the fields and the upload as multipart/form-data to the given endpoint of the current bot.
+
+    Non-string fields are sent as JSON. Every attempt of the resilience policy streams the upload from the start.
+    """
+    url = bot._construct_endpoint(endpoint)
+    bot_name = bot._current_bot.get()
+    session = bot.get_session(bot_name)
+    encoded_fields = {key: value if isinstance(value, str) else json.dumps(value) for key, value in fields.items()}
+
+    def send(timeout: float) -> requests.Response:
+        with upload.open() as fileobj:
+            body = MultipartStream(encoded_fields, {name: (upload.filename, fileobj, upload.size)})
+            # Without a known size, the body is sent with chunked transfer encoding.
+            data = body if upload.size >= 0 else iter(body)
+            return session.post(url, data=data, headers={"Content-Type": body.content_type}, timeout=timeout)
+
+    return resilience.call(endpoint, send, bot_name)
+
+
+class Upload:
+    """A file to upload, from a path on disk or a binary file-like object."""
+
+    def __init__(self, source: os.PathLike | BinaryFile, filename: str | None = None):
+        """Initialize the upload."""
+        self.source = source
+        if isinstance(source, os.PathLike):
+            self.path: Path | None = Path(source)
+            self.size = self.path.stat().st_size
+            self._start = 0
+            default_filename = self.path.name
+        else:
+            self.path = None
+            self._start = source.tell() if source.seekable() else 0
+            self.size = source.seek(0, os.SEEK_END) - self._start if source.seekable() else -1
+            if source.seekable():
+                source.seek(self._start)
+            default_filename = _get_filename(source)
+        self.filename = filename or default_filename
+        self._opened = False
+
+    @property
+    def rewindable(self) -> bool:
+        """Return whether the upload can be read more than once."""
+        return self.path is not None or self.source.seekable()  # type: ignore[union-attr]
+
+    @contextmanager
+    def open(self) -> Iterator[BinaryFile]:
+        """Open the upload positioned at its start."""
+        if self.path is not None:
+            with self.path.open("rb") as fileobj:
+                yield fileobj
+            return
+        fileobj: BinaryFile = self.source  # type: ignore[assignment]
+        if fileobj.seekable():
+            fileobj.seek(self._start)
+        elif self._opened:
+            raise ValueError("A file-like object that is not seekable can only be uploaded once.")
+        self._opened = True
+        yield fileobj
+
+    def get_content_hash(self) -> str | None:
+        """Return the SHA-256 of the content or None if the upload can only be read once."""
+        if not self.rewindable:
+            return None
+        digest = hashlib.sha256()
+        with self.open() as fileobj:
+            while chunk := fileobj.read(CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+def _get_filename(fileobj: BinaryFile) -> str:
+    """Return the name of the file a file-like object reads from, files opened by descriptor have no name."""
+    name = getattr(fileobj, "name", None)
+    return Path(name).name if isinstance(name, str) and name else "file"
+
+
+def get_file(file_id: str) -> dict:
+    """Return the File object of the given file_id, including the file_path to download it from.
+
+    References:
+    https://core.telegram.org/bots/api#getfile
+    """
+    return bot.post("getFile", payload={"file_id": file_id}).json()["result"]
+
+
+def download_file(
+    file: str | dict,
+    destination: str | os.PathLike | IO[bytes],
+    storage: Storage | None = None,
+    max_size: int = MAX_DOWNLOAD_SIZE,
+) -> str:
+    """Download a file a user sent and return where it was written to.
+
+    file is a file_id or a File, Document or PhotoSize object of an update, see `TelegramUpdate.file`.
+    Without storage, destination is a path on disk or a writable binary file-like object. With storage, destination
+    must be the name to save the file under and the name the storage actually used is returned.
+
+    The file is written in chunks of CHUNK_SIZE bytes, so memory use does not depend on the file's size.
+    Raise ValueError if the file is larger than max_size bytes, a partially written file on disk is removed.
+    """
+    file_info = get_file(file if isinstance(file, str) else file["file_id"])
+    if file_info.get("file_size", 0) > max_size:
+        raise ValueError(f"The file is larger than {max_size} bytes.")
+
+    url = _construct_file_url(file_info["file_path"])
+    bot_name = bot._current_bot.get()
+    session = bot.get_session(bot_name)
+    download = resilience.call("downloadFile", lambda timeout: session.get(url, stream=True, timeout=timeout), bot_name)
+    with download as response:
+        stream = _ResponseStream(response, max_size)
+        if storage is not None:
+            if not isinstance(destination, (str, os.PathLike)):
+                raise TypeError("With a storage, destination must be the name to save the file under.")
+            name = os.fspath(destination)
+            return storage.save(name, File(stream, name=name))
+        if not isinstance(destination, (str, os.PathLike)):
+            _copy(stream, destination)
+            return getattr(destination, "name", "")
+        path = Path(destination)
+        try:
+            with path.open("wb") as fileobj:
+                _copy(stream, fileobj)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        return os.fspath(path)
+
+
+def download_file_in_background(
+    file: str | dict,
+    destination: str | os.PathLike | IO[bytes],
+    storage: Storage | None = None,
+    max_size: int = MAX_DOWNLOAD_SIZE,
+) -> Future[str]:
+    """Download a file in a background thread, so handling the update is not held up by the transfer.
+
+    Return a Future of the result of `download_file`, add a done callback to process the file once it is written.
+    The download runs in a pool of DOWNLOAD_WORKERS threads, with the current bot.
+    """
+    context = contextvars.copy_context()
+    return _get_download_executor().submit(context.run, download_file, file, destination, storage, max_size)
+
+
+@functools.cache
+def _get_download_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="telegram-download")
+
+
+def _construct_file_url(file_path: str) -> str:
+    """Return the download URL of a file, https://api.telegram.org/file/bot<token>/<file_path> for Telegram."""
+    root_url, _, bot_path = bot.get_current_bot().BOT_URL.rstrip("/").rpartition("/")
+    return f"{root_url}/file/{bot_path}/{file_path}"
+
+
+class _ResponseStream(io.RawIOBase):
+    """A read-only file object over the body of a streamed response that enforces a maximum size."""
+
+    def __init__(self, response: requests.Response, max_size: int):
+        self._chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        self._buffer = b""
+        self._remaining = max_size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._buffer:
+            self._buffer = next(self._chunks, b"")
+            self._remaining -= len(self._buffer)
+            if self._remaining < 0:
+                raise ValueError("The file is larger than the maximum download size.")
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class _Readable(Protocol):
+    def read(self, size: int = -1, /) -> bytes: ...
+
+
+def _copy(source: _Readable, destination: IO[bytes]):
+    while chunk := source.read(CHUNK_SIZE):
+        destination.write(chunk)
+
+
+def _send_media(
+    kind: str,
+    source: MediaSource,
+    chat_id: int,
+    caption: str | None,
+    reply_markup: dict | None,
+    filename: str | None = None,
+):
+    """Send the media in order with the buffered messages, see `bot.send_deferred`.
+
+    A file-like object is copied to a temporary file when the media is buffered, so the caller may close it.
+    """
+    if isinstance(source, str) and os.path.isfile(source):
+        raise ValueError(f"{source!r} is a local file, pass it as a Path. Strings are sent as a file_id or URL.")
+    fields: dict[str, Any] = {"chat_id": chat_id}
+    if caption:
+        fields["caption"] = caption
+    if reply_markup:
+        fields["reply_markup"] = reply_markup
+
+    if isinstance(source, (str, os.PathLike)) or not bot.is_buffering():
+        return bot.send_deferred(functools.partial(_post_media, kind, source, fields, filename))
+
+    copy = tempfile.TemporaryFile()
+    _copy(source, copy)
+    copy.seek(0)
+    filename = filename or _get_filename(source)
+
+    def send():
+        with copy:
+            return _post_media(kind, copy, fields, filename)
+
+    return bot.send_deferred(send)
+
+
+def _post_media(kind: str, source: MediaSource, fields: dict[str, Any], filename: str | None):
+    """Send the media by file_id if it was uploaded before, upload and cache its file_id otherwise."""
+    endpoint = f"send{kind.capitalize()}"
+    if isinstance(source, str):
+        return bot.post(endpoint, payload={**fields, kind: source})
+
+    upload = Upload(source, filename)
+    content_hash = upload.get_content_hash()
+    bot_name = bot.get_current_bot().name
+    if content_hash is not None:
+        cached = TelegramFile.objects.filter(content_hash=content_hash, kind=kind, bot=bot_name).first()
+        if cached is not None:
+            try:
+                return bot.post(endpoint, payload={**fields, kind: cached.file_id})
+            except requests.HTTPError as exc:
+                if not _is_file_id_rejected(exc):
+                    raise
+                logging.warning(f"Cached file_id of {cached} was rejected, uploading the file again.")
+                cached.delete()
+
+    response = post_multipart(endpoint, fields, kind, upload)
+    if content_hash is not None:
+        _cache_file_id(kind, content_hash, bot_name, response)
+    return response
+
+
+def _is_file_id_rejected(exc: requests.HTTPError) -> bool:
+    """Return whether Telegram rejected the file_id itself, e.g. because it expired, and not the rest of the request."""
+    if exc.response is None or exc.response.status_code != 400:
+        return False
+    description = bot.get_error_description(exc).lower()
+    return any(marker in description for marker in FILE_ID_ERRORS)
+
+
+def _cache_file_id(kind: str, content_hash: str, bot_name: str, response: requests.Response):
+    """Store the file_id of the uploaded file, photos are cached by their largest size."""
+    try:
+        media = response.json()["result"][kind]
+        if kind == TelegramFile.Kind.PHOTO:
+            media = media[-1]
+        file_id, file_unique_id = media["file_id"], media.get("file_unique_id", "")
+    except (ValueError, KeyError, IndexError, TypeError):
+        logging.warning(f"Could not find the file_id of the uploaded {kind} in the response.")
+        return
+    TelegramFile.objects.update_or_create(
+        content_hash=content_hash,
+        kind=kind,
+        bot=bot_name,
+        defaults={"file_id": file_id, "file_unique_id": file_unique_id},
+    )
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r", " ").replace("\n", " ")
@@ -0,0 +1,157 @@
+"""Run slow work of a step outside of the webhook and continue the command with its result.
+
+The work is started once the update's transaction commits. While it runs, the chat shows a "working" message and a
+typing indicator. When it is done, its result is stored in the callback data of the next step and a callback query
+update for that step is handled like any other update, so the command continues where it left off.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+
+from django_telegram_app import models, queue
+from django_telegram_app.bot import bot, callbackcache, resilience
+from django_telegram_app.bot.callbacks import delete_correlated_callbacks
+from django_telegram_app.conf import settings
+
+EXECUTORS = ("thread", "process", "inline")
+
+
+@dataclass
+class OffloadJob:
+    """A call to run in the offload executor and the step to continue with when it is done."""
+
+    bot_name: str
+    chat_id: int
+    message_id: int
+    language_code: str | None
+    token: str
+    result_key: str
+    working_text: str
+    error_text: str
+    fn: Callable[..., Any]
+    args: tuple = ()
+    kwargs: dict[str, Any] = field(default_factory=dict)
+
+
+@functools.cache
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Return the thread pool that runs the offloaded jobs."""
+    return ThreadPoolExecutor(max_workers=settings.OFFLOAD_WORKERS, thread_name_prefix="telegram-offload")
+
+
+@functools.cache
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the process pool that runs the offloaded calls when `OFFLOAD_EXECUTOR` is "process"."""
+    return ProcessPoolExecutor(max_workers=settings.OFFLOAD_WORKERS)
+
+
+def submit(job: OffloadJob):
+    """Start the job in the configured executor once the current transaction commits."""
+    if settings.OFFLOAD_EXECUTOR not in EXECUTORS:
+        raise ImproperlyConfigured(f"OFFLOAD_EXECUTOR must be one of {', '.join(EXECUTORS)}.")
+    transaction.on_commit(lambda: _start(job), using=router.db_for_write(models.CallbackData))
+
+
+def run(job: OffloadJob):
+    """Run the job and continue the command with its result.
+
+    If the call raises an exception, the user gets the job's error text and the command's callback data is cleared.
+    """
+    with bot.use_bot(job.bot_name):
+        message_id = _send_working_message(job)
+        try:
+            result = _call_with_chat_actions(job)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logging.exception(f"Offloaded call {job.fn!r} failed")
+            bot.send_message(job.error_text, job.chat_id, message_id=message_id)
+            delete_correlated_callbacks(job.token)
+            return
+        _resume(job, message_id, result)
+
+
+def _start(job: OffloadJob):
+    if settings.OFFLOAD_EXECUTOR == "inline":
+        run(job)
+    else:
+        get_thread_pool().submit(_run_in_thread, job)
+
+
+def _run_in_thread(job: OffloadJob):
+    try:
+        run(job)
+    except Exception:  # pylint: disable=broad-exception-caught
+        logging.exception("Error running an offloaded job")
+    finally:
+        connections.close_all()
+
+
+def _send_working_message(job: OffloadJob) -> int:
+    """Edit the message the user clicked, or send a new message, to say the work started and return its id."""
+    try:
+        if job.message_id:
+            bot.post(
+                "editMessageText",
+                payload={"chat_id": job.chat_id, "message_id": job.message_id, "text": job.working_text},
+            )
+            return job.message_id
+        response = bot.post("sendMessage", payload={"chat_id": job.chat_id, "text": job.working_text})
+        return int(response.json()["result"]["message_id"])
+    except (requests.RequestException, resilience.CircuitOpenError, ValueError, KeyError, TypeError) as exc:
+        logging.warning(f"Could not send the working message to chat {job.chat_id}: {exc!r}")
+        return job.message_id
+
+
+def _call_with_chat_actions(job: OffloadJob):
+    """Call the job's function, sending a typing indicator every `OFFLOAD_CHAT_ACTION_INTERVAL` seconds meanwhile."""
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_send_chat_actions, args=(job, done), daemon=True)
+    heartbeat.start()
+    try:
+        if settings.OFFLOAD_EXECUTOR == "process":
+            return get_process_pool().submit(job.fn, *job.args, **job.kwargs).result()
+        return job.fn(*job.args, **job.kwargs)
+    finally:
+        done.set()
+        heartbeat.join()
+
+
+def _send_chat_actions(job: OffloadJob, done: threading.Event):
+    with bot.use_bot(job.bot_name):
+        while True:
+            try:
+                bot.post("sendChatAction", payload={"chat_id": job.chat_id, "action": "typing"})
+            except (requests.RequestException, resilience.CircuitOpenError) as exc:
+                logging.warning(f"Could not send a chat action to chat {job.chat_id}: {exc!r}")
+            if done.wait(settings.OFFLOAD_CHAT_ACTION_INTERVAL):
+                return
+
+
+def _resume(job: OffloadJob, message_id: int, result: Any):
+    """Store the result for the next step and handle a callback query for it, like the webhook would."""
+    callback_data = models.CallbackData.objects.get(token=job.token)
+    callback_data.data[job.result_key] = result
+    callback_data.save(update_fields=["data"])
+    callbackcache.evict([callback_data])  # The cached entry predates the result
+    update = {
+        "callback_query": {
+            "id": "",
+            "from": {"id": job.chat_id, "language_code": job.language_code or ""},
+            "message": {"message_id": message_id, "chat": {"id": job.chat_id}},
+            "data": job.token,
+        }
+    }
+    if settings.QUEUE_UPDATES:
+        queue.enqueue(update, job.bot_name)
+    else:
+        queue.process_message(models.Message(raw_message=update, bot=job.bot_name))
@@ -0,0 +1,207 @@
+"""Retries and circuit breaking for calls to the Telegram Bot API.
+
+Every API method gets a policy, built from `DEFAULT_API_POLICY`, the "default" entry of the `API_POLICIES` setting and
+the entry for the method itself (e.g. "sendMessage"), in that order. Every bot has its own circuit breaker per API
+method, so one bot's failures never refuse the calls of another bot.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+
+import requests
+
+from django_telegram_app.conf import DEFAULT_BOT, settings
+
+DEFAULT_API_POLICY = {
+    "TIMEOUT": 5,
+    "RETRIES": 2,
+    "BACKOFF": 0.5,
+    "MAX_BACKOFF": 10,
+    "FAILURE_THRESHOLD": 5,
+    "RECOVERY_TIMEOUT": 30,
+}
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+TOO_MANY_REQUESTS = 429
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit of its API method is open."""
+
+
+class CircuitBreaker:
+    """Refuse calls after consecutive failures and probe for recovery after a timeout.
+
+    The breaker is closed while calls succeed. It opens after `failure_threshold` consecutive failures, during which
+    all calls are refused. Once `recovery_timeout` seconds have passed, a single probe call is let through: if it
+    succeeds the breaker closes again, otherwise it stays open for another `recovery_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        """Initialize the circuit breaker."""
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """Return whether the breaker currently refuses calls."""
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """Return whether a call may be made."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        """Record a successful call and close the breaker."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """Let another probe through after a probe call ended without telling whether the API recovered."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        """Record a failed call and open the breaker when the threshold is reached."""
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class RateLimiter:
+    """Space out calls so that at most `rate` calls per second are made, across threads."""
+
+    def __init__(self, rate: float):
+        """Initialize the rate limiter."""
+        self.interval = 1 / rate
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next call may be made."""
+        with self._lock:
+            now = time.monotonic()
+            call_at = max(self._next_call, now)
+            self._next_call = call_at + self.interval
+        if call_at > now:
+            time.sleep(call_at - now)
+
+
+def get_policy(api_method: str) -> dict:
+    """Return the retry and circuit breaker policy for the given API method."""
+    policies = settings.API_POLICIES
+    return {**DEFAULT_API_POLICY, **policies.get("default", {}), **policies.get(api_method, {})}
+
+
+@functools.cache
+def get_circuit_breaker(api_method: str, bot_name: str = DEFAULT_BOT) -> CircuitBreaker:  # noqa: ARG001  # pylint: disable=unused-argument
+    """Return the process-wide circuit breaker of the given bot for the given API method.
+
+    The bot name is only part of the cache key, the policy of an API method is shared by all bots.
+    """
+    policy = get_policy(api_method)
+    return CircuitBreaker(policy["FAILURE_THRESHOLD"], policy["RECOVERY_TIMEOUT"])
+
+
+def call(api_method: str, send: Callable[[float], requests.Response], bot_name: str = DEFAULT_BOT) -> requests.Response:
+    """Call send with the method's timeout, retrying transient errors with jittered exponential backoff.
+
+    Transient errors are connection errors and the status codes in TRANSIENT_STATUS_CODES. A 429 response is retried
+    after its `retry_after` parameter instead of the backoff. Read timeouts are not retried, because Telegram may have
+    handled the request already, but they do count as a failure for the circuit breaker.
+
+    A 429 response is a flood limit, often of a single chat, so it does not count as a failure. Other non-transient
+    error responses, like 400 or 403, show that the API is healthy and close the circuit.
+
+    Raise CircuitOpenError without calling send if the bot's circuit of the API method is open. Once the first
+    attempt was let through, the retries of the call are made even if the circuit opens in the meantime.
+    """
+    policy = get_policy(api_method)
+    breaker = get_circuit_breaker(api_method, bot_name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit for {api_method} is open, not calling the Telegram Bot API.")
+    attempt = 0
+    while True:
+        try:
+            response = send(policy["TIMEOUT"])
+            response.raise_for_status()
+        except (requests.ConnectionError, requests.HTTPError, requests.Timeout) as exc:
+            delay = _get_retry_delay(exc, attempt, policy)
+            if delay is None:
+                _record_outcome(breaker, exc)
+                raise
+            if _is_failure(exc):
+                breaker.record_failure()
+            attempt += 1
+            logging.warning(f"Retrying {api_method} in {delay:.2f}s after {exc!r} (attempt {attempt}).")
+            time.sleep(delay)
+        except BaseException:
+            breaker.release_probe()
+            raise
+        else:
+            breaker.record_success()
+            return response
+
+
+def _record_outcome(breaker: CircuitBreaker, exc: requests.RequestException):
+    """Record the error that ended a call: as a failure, as a success if the API answered, or not at all for a 429."""
+    if _is_failure(exc):
+        breaker.record_failure()
+    elif _get_status_code(exc) == TOO_MANY_REQUESTS:
+        breaker.release_probe()
+    else:
+        breaker.record_success()
+
+
+def _is_transient(exc: requests.RequestException) -> bool:
+    """Return whether the call may succeed when it is retried."""
+    if isinstance(exc, requests.HTTPError):
+        return _get_status_code(exc) in TRANSIENT_STATUS_CODES
+    return True
+
+
+def _is_failure(exc: requests.RequestException) -> bool:
+    """Return whether the exception indicates that the Telegram Bot API is unhealthy."""
+    return _is_transient(exc) and _get_status_code(exc) != TOO_MANY_REQUESTS
+
+
+def _get_status_code(exc: requests.RequestException) -> int | None:
+    return exc.response.status_code if isinstance(exc, requests.HTTPError) and exc.response is not None else None
+
+
+def _get_retry_delay(exc: requests.RequestException, attempt: int, policy: dict) -> float | None:
+    """Return the number of seconds to wait before retrying or None if the call should not be retried."""
+    if attempt >= policy["RETRIES"] or isinstance(exc, requests.ReadTimeout) or not _is_transient(exc):
+        return None
+    if isinstance(exc, requests.HTTPError) and exc.response is not None and _get_status_code(exc) == TOO_MANY_REQUESTS:
+        retry_after = _get_retry_after(exc.response)
+        if retry_after is not None:
+            return retry_after if retry_after <= policy["MAX_BACKOFF"] else None
+    return random.uniform(0, min(policy["MAX_BACKOFF"], policy["BACKOFF"] * 2**attempt))
+
+
+def _get_retry_after(response: requests.Response) -> float | None:
+    """Return the retry_after parameter of a 429 response, if any."""
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return None
@@ -0,0 +1,396 @@
+"""A fake Telegram Bot API server for integration and load tests.
+
+The server speaks just enough of the Bot API to exercise the whole outbound path of a bot, including the network,
+serialization, retries and rate limiting, without talking to Telegram. It records every call and can inject latency,
+429 responses with a `retry_after` parameter and 5xx errors.
+
+Run it in-process:
+
+    with FakeBotAPI(latency=0.05, rate_limit_rate=0.01) as server, use_fake_bot_api(server):
+        ...  # Everything the default bot posts goes to the fake server.
+    print(server.calls)
+
+or as a subprocess:
+
+    python -m django_telegram_app.bot.testing.fakeserver --port 8081 --error-rate 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django_telegram_app.conf import DEFAULT_BOT
+
+FAKE_BOT_TOKEN = "123456:fake-token"
+
+
+@dataclass
+class ApiCall:
+    """A call received by the fake server."""
+
+    method: str
+    token: str
+    payload: dict
+    status_code: int
+    timestamp: float = field(default_factory=time.time)
+
+
+class FakeBotAPI:
+    """A fake Telegram Bot API HTTP server.
+
+    Supported methods are sendMessage, editMessageText, sendPhoto, sendDocument, getFile, getUpdates, setMyCommands and
+    getMyCommands, all other methods answer `{"ok": true, "result": true}`. Updates for getUpdates are added with
+    `add_update`, files for getFile and downloads with `add_file`. Uploaded files are recorded as
+    {"filename", "size", "sha256"} and get the file_id "file-<sha256>", other file_ids are rejected.
+
+    Failures are injected randomly with `error_rate` (a 500 response) and `rate_limit_rate` (a 429 response with
+    `retry_after`), or deterministically with `fail_next`. Calls for chats passed to `block_chat` are answered with a
+    403, like for users that blocked the bot. Every response is delayed by `latency` seconds.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: int | None = None,
+    ):
+        """Initialize the server, it starts listening on `start`.
+
+        With port 0 the operating system picks a free port, see `url`.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.calls: list[ApiCall] = []
+        self._random = random.Random(seed)
+        self._scripted_failures: list[int] = []
+        self._blocked_chat_ids: set[int] = set()
+        self._files: dict[str, tuple[dict, bytes]] = {}
+        self._updates: list[dict] = []
+        self._commands: dict[str, list[dict]] = {}
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """Return the root URL of the server."""
+        return f"http://{self.host}:{self.port}"
+
+    def bot_url(self, token: str = FAKE_BOT_TOKEN) -> str:
+        """Return a BOT_URL setting that points to this server."""
+        return f"{self.url}/bot{token}/"
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        """Start the server."""
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop the server."""
+        self.stop()
+
+    def fail_next(self, status_code: int, count: int = 1):
+        """Answer the next `count` calls with the given status code."""
+        with self._lock:
+            self._scripted_failures.extend([status_code] * count)
+
+    def block_chat(self, chat_id: int):
+        """Answer all further calls for the given chat as if the user blocked the bot."""
+        with self._lock:
+            self._blocked_chat_ids.add(chat_id)
+
+    def add_file(self, content: bytes, file_path: str = "documents/file.bin") -> dict:
+        """Add a file users can send and return its Document object, getFile and downloads serve it."""
+        file_id = f"file-{hashlib.sha256(content).hexdigest()}"
+        file = {"file_id": file_id, "file_unique_id": file_id, "file_size": len(content), "file_path": file_path}
+        with self._lock:
+            self._files[file_id] = (file, content)
+        return {key: value for key, value in file.items() if key != "file_path"}
+
+    def get_file_content(self, file_path: str) -> bytes | None:
+        """Return the content of the added file with the given file_path, if any."""
+        with self._lock:
+            return next((content for file, content in self._files.values() if file["file_path"] == file_path), None)
+
+    def add_update(self, update: dict) -> dict:
+        """Add an update for getUpdates, an update_id is assigned if it has none."""
+        with self._lock:
+            update = {"update_id": next(self._update_ids), **update}
+            self._updates.append(update)
+        return update
+
+    def get_calls(self, method: str | None = None) -> list[ApiCall]:
+        """Return the recorded calls, optionally only those of the given method."""
+        with self._lock:
+            return [call for call in self.calls if method is None or call.method == method]
+
+    def reset(self):
+        """Forget the recorded calls, pending failures and updates."""
+        with self._lock:
+            self.calls.clear()
+            self._scripted_failures.clear()
+            self._updates.clear()
+
+    def handle(self, token: str, method: str, payload: dict) -> tuple[int, dict]:
+        """Return the status code and body of the response to a call and record the call."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            status_code, body = self._respond(method, payload)
+            self.calls.append(ApiCall(method=method, token=token, payload=payload, status_code=status_code))
+        return status_code, body
+
+    def _respond(self, method: str, payload: dict) -> tuple[int, dict]:
+        failure = self._pick_failure()
+        if failure == 429:
+            return 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+        if failure is not None:
+            return failure, {"ok": False, "error_code": failure, "description": "Internal Server Error"}
+        if payload.get("chat_id") in self._blocked_chat_ids:
+            return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+        if method == "getFile" and payload.get("file_id") not in self._files:
+            return 400, {"ok": False, "error_code": 400, "description": "Bad Request: invalid file_id"}
+        if method in ("sendPhoto", "sendDocument") and not _is_known_media(payload.get(method[4:].lower())):
+            return 400, {"ok": False, "error_code": 400, "description": "Bad Request: wrong file identifier specified"}
+        return 200, {"ok": True, "result": self._get_result(method, payload)}
+
+    def _get_result(self, method: str, payload: dict):
+        if method in ("sendMessage", "editMessageText"):
+            return self._message(method, payload)
+        if method in ("sendPhoto", "sendDocument"):
+            kind = "photo" if method == "sendPhoto" else "document"
+            media = payload.get(kind)
+            file_id = f"file-{media['sha256']}" if isinstance(media, dict) else media
+            file = {"file_id": file_id, "file_unique_id": file_id}
+            return {**self._message(method, payload), kind: [file] if kind == "photo" else file}
+        if method == "getFile":
+            return self._files[payload["file_id"]][0]
+        if method == "getUpdates":
+            offset = int(payload.get("offset") or 0)
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            return self._updates[: int(payload.get("limit") or 100)]
+        if method == "setMyCommands":
+            self._commands[_commands_key(payload)] = payload.get("commands", [])
+        if method == "getMyCommands":
+            return self._commands.get(_commands_key(payload), [])
+        return True
+
+    def _pick_failure(self) -> int | None:
+        if self._scripted_failures:
+            return self._scripted_failures.pop(0)
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def _message(self, method: str, payload: dict) -> dict:
+        message_id = payload.get("message_id") if method == "editMessageText" else None
+        return {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": payload.get("chat_id"), "type": "private"},
+            "text": payload.get("text", ""),
+        }
+
+
+def _is_known_media(media) -> bool:
+    """Return whether the media is an upload, a URL or a file_id this server handed out."""
+    return not isinstance(media, str) or "://" in media or media.startswith("file-")
+
+
+@contextmanager
+def use_fake_bot_api(
+    server: FakeBotAPI, token: str = FAKE_BOT_TOKEN, bot_name: str = DEFAULT_BOT
+) -> Iterator[FakeBotAPI]:
+    """Point the BOT_URL of the given bot to the fake server within the context."""
+    from django_telegram_app.conf import settings
+
+    if bot_name == DEFAULT_BOT:
+        patcher = patch.object(settings, "BOT_URL", server.bot_url(token))
+    else:
+        patcher = patch.dict(settings.BOTS[bot_name], {"BOT_URL": server.bot_url(token)})
+    with patcher:
+        yield server
+
+
+def _read_request_body(handler: BaseHTTPRequestHandler) -> bytes:
+    """Read the request body, decoding chunked transfer encoding."""
+    if handler.headers.get("Transfer-Encoding", "").lower() != "chunked":
+        return handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+    chunks = []
+    while size := int(handler.rfile.readline().split(b";")[0], 16):
+        chunks.append(handler.rfile.read(size))
+        handler.rfile.readline()
+    handler.rfile.readline()
+    return b"".join(chunks)
+
+
+def _parse_multipart(content_type: str, body: bytes) -> dict:
+    """Return the fields of a multipart/form-data body, files are summarized instead of included."""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    if not message.is_multipart():
+        raise ValueError("Invalid multipart body.")
+    payload: dict = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        content = part.get_payload(decode=True)
+        if not isinstance(content, bytes):
+            content = b""
+        filename = part.get_filename()
+        if filename is not None:
+            payload[name] = {"filename": filename, "size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+            continue
+        value = content.decode()
+        try:
+            payload[name] = json.loads(value) if value[:1] in ("{", "[") else value
+        except ValueError:
+            payload[name] = value
+    return payload
+
+
+def _commands_key(payload: dict) -> str:
+    return json.dumps([payload.get("scope"), payload.get("language_code", "")], sort_keys=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Route /bot<token>/<method> requests to the fake server."""
+
+    protocol_version = "HTTP/1.1"
+    fake_server: FakeBotAPI
+
+    def do_GET(self):  # noqa: N802
+        """Handle a GET request, /file/bot<token>/<file_path> downloads a file."""
+        if self.path.startswith("/file/"):
+            self._send_file(self.path.removeprefix("/file/").partition("/")[2])
+            return
+        self._handle({})
+
+    def do_POST(self):  # noqa: N802
+        """Handle a POST request with a JSON or multipart/form-data body."""
+        try:
+            body = _read_request_body(self)
+            if self.headers.get_content_type() == "multipart/form-data":
+                payload = _parse_multipart(self.headers["Content-Type"], body)
+            else:
+                payload = json.loads(body) if body else {}
+        except ValueError:
+            self._send(400, {"ok": False, "error_code": 400, "description": "Bad Request: invalid request body"})
+            return
+        self._handle(payload)
+
+    def log_message(self, format, *args):  # noqa: A002  # pylint: disable=redefined-builtin
+        """Do not log requests to stderr."""
+
+    def _handle(self, payload: dict):
+        prefix, _, method = self.path.split("?", 1)[0].lstrip("/").partition("/")
+        if not prefix.startswith("bot") or not method:
+            self._send(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            return
+        self._send(*self.fake_server.handle(prefix.removeprefix("bot"), method, payload))
+
+    def _send_file(self, file_path: str):
+        content = self.fake_server.get_file_content(file_path)
+        if content is None:
+            self._send(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            return
+        self._write(200, "application/octet-stream", content)
+
+    def _send(self, status_code: int, body: dict):
+        self._write(status_code, "application/json", json.dumps(body).encode())
+
+    def _write(self, status_code: int, content_type: str, content: bytes):
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def _make_handler(server: FakeBotAPI) -> type[BaseHTTPRequestHandler]:
+    return type("Handler", (_Handler,), {"fake_server": server})
+
+
+def main(argv: list[str] | None = None):
+    """Run the fake server until interrupted."""
+    parser = argparse.ArgumentParser(description="Run a fake Telegram Bot API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to delay every response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with a 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls answered with a 429.")
+    parser.add_argument("--retry-after", type=int, default=1, help="The retry_after parameter of 429 responses.")
+    parser.add_argument("--seed", type=int, default=None)
+    options = parser.parse_args(argv)
+
+    server = FakeBotAPI(
+        host=options.host,
+        port=options.port,
+        latency=options.latency,
+        error_rate=options.error_rate,
+        rate_limit_rate=options.rate_limit_rate,
+        retry_after=options.retry_after,
+        seed=options.seed,
+    )
+    server.start()
+    print(f"Fake Bot API listening, use BOT_URL={server.bot_url()}", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        counts: dict[tuple[str, int], int] = {}
+        for call in server.get_calls():
+            counts[(call.method, call.status_code)] = counts.get((call.method, call.status_code), 0) + 1
+        for (method, status_code), count in sorted(counts.items()):
+            print(f"{method} {status_code}: {count}")
+
+
+if __name__ == "__main__":
+    main()
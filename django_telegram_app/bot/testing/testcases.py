@@ -1,21 +1,29 @@
 """Reusable testcases for Telegram bot app."""
 
 import warnings
+from typing import Any
 from unittest.mock import MagicMock, patch
 
 from django.test.testcases import TestCase
 from django.urls import reverse
 
-from django_telegram_app.conf import settings
+from django_telegram_app.conf import DEFAULT_BOT, settings
 
 
 class TelegramBotTestCase(TestCase):
-    """Base test case for Telegram bot tests."""
+    """Base test case for Telegram bot tests.
+
+    Set `bot_name` to test a bot other than the default bot.
+    """
+
+    bot_name = DEFAULT_BOT
 
     @property
     def webhook_url(self):
-        """Return the webhook URL."""
-        return reverse("webhook")
+        """Return the webhook URL of the bot under test."""
+        if self.bot_name == DEFAULT_BOT:
+            return reverse("webhook")
+        return reverse(f"webhook-{self.bot_name}")
 
     @classmethod
     def tearDownClass(cls):
@@ -70,7 +78,7 @@ class TelegramBotTestCase(TestCase):
         response = self.client.post(
             self.webhook_url,
             data=data,
-            headers={"X-Telegram-Bot-Api-Secret-Token": settings.WEBHOOK_TOKEN},
+            headers={"X-Telegram-Bot-Api-Secret-Token": settings.get_bot(self.bot_name).WEBHOOK_TOKEN},
             content_type="application/json",
         )
         if verify:
@@ -90,15 +98,16 @@ class TelegramBotTestCase(TestCase):
         return self.fake_bot_post.call_args[1]["payload"]["text"]
 
     @staticmethod
-    def construct_telegram_update(message_text: str):
+    def construct_telegram_update(message_text: str) -> dict[str, Any]:
         """Construct a minimal telegram update."""
         return {"message": {"chat": {"id": 123456789}, "text": message_text}}
 
     @staticmethod
-    def construct_telegram_callback_query(callback_data: str):
+    def construct_telegram_callback_query(callback_data: str) -> dict[str, Any]:
         """Construct a minimal telegram callback query."""
         return {
             "callback_query": {
+                "id": "1",
                 "message": {"message_id": 123, "chat": {"id": 123456789, "first_name": "test", "type": "private"}},
                 "data": callback_data,
                 "from": {"id": 123456789, "is_bot": False, "first_name": "test"},
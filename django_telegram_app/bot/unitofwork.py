@@ -0,0 +1,102 @@
+"""Gather the writes made while handling an update and flush them in a single transaction.
+
+Handling one update can save the chat's telegram settings several times and create callback data and keyboards for
+many buttons. Within a unit of work, these writes are deferred and flushed together: each telegram settings instance
+is saved once, and callback data and keyboards are inserted in bulk, all in the same transaction.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+from django.db import router, transaction
+
+from django_telegram_app.bot import callbackcache
+from django_telegram_app.models import CallbackData, CallbackKeyboard
+
+if TYPE_CHECKING:
+    from django_telegram_app.models import AbstractTelegramSettings
+
+
+class UnitOfWork:
+    """Collect deferred writes until they are flushed."""
+
+    def __init__(self):
+        """Initialize an empty unit of work."""
+        self.settings: dict[int, AbstractTelegramSettings] = {}
+        self.callbacks: dict[str, CallbackData] = {}
+        self.keyboards: dict[str, CallbackKeyboard] = {}
+
+    def save_settings(self, telegram_settings: AbstractTelegramSettings):
+        """Save the telegram settings when the unit of work is flushed."""
+        self.settings[id(telegram_settings)] = telegram_settings
+
+    def add_callback(self, callback_data: CallbackData):
+        """Insert the callback data when the unit of work is flushed."""
+        self.callbacks[str(callback_data.token)] = callback_data
+
+    def add_keyboard(self, keyboard: CallbackKeyboard):
+        """Insert the keyboard when the unit of work is flushed, unless a keyboard with the same key exists."""
+        self.keyboards.setdefault(keyboard.key, keyboard)
+
+    def flush(self):
+        """Write all deferred changes and empty the unit of work."""
+        settings, self.settings = self.settings, {}
+        callbacks, self.callbacks = self.callbacks, {}
+        keyboards, self.keyboards = self.keyboards, {}
+        if callbacks:
+            CallbackData.objects.bulk_create(callbacks.values())
+        if keyboards:
+            CallbackKeyboard.objects.bulk_create(keyboards.values(), ignore_conflicts=True)
+        callbackcache.add(callbacks.values(), keyboards.values())
+        for telegram_settings in settings.values():
+            telegram_settings.save()
+
+
+_unit_of_work: ContextVar[UnitOfWork | None] = ContextVar("unit_of_work", default=None)
+
+
+@contextmanager
+def unit_of_work() -> Iterator[UnitOfWork]:
+    """Run the context in a transaction and flush the deferred writes at the end of it.
+
+    When an exception is raised, the deferred writes are discarded and the transaction is rolled back.
+    Nested contexts share the outermost unit of work.
+    """
+    current = _unit_of_work.get()
+    if current is not None:
+        yield current
+        return
+
+    work = UnitOfWork()
+    with transaction.atomic(using=router.db_for_write(CallbackData, transaction=True)):
+        token = _unit_of_work.set(work)
+        try:
+            yield work
+        finally:
+            _unit_of_work.reset(token)
+        work.flush()
+
+
+def get_unit_of_work() -> UnitOfWork | None:
+    """Return the current unit of work, if any."""
+    return _unit_of_work.get()
+
+
+def save_settings(telegram_settings: AbstractTelegramSettings):
+    """Save the telegram settings, or defer the save to the end of the current unit of work."""
+    work = _unit_of_work.get()
+    if work is None:
+        telegram_settings.save()
+    else:
+        work.save_settings(telegram_settings)
+
+
+def flush():
+    """Write the deferred changes of the current unit of work, if any, without ending it."""
+    work = _unit_of_work.get()
+    if work is not None:
+        work.flush()
@@ -0,0 +1,89 @@
+"""Do the work of the first update ahead of time, so the first users of a new process do not wait for it.
+
+The first update handled by a process discovers and imports the commands, loads the translation catalogs, renders the
+help text and opens the connection to the Bot API. `warmup` runs these phases when the process starts instead, e.g.
+from a gunicorn hook or, with `WARMUP_ON_READY`, when Django is set up.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+
+import requests
+from django.conf import settings as django_settings
+from django.utils.translation import override
+
+from django_telegram_app import get_telegram_settings_model
+from django_telegram_app.bot import bot, get_command_class, get_commands, resilience
+from django_telegram_app.conf import settings
+
+
+def warmup(connect: bool = True) -> dict[str, float]:
+    """Run the warm-up phases and return the number of seconds each phase took, keyed by phase name.
+
+    The phases are "commands", "imports", "translations", "help" and, if connect is True, "http", which opens a
+    pooled connection to the Bot API for every bot. A phase that fails is logged and skipped, so warming up never
+    keeps a process from starting.
+    """
+    phases: list[tuple[str, Callable[[], object]]] = [
+        ("commands", get_commands),
+        ("imports", _import_commands),
+        ("translations", _load_translations),
+        ("help", _render_help),
+    ]
+    if connect:
+        phases.append(("http", _connect))
+
+    timings = {}
+    for name, phase in phases:
+        start = time.perf_counter()
+        try:
+            phase()
+        except Exception:  # pylint: disable=broad-exception-caught
+            logging.exception(f"Warm-up phase {name} failed")
+        timings[name] = time.perf_counter() - start
+    logging.info("Warmed up: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
+    return timings
+
+
+def get_languages() -> list[str | None]:
+    """Return the languages to warm up: those of the `LANGUAGES` setting if it is set, else `LANGUAGE_CODE`.
+
+    None, which stands for the untranslated texts, is always included.
+    """
+    if not django_settings.USE_I18N:
+        return [None]
+    if django_settings.is_overridden("LANGUAGES"):
+        return [None, *(code for code, _name in django_settings.LANGUAGES)]
+    return [None, django_settings.LANGUAGE_CODE]
+
+
+def _import_commands():
+    for name, app_name in get_commands().items():
+        get_command_class(app_name, name)
+
+
+def _load_translations():
+    for language in get_languages():
+        with override(language):
+            pass  # Activating a language loads its catalogs
+
+
+def _render_help():
+    telegram_settings = get_telegram_settings_model()(chat_id=0)
+    for bot_name in settings.get_bots():
+        with bot.use_bot(bot_name):
+            for language in get_languages():
+                with override(language):
+                    bot.get_help_text(telegram_settings)
+
+
+def _connect():
+    for bot_name in settings.get_bots():
+        with bot.use_bot(bot_name):
+            try:
+                bot.post("getMe", payload={})
+            except (requests.RequestException, resilience.CircuitOpenError) as exc:
+                logging.warning(f"Could not connect bot {bot_name} to the Bot API: {exc!r}")
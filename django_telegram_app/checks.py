@@ -1,10 +1,11 @@
 """Checks for the telegram app."""
 
+from django.core import checks
 from django.core.checks import Error, register
 from django.core.exceptions import ImproperlyConfigured
 
 from django_telegram_app import get_telegram_settings_model
-from django_telegram_app.bot import get_commands
+from django_telegram_app.bot import discover_commands, get_commands, load_command_manifest
 from django_telegram_app.conf import settings
 from django_telegram_app.models import AbstractTelegramSettings
 
@@ -81,3 +82,31 @@ def check_get_commands(app_configs, **kwargs):  # noqa: ARG001  # pylint: disabl
             )
         )
     return errors
+
+
+@register()
+def check_command_manifest(app_configs, **kwargs):  # noqa: ARG001  # pylint: disable=unused-argument
+    """Check that the COMMAND_MANIFEST, if configured, can be read and lists the currently discovered commands."""
+    if not settings.COMMAND_MANIFEST:
+        return []
+
+    try:
+        manifest = load_command_manifest()
+    except (OSError, ValueError, KeyError) as exc:
+        return [
+            Error(
+                f"Error reading the command manifest: {exc!r}",
+                hint="Run the buildcommandmanifest management command.",
+                id="telegram.E006",
+            )
+        ]
+
+    if {name: info["app"] for name, info in manifest.items()} != discover_commands():
+        return [
+            checks.Warning(
+                "The command manifest is out of date.",
+                hint="Run the buildcommandmanifest management command.",
+                id="telegram.W001",
+            )
+        ]
+    return []
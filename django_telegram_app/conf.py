@@ -1,5 +1,7 @@
 """Telegram configuration."""
 
+import functools
+
 from django.conf import settings as django_settings
 from django.utils.translation import gettext_lazy as _
 
@@ -11,18 +13,84 @@ DEFAULTS = {
     "REGISTER_DEFAULT_ADMIN": True,
     "HELP_TEXT_INTRO": _("Currently available commands:"),
     "HELP_RENDERER": None,
+    "QUEUE_UPDATES": False,
+    "QUEUE_CLAIM_TIMEOUT": 300,
+    "QUEUE_MAX_ATTEMPTS": 3,
+    "API_POLICIES": {},
+    "COMMAND_MANIFEST": None,
+    "COMMANDS": None,
+    "BOTS": {},
+    "HTTP_POOL_SIZE": 10,
+    "BROADCAST_RATE_LIMIT": 25,
+    "ATOMIC_UPDATES": True,
+    "OFFLOAD_EXECUTOR": "thread",
+    "OFFLOAD_WORKERS": 4,
+    "OFFLOAD_CHAT_ACTION_INTERVAL": 4,
+    "WEBHOOK_MAX_IN_FLIGHT": None,
+    "WEBHOOK_MAX_IN_FLIGHT_PER_CHAT": None,
+    "WEBHOOK_RETRY_AFTER": 1,
+    "CACHE_ALIAS": "default",
+    "CLICK_DEDUPLICATION": True,
+    "CLICK_CLAIM_TIMEOUT": 60,
+    "CALLBACK_CACHE_TIMEOUT": None,
+    "PRIMARY_DATABASE": "default",
+    "REPLICA_DATABASES": [],
+    "REPLICA_STICKY_SECONDS": 10,
+    "WARMUP_ON_READY": False,
+    "FLOOD_RATE_LIMIT": None,
+    "FLOOD_WINDOW": 60,
+    "FLOOD_REPLY_TEXT": _("You are sending too many messages, please slow down."),
 }
 REQUIRED = ["BOT_URL"]
+DEFAULT_BOT = "default"
+BOT_DEFAULTS = {
+    "WEBHOOK_TOKEN": "",
+    "COMMANDS": None,
+}
+BOT_REQUIRED = ["BOT_URL"]
+
+
+class BotSettings:
+    """Settings of a single bot.
+
+    The default bot reads its settings from the top-level TELEGRAM settings, all other bots are configured under
+    TELEGRAM["BOTS"]. A bot's WEBHOOK_URL defaults to "<name>/<WEBHOOK_URL>".
+    """
+
+    def __init__(self, name: str, app_settings: "AppSettings", bot_settings: dict | None = None):
+        """Initialize the bot settings.
+
+        If bot_settings is None, the settings are read from the top-level settings.
+        """
+        self.name = name
+        self._app_settings = app_settings
+        self._bot_settings = bot_settings
+
+    def __getattr__(self, name):
+        """Get a setting by name."""
+        if self._bot_settings is None:
+            return getattr(self._app_settings, name)
+        if name == "WEBHOOK_URL" and name not in self._bot_settings:
+            return f"{self.name}/{self._app_settings.WEBHOOK_URL}"
+        return {**BOT_DEFAULTS, **self._bot_settings}[name]
+
+    def missing_settings(self):
+        """Return a list of missing required settings."""
+        if self._bot_settings is None:
+            return []
+        return [f"BOTS.{self.name}.{k}" for k in BOT_REQUIRED if k not in self._bot_settings]
 
 
 class AppSettings:
-    """Telegram app settings."""
+    """Telegram app settings.
 
-    def __init__(self):
-        """Initialize the settings."""
+    The TELEGRAM setting is read on first use, so the app's modules can be imported before Django is configured.
+    """
+
+    @functools.cached_property
+    def _settings(self) -> dict:
         app_settings = getattr(django_settings, "TELEGRAM", {}) or {}
-        merged_settings = {**DEFAULTS, **app_settings}
-        self._settings = merged_settings
+        return {**DEFAULTS, **app_settings}
 
     def __getattr__(self, name):
         """Get a setting by name."""
@@ -30,7 +98,23 @@ class AppSettings:
 
     def missing_settings(self):
         """Return a list of missing required settings."""
-        return [k for k in REQUIRED if k not in self._settings]
+        missing = [k for k in REQUIRED if k not in self._settings]
+        for bot in self.get_bots().values():
+            missing.extend(bot.missing_settings())
+        return missing
+
+    def get_bot(self, name: str = DEFAULT_BOT) -> BotSettings:
+        """Return the settings of the bot with the given name.
+
+        Raise a KeyError if no bot with the given name is configured.
+        """
+        if name == DEFAULT_BOT:
+            return BotSettings(DEFAULT_BOT, self)
+        return BotSettings(name, self, self.BOTS[name])
+
+    def get_bots(self) -> dict[str, BotSettings]:
+        """Return the settings of all configured bots, keyed by name."""
+        return {name: self.get_bot(name) for name in [DEFAULT_BOT, *self.BOTS]}
 
 
 settings = AppSettings()
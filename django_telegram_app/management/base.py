@@ -4,11 +4,14 @@ Note:
     This module's command-class does not create an actual CLI command, but can be used by actual commands.
 """
 
+from collections.abc import Callable
+
 from django.core.management.base import BaseCommand
 
 from django_telegram_app import get_telegram_settings_model
 from django_telegram_app.bot.base import BaseBotCommand
-from django_telegram_app.bot.bot import handle_update
+from django_telegram_app.bot.bot import SendSummary, handle_update, send_rendered_message_many, use_bot
+from django_telegram_app.conf import DEFAULT_BOT
 from django_telegram_app.models import AbstractTelegramSettings
 
 
@@ -19,9 +22,12 @@ class BaseManagementCommand(BaseCommand):
         - the `should_run` method to determine if the command should run.
         - the `get_telegram_settings_filter` method to filter telegram settings.
         - the `handle_command` method to customize the update handling
+
+    Set `bot_name` to start the command with a bot other than the default bot.
     """
 
     command: type[BaseBotCommand] | None = None
+    bot_name: str = DEFAULT_BOT
 
     def add_arguments(self, parser):
         """Add command arguments."""
@@ -81,4 +87,19 @@ class BaseManagementCommand(BaseCommand):
             A minimal update is created with a message containing the command, this update is not persisted.
         """
         update = {"message": {"chat": {"id": telegram_settings.chat_id}, "text": command_text}}
-        handle_update(update=update, telegram_settings=telegram_settings)
+        handle_update(update=update, telegram_settings=telegram_settings, bot_name=self.bot_name)
+
+    def announce(
+        self, text: str | Callable[[AbstractTelegramSettings], str], reply_markup: dict | None = None
+    ) -> SendSummary:
+        """Send a message to every chat that matches `get_telegram_settings_filter` and return the outcome per chat.
+
+        text is either a string or a callable that renders the text for the given telegram settings.
+        The messages are sent concurrently by this command's bot, see `send_rendered_message_many`.
+        """
+        render = text if callable(text) else lambda _telegram_settings: text
+        telegram_settings = get_telegram_settings_model().objects.filter(**self.get_telegram_settings_filter())
+        with use_bot(self.bot_name):
+            summary = send_rendered_message_many(render, telegram_settings, reply_markup=reply_markup)
+        self.stdout.write(self.style.SUCCESS(str(summary)))
+        return summary
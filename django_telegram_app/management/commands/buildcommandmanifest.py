@@ -0,0 +1,34 @@
+"""Django command to build the telegram command manifest."""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_telegram_app.bot import build_command_manifest
+from django_telegram_app.conf import settings as app_settings
+
+
+class Command(BaseCommand):
+    """Build the telegram command manifest."""
+
+    help = "Writes a static manifest of all telegram commands, which is used instead of scanning the filesystem."
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            "--output",
+            type=str,
+            help="The file to write the manifest to (default: the COMMAND_MANIFEST setting).",
+        )
+
+    def handle(self, *_args, **options):
+        """Discover all commands and write their metadata to the manifest file."""
+        output = options.get("output") or app_settings.COMMAND_MANIFEST
+        if not output:
+            raise CommandError("Provide --output or configure the COMMAND_MANIFEST setting.")
+
+        manifest = build_command_manifest()
+        with open(output, "w", encoding="utf-8") as manifest_file:
+            json.dump({"commands": manifest}, manifest_file, indent=2, ensure_ascii=False)
+            manifest_file.write("\n")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(manifest)} commands to {output}."))
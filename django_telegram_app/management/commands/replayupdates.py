@@ -0,0 +1,350 @@
+"""Django command to replay stored telegram updates for capacity planning."""
+
+import contextlib
+import copy
+import gzip
+import json
+import statistics
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+
+from django_telegram_app import backpressure, get_telegram_settings_model, views
+from django_telegram_app.bot import bot
+from django_telegram_app.bot.base import TelegramUpdate
+from django_telegram_app.bot.testing.fakeserver import FakeBotAPI, use_fake_bot_api
+from django_telegram_app.conf import DEFAULT_BOT
+from django_telegram_app.conf import settings as app_settings
+from django_telegram_app.models import Message
+
+CHAT_ID_KEYS = ("chat", "from", "sender_chat", "user")
+
+
+class Command(BaseCommand):
+    """Replay stored telegram updates."""
+
+    help = (
+        "Replays stored or archived telegram updates against handle_update or the webhook view at a controlled rate "
+        "and prints a throughput, latency and error summary. By default, chat ids are remapped into a sandbox and "
+        "all Bot API calls go to an in-process fake Bot API server."
+    )
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            "--file",
+            type=Path,
+            default=None,
+            help="Replay the updates in this JSON lines file (optionally gzipped) instead of the stored messages.",
+        )
+        parser.add_argument(
+            "--bot",
+            type=str,
+            default=DEFAULT_BOT,
+            help="The name of the bot to replay the updates with (default: 'default').",
+        )
+        parser.add_argument("--limit", type=int, default=None, help="The maximum number of updates to replay.")
+        parser.add_argument(
+            "--target",
+            choices=["handler", "webhook"],
+            default="handler",
+            help="Drive handle_update directly or go through the webhook view (default: handler).",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="The target number of updates per second (default: as fast as possible).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="The number of updates replayed at the same time (default: 1).",
+        )
+        parser.add_argument(
+            "--sandbox-start",
+            type=int,
+            default=2_000_000_000,
+            help="The first chat id of the sandbox the chat ids are remapped into (default: 2000000000).",
+        )
+        parser.add_argument(
+            "--no-remap",
+            action="store_true",
+            default=False,
+            help="Keep the original chat ids. Only use this against a fake Bot API.",
+        )
+        parser.add_argument(
+            "--real-api",
+            action="store_true",
+            default=False,
+            help="Call the bot's configured BOT_URL instead of the in-process fake Bot API.",
+        )
+        parser.add_argument(
+            "--send-to-real-chats",
+            action="store_true",
+            default=False,
+            help="Confirm that --no-remap --real-api may send the replayed messages to the original, real chats.",
+        )
+        parser.add_argument(
+            "--cleanup",
+            action="store_true",
+            default=False,
+            help="Delete the telegram settings and messages stored for the sandbox chats after the replay.",
+        )
+        parser.add_argument("--api-latency", type=float, default=0.0, help="Latency of the fake Bot API in seconds.")
+        parser.add_argument(
+            "--api-error-rate", type=float, default=0.0, help="Fraction of fake Bot API calls answered with a 500."
+        )
+        parser.add_argument(
+            "--api-rate-limit-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of fake Bot API calls answered with a 429.",
+        )
+
+    def handle(self, *_args, **options):
+        """Replay the updates and print a summary."""
+        try:
+            app_settings.get_bot(options["bot"])
+        except KeyError as exc:
+            raise CommandError(f"Unknown bot {options['bot']}.") from exc
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        if options["rate"] is not None and options["rate"] <= 0:
+            raise CommandError("--rate must be positive.")
+        if options["no_remap"] and options["real_api"] and not options["send_to_real_chats"]:
+            raise CommandError(
+                "--no-remap --real-api sends the replayed messages to the original chats, "
+                "pass --send-to-real-chats to confirm."
+            )
+        if options["no_remap"] and options["cleanup"]:
+            raise CommandError("--cleanup only removes sandbox chats, it cannot be combined with --no-remap.")
+        if options["real_api"] and not options["no_remap"]:
+            self.stderr.write(
+                self.style.WARNING(
+                    f"Calling the real Bot API: chat ids from {options['sandbox_start']} on may belong to real chats."
+                )
+            )
+
+        self.bot_name = options["bot"]
+        self.target = options["target"]
+        self.sandbox = None if options["no_remap"] else Sandbox(options["sandbox_start"])
+        self.latencies: list[float] = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+        server = None
+        last_message_id = Message.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        with contextlib.ExitStack() as stack:
+            if not options["real_api"]:
+                server = FakeBotAPI(
+                    latency=options["api_latency"],
+                    error_rate=options["api_error_rate"],
+                    rate_limit_rate=options["api_rate_limit_rate"],
+                )
+                stack.enter_context(server)
+                stack.enter_context(use_fake_bot_api(server, bot_name=self.bot_name))
+            started = time.perf_counter()
+            self._replay(
+                self._get_updates(options["file"], options["limit"], last_message_id),
+                options["rate"],
+                options["concurrency"],
+            )
+            elapsed = time.perf_counter() - started
+
+        self._print_summary(elapsed, server)
+        if options["cleanup"] and self.sandbox is not None:
+            settings_count, messages_count = self.sandbox.cleanup(self.bot_name, last_message_id)
+            self.stdout.write(
+                f"Removed {settings_count} telegram settings and {messages_count} messages of the sandbox chats."
+            )
+
+    def _get_updates(self, file: Path | None, limit: int | None, last_message_id: int) -> Iterator[dict]:
+        """Stream the updates from the file or from the messages stored before the replay, without loading them all."""
+        if file is not None:
+            updates = _read_json_lines(file)
+        else:
+            messages = Message.objects.filter(bot=self.bot_name, id__lte=last_message_id).order_by("id")
+            updates = (raw_message for raw_message in messages.values_list("raw_message", flat=True).iterator(1000))
+        for count, update in enumerate(updates):
+            if limit is not None and count >= limit:
+                return
+            yield update
+
+    def _replay(self, updates: Iterator[dict], rate: float | None, concurrency: int):
+        """Replay the updates, starting update n no earlier than n / rate seconds after the start."""
+        started = time.perf_counter()
+        if concurrency == 1:
+            for count, update in enumerate(updates):
+                _wait_until(started, count, rate)
+                self._replay_one(update)
+            return
+
+        in_flight = threading.BoundedSemaphore(concurrency * 2)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for count, update in enumerate(updates):
+                _wait_until(started, count, rate)
+                in_flight.acquire()
+                future = executor.submit(self._replay_in_thread, update)
+                future.add_done_callback(lambda _future: in_flight.release())
+
+    def _replay_in_thread(self, update: dict):
+        try:
+            self._replay_one(update)
+        finally:
+            connections.close_all()
+
+    def _replay_one(self, update: dict):
+        if self.sandbox is not None:
+            update = self.sandbox.remap(update)
+        started = time.perf_counter()
+        try:
+            ok = self._send(update)
+        except Exception:  # pylint: disable=broad-exception-caught
+            ok = False
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.latencies.append(latency)
+            self.errors += not ok
+
+    def _send(self, update: dict) -> bool:
+        if self.sandbox is not None:
+            self.sandbox.ensure_settings(update)
+        if self.target == "handler":
+            bot.handle_update(update, bot_name=self.bot_name)
+            return True
+        url = reverse("webhook") if self.bot_name == DEFAULT_BOT else reverse(f"webhook-{self.bot_name}")
+        request = RequestFactory().post(
+            url,
+            data=update,
+            content_type="application/json",
+            headers={"X-Telegram-Bot-Api-Secret-Token": app_settings.get_bot(self.bot_name).WEBHOOK_TOKEN},
+        )
+        response = views.webhook(request, bot_name=self.bot_name)
+        return json.loads(response.content).get("status") == "ok"
+
+    def _print_summary(self, elapsed: float, server: FakeBotAPI | None):
+        replayed = len(self.latencies)
+        throughput = replayed / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"Replayed {replayed} updates in {elapsed:.2f}s ({throughput:.1f} updates/s), {self.errors} failed."
+        )
+        if replayed:
+            latencies = sorted(latency * 1000 for latency in self.latencies)
+            p50, p95, p99 = (_percentile(latencies, percentile) for percentile in (50, 95, 99))
+            self.stdout.write(
+                f"Latency: mean {statistics.fmean(latencies):.1f}ms, p50 {p50:.1f}ms, p95 {p95:.1f}ms, "
+                f"p99 {p99:.1f}ms, max {latencies[-1]:.1f}ms."
+            )
+        if server is not None:
+            calls = server.get_calls()
+            failed_calls = sum(call.status_code != 200 for call in calls)
+            self.stdout.write(f"Bot API calls: {len(calls)}, {failed_calls} failed.")
+        style = self.style.SUCCESS if not self.errors else self.style.WARNING
+        self.stdout.write(style("Replay finished."))
+
+
+class Sandbox:
+    """Remap chat and user ids into a sandbox range, consistently for the whole replay."""
+
+    def __init__(self, start: int):
+        """Initialize the sandbox, the first remapped chat id is start."""
+        self.start = start
+        self._mapping: dict[int, int] = {}
+        self._settings_created: set[int] = set()
+        self.created_chat_ids: set[int] = set()
+        self._lock = threading.Lock()
+
+    def remap(self, update: dict) -> dict:
+        """Return a copy of the update with all chat and user ids remapped."""
+        update = copy.deepcopy(update)
+        self._remap(update)
+        return update
+
+    def ensure_settings(self, update: dict):
+        """Create the telegram settings of the update's sandbox chat if they do not exist yet."""
+        try:
+            telegram_update = TelegramUpdate(update)
+        except Exception:  # pylint: disable=broad-exception-caught
+            return  # Unsupported updates fail when they are handled.
+        with self._lock:
+            if telegram_update.chat_id in self._settings_created:
+                return
+            self._settings_created.add(telegram_update.chat_id)
+        TelegramSettingsModel = get_telegram_settings_model()
+        if not TelegramSettingsModel.objects.filter(chat_id=telegram_update.chat_id).exists():
+            TelegramSettingsModel.create_from_telegram_update(telegram_update)
+            with self._lock:
+                self.created_chat_ids.add(telegram_update.chat_id)
+
+    def cleanup(self, bot_name: str, last_message_id: int) -> tuple[int, int]:
+        """Delete the telegram settings created for the sandbox chats and the messages stored for them.
+
+        Only messages stored after last_message_id are considered. Return the number of deleted telegram settings and
+        messages. Callback data of conversations the sandbox chats left unfinished is kept, like that of any
+        abandoned conversation, because it is not linked to a chat.
+        """
+        sandbox_ids = set(self._mapping.values())
+        new_messages = Message.objects.filter(bot=bot_name, id__gt=last_message_id).values_list("id", "raw_message")
+        message_ids = [
+            message_id
+            for message_id, raw_message in new_messages.iterator(1000)
+            if backpressure.get_chat_id(raw_message) in sandbox_ids
+        ]
+        messages_count = 0
+        for start in range(0, len(message_ids), 1000):
+            messages_count += Message.objects.filter(id__in=message_ids[start : start + 1000]).delete()[0]
+        settings_count, _deleted = (
+            get_telegram_settings_model().objects.filter(chat_id__in=self.created_chat_ids).delete()
+        )
+        return settings_count, messages_count
+
+    def _remap(self, value):
+        if isinstance(value, list):
+            for item in value:
+                self._remap(item)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if key in CHAT_ID_KEYS and isinstance(item, dict) and isinstance(item.get("id"), int):
+                    item["id"] = self._get_sandbox_id(item["id"])
+                elif key == "chat_id" and isinstance(item, int):
+                    value[key] = self._get_sandbox_id(item)
+                self._remap(value[key])
+
+    def _get_sandbox_id(self, chat_id: int) -> int:
+        with self._lock:
+            if chat_id not in self._mapping:
+                self._mapping[chat_id] = self.start + len(self._mapping)
+            return self._mapping[chat_id]
+
+
+def _read_json_lines(file: Path) -> Iterator[dict]:
+    opener = gzip.open if file.suffix == ".gz" else open
+    try:
+        with opener(file, "rt", encoding="utf-8") as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+    except OSError as exc:
+        raise CommandError(f"Could not read {file}: {exc}") from exc
+
+
+def _wait_until(started: float, count: int, rate: float | None):
+    if rate is None:
+        return
+    delay = started + count / rate - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _percentile(sorted_values: list[float], percentile: int) -> float:
+    index = min(len(sorted_values) - 1, round(percentile / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
@@ -0,0 +1,66 @@
+"""Django command to reprocess failed telegram updates."""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from django_telegram_app import queue
+from django_telegram_app.models import Message
+
+
+class Command(BaseCommand):
+    """Reprocess failed telegram updates."""
+
+    help = "Handles failed telegram updates again, in parallel per chat, and clears their error on success."
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="The number of chats reprocessed in parallel (default: 4).",
+        )
+        parser.add_argument("--bot", type=str, default=None, help="Only reprocess the updates of this bot.")
+        parser.add_argument(
+            "--since",
+            type=str,
+            default=None,
+            help="Only reprocess updates received at or after this ISO 8601 datetime.",
+        )
+        parser.add_argument(
+            "--error-contains",
+            type=str,
+            default=None,
+            help="Only reprocess updates whose error contains this text.",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=int,
+            default=100,
+            help="Report progress after every this many updates (default: 100).",
+        )
+
+    def handle(self, *_args, **options):
+        """Reprocess the failed updates and report the progress."""
+        messages = Message.objects.all()
+        if options["bot"]:
+            messages = messages.filter(bot=options["bot"])
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                raise CommandError(f"Invalid datetime {options['since']!r}.")
+            messages = messages.filter(created_at__gte=since)
+        if options["error_contains"]:
+            messages = messages.filter(error__contains=options["error_contains"])
+
+        progress_every = max(1, options["progress_every"])
+
+        def report_progress(done: int, total: int):
+            if not done % progress_every or done == total:
+                self.stdout.write(f"Reprocessed {done}/{total} updates.")
+
+        processed, failed = queue.reprocess_failed(messages, workers=options["workers"], progress=report_progress)
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(
+            style(f"Reprocessed {processed + failed} updates, {processed} succeeded, {failed} failed again.")
+        )
@@ -0,0 +1,93 @@
+"""Django command to process queued telegram updates."""
+
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from django_telegram_app import queue
+
+
+class Command(BaseCommand):
+    """Process queued telegram updates."""
+
+    help = "Claims pending telegram updates from the queue and handles them."
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="The maximum number of updates a worker claims at once (default: 10).",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="The number of worker processes to start (default: 1).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="The number of seconds to wait when the queue is empty (default: 1.0).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            default=False,
+            help="Exit as soon as the queue is empty instead of waiting for new updates.",
+        )
+
+    def handle(self, *_args, **options):
+        """Start the workers.
+
+        Every worker runs the same loop: release stale claims, claim a batch of pending updates and handle them.
+        Multiple processes are forked from this process, which is why this option is only supported on platforms that
+        support the 'fork' start method.
+        """
+        processes = options["processes"]
+        if processes <= 1:
+            return self._work(options["batch_size"], options["sleep"], options["once"])
+
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise CommandError("Multiple processes require the 'fork' start method, start multiple commands instead.")
+
+        connections.close_all()  # Never share database connections with the forked processes.
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=self._work, args=(options["batch_size"], options["sleep"], options["once"]))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+
+    def _work(self, batch_size: int, sleep: float, once: bool):
+        processed = failed = 0
+        try:
+            while True:
+                queue.release_stale()
+                batch = queue.claim_batch(batch_size)
+                if not batch:
+                    if once:
+                        break
+                    time.sleep(sleep)
+                    continue
+                for message in batch:
+                    if not queue.renew_claim(message):
+                        continue  # Released as stale in the meantime.
+                    if queue.process_message(message):
+                        processed += 1
+                    else:
+                        failed += 1
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} updates, {failed} failed."))
@@ -1,10 +1,13 @@
 """Django command to set telegram commands."""
 
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 from django.core.management.base import BaseCommand, CommandError
 from django.utils.translation import override
 
-from django_telegram_app.bot import get_command_class, get_commands
+from django_telegram_app.bot import get_bot_commands, get_command_class, resilience
+from django_telegram_app.conf import DEFAULT_BOT
 from django_telegram_app.conf import settings as app_settings
 
 
@@ -36,6 +39,24 @@ class Command(BaseCommand):
             default=False,
             help="Clear the list of commands.",
         )
+        parser.add_argument(
+            "--bot",
+            type=str,
+            default=DEFAULT_BOT,
+            help="The name of the bot to set the commands for (default: 'default').",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            default=False,
+            help="Set the commands even if Telegram already has the same commands.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="The maximum number of locales to update at the same time (default: 4).",
+        )
 
     def handle(self, *_args, **options):
         """Change the list of the bot's commands.
@@ -43,28 +64,67 @@ class Command(BaseCommand):
         References: https://core.telegram.org/bots/api#setmycommands
         """
         locales = options.get("locale")
+        try:
+            self.bot_settings = app_settings.get_bot(options["bot"])
+        except KeyError as exc:
+            raise CommandError(f"Unknown bot {options['bot']}.") from exc
         if options.get("delete", False):
             return self._deletecommands("deleteMyCommands", locales)
 
         include_hidden = options.get("include_hidden", False)
-        self._setcommands("setMyCommands", include_hidden, locales)
+        self._setcommands(
+            "setMyCommands", include_hidden, locales, concurrency=options["concurrency"], force=options["force"]
+        )
 
-    def _setcommands(self, api_method_name: str, include_hidden: bool, locales: list[str] | None):
+    def _setcommands(
+        self, api_method_name: str, include_hidden: bool, locales: list[str] | None, concurrency: int, force: bool
+    ):
         """Set the bot commands for specific locales.
 
         The locales list can be empty, which indicates the commands should be set without a locale.
+        Locales are updated concurrently, at most `concurrency` at a time.
         """
-        command_info_list = self._get_command_info_list(include_hidden)
-        payload: dict = {"commands": command_info_list}
         if not locales:
-            return self._post(api_method_name, **payload)
+            return self._setcommands_for_locale(api_method_name, include_hidden, None, force)
 
-        for locale in locales:
-            with override(locale):
-                command_info_list = self._get_command_info_list(include_hidden, clear_cache=True)
-                payload: dict = {"commands": command_info_list, "language_code": locale}
-                self._post(api_method_name, **payload)
-        get_commands.cache_clear()  # Clear cache after locale-specific loading to avoid it being stuck in last locale.
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            futures = [
+                executor.submit(self._setcommands_for_locale, api_method_name, include_hidden, locale, force)
+                for locale in locales
+            ]
+            for future in futures:
+                future.result()
+
+    def _setcommands_for_locale(self, api_method_name: str, include_hidden: bool, locale: str | None, force: bool):
+        """Set the bot commands for a single locale, unless Telegram already has the same commands.
+
+        The translation is activated for the current thread only, which is why the process-wide command cache is not
+        affected.
+        """
+        with override(locale):
+            command_info_list = self._get_command_info_list(include_hidden)
+        payload: dict = {"commands": command_info_list}
+        if locale:
+            payload["language_code"] = locale
+
+        if not force and self._get_current_commands(locale) == command_info_list:
+            self.stdout.write(self.style.NOTICE(f"Commands for locale '{locale or 'default'}' are unchanged."))
+            return
+        self._post(api_method_name, **payload)
+
+    def _get_current_commands(self, locale: str | None) -> list[dict[str, str]] | None:
+        """Return the commands Telegram currently has for the locale or None if they could not be retrieved.
+
+        References: https://core.telegram.org/bots/api#getmycommands
+        """
+        payload = {"language_code": locale} if locale else {}
+        try:
+            response_json = self._call("getMyCommands", **payload)
+        except CommandError:
+            return None
+        if not response_json.get("ok") or not isinstance(response_json.get("result"), list):
+            return None
+        return [{"command": cmd["command"], "description": cmd["description"]} for cmd in response_json["result"]]
 
     def _deletecommands(self, api_method_name: str, locales: list[str] | None):
         """Delete the bot commands for specific locales.
@@ -80,23 +140,47 @@ class Command(BaseCommand):
             self._post(api_method_name, **payload)
 
     def _post(self, api_method_name: str, **kwargs):
-        root_url = app_settings.BOT_URL.rstrip("/")
-        endpoint = f"{root_url}/{api_method_name}"
-        response = requests.post(endpoint, json=kwargs, timeout=5)
-        response_json: dict = response.json()
+        response_json = self._call(api_method_name, **kwargs)
         if not response_json.get("ok"):
             msg = f"Something went wrong while calling {api_method_name}.\n{response_json}"
             self.stderr.write(self.style.ERROR(msg))
             raise CommandError(msg)
         self.stdout.write(self.style.SUCCESS(f"Successfully called {api_method_name}."))
 
-    def _get_command_info_list(self, include_hidden: bool, clear_cache: bool = False) -> list[dict[str, str]]:
+    def _call(self, api_method_name: str, **kwargs) -> dict:
+        """Call the API method and return the response's JSON.
+
+        Raise a CommandError with Telegram's description of the error if the call fails.
+        """
+        root_url = self.bot_settings.BOT_URL.rstrip("/")
+        endpoint = f"{root_url}/{api_method_name}"
+        try:
+            response = resilience.call(
+                api_method_name,
+                lambda timeout: requests.post(endpoint, json=kwargs, timeout=timeout),
+                self.bot_settings.name,
+            )
+        except (requests.RequestException, resilience.CircuitOpenError) as exc:
+            msg = f"Something went wrong while calling {api_method_name}.\n{_get_error_description(exc)}"
+            raise CommandError(msg) from exc
+        return response.json()
+
+    def _get_command_info_list(self, include_hidden: bool) -> list[dict[str, str]]:
         command_info_list = []
-        if clear_cache:
-            get_commands.cache_clear()
-        for command_name, app_name in get_commands().items():
+        for command_name, app_name in get_bot_commands(self.bot_settings).items():
             command = get_command_class(app_name, command_name)
             if not include_hidden and command.exclude_from_help:
                 continue
-            command_info_list.append({"command": command.get_name(), "description": command.description})
+            command_info_list.append({"command": command.get_name(), "description": str(command.description)})
         return command_info_list
+
+
+def _get_error_description(exc: Exception) -> str:
+    """Return Telegram's description of the error, or the error itself if the response has none."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return str(exc)
+    try:
+        return str(response.json()["description"])
+    except (ValueError, KeyError, TypeError):
+        return str(exc)
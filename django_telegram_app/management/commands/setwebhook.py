@@ -3,6 +3,7 @@
 import requests
 from django.core.management.base import BaseCommand, CommandError
 
+from django_telegram_app.conf import DEFAULT_BOT
 from django_telegram_app.conf import settings as app_settings
 
 
@@ -17,6 +18,12 @@ class Command(BaseCommand):
             "base_url",
             help="A publicly accessible base URL used to construct the Telegram webhook (e.g. 'https://example.com').",
         )
+        parser.add_argument(
+            "--bot",
+            type=str,
+            default=DEFAULT_BOT,
+            help="The name of the bot to set the webhook for (default: 'default').",
+        )
 
     def handle(self, *_args, **options):
         """Set a webhook.
@@ -25,13 +32,17 @@ class Command(BaseCommand):
 
         References: https://core.telegram.org/bots/api#setwebhook
         """
-        root_url = app_settings.BOT_URL.rstrip("/")
+        try:
+            bot_settings = app_settings.get_bot(options["bot"])
+        except KeyError as exc:
+            raise CommandError(f"Unknown bot {options['bot']}.") from exc
+        root_url = bot_settings.BOT_URL.rstrip("/")
         endpoint = f"{root_url}/setWebhook"
-        parts = [options["base_url"], app_settings.ROOT_URL, app_settings.WEBHOOK_URL]
+        parts = [options["base_url"], app_settings.ROOT_URL, bot_settings.WEBHOOK_URL]
         url = "/".join(part.strip("/") for part in parts if part)
         args = {"url": url}
-        if app_settings.WEBHOOK_TOKEN:
-            args["secret_token"] = app_settings.WEBHOOK_TOKEN
+        if bot_settings.WEBHOOK_TOKEN:
+            args["secret_token"] = bot_settings.WEBHOOK_TOKEN
         response = requests.post(endpoint, json=args, timeout=5)
         response_json: dict = response.json()
         if not response_json.get("ok"):
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:52
+
+from django.db import migrations, models
+
+
+def mark_failed_messages(apps, schema_editor):
+    """Mark existing messages with an error as failed, all others were already processed."""
+    Message = apps.get_model('django_telegram_app', 'Message')
+    Message.objects.using(schema_editor.connection.alias).filter(error__isnull=False).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_telegram_app', '0002_remove_telegramsettings_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='attempts'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='claimed at'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='created at'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='status',
+            field=models.CharField(choices=[('pending', 'pending'), ('processing', 'processing'), ('processed', 'processed'), ('failed', 'failed')], default='processed', max_length=20, verbose_name='status'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='status',
+            field=models.CharField(choices=[('pending', 'pending'), ('processing', 'processing'), ('processed', 'processed'), ('failed', 'failed')], default='pending', max_length=20, verbose_name='status'),
+        ),
+        migrations.RunPython(mark_failed_messages, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['status', 'id'], name='message_status_idx'),
+        ),
+    ]
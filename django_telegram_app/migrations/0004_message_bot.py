@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_telegram_app', '0003_message_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='bot',
+            field=models.CharField(default='default', max_length=100, verbose_name='bot'),
+        ),
+    ]
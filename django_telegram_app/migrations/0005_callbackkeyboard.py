@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:59
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_telegram_app', '0004_message_bot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallbackKeyboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True, verbose_name='key')),
+                ('command', models.CharField(max_length=255, verbose_name='command')),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='shared data')),
+                ('buttons', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='The step, action and data of each button', verbose_name='buttons')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'callback keyboard',
+                'verbose_name_plural': 'callback keyboards',
+                'indexes': [models.Index(models.F('data__correlation_key'), name='keyboard_correlation_key_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_telegram_app', '0005_callbackkeyboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callbackdata',
+            name='correlation_key',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True, verbose_name='correlation key'),
+        ),
+        migrations.AddField(
+            model_name='callbackkeyboard',
+            name='correlation_key',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True, verbose_name='correlation key'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:01
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_correlation_keys(apps, schema_editor):
+    """Copy data["correlation_key"] to the correlation_key column in batches.
+
+    The migration is not atomic, so every batch is committed on its own and large tables are not locked at once.
+    """
+    db_alias = schema_editor.connection.alias
+    for model_name in ('CallbackData', 'CallbackKeyboard'):
+        Model = apps.get_model('django_telegram_app', model_name)
+        queryset = Model.objects.using(db_alias).filter(correlation_key__isnull=True).order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).only('pk', 'data')[:BATCH_SIZE])
+            if not batch:
+                break
+            for obj in batch:
+                correlation_key = obj.data.get('correlation_key') if isinstance(obj.data, dict) else None
+                obj.correlation_key = str(correlation_key) if correlation_key is not None else None
+            Model.objects.using(db_alias).bulk_update(batch, ['correlation_key'])
+            last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('django_telegram_app', '0006_correlation_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_correlation_keys, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='callbackdata',
+            name='callback_correlation_key_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='callbackkeyboard',
+            name='keyboard_correlation_key_idx',
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:03
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_update_ids(apps, schema_editor):
+    """Copy raw_message["update_id"] to the telegram_update_id column in batches.
+
+    The migration is not atomic, so every batch is committed on its own and large tables are not locked at once.
+    """
+    Message = apps.get_model('django_telegram_app', 'Message')
+    queryset = Message.objects.using(schema_editor.connection.alias).filter(telegram_update_id__isnull=True)
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').only('pk', 'raw_message')[:BATCH_SIZE])
+        if not batch:
+            break
+        for message in batch:
+            update_id = message.raw_message.get('update_id') if isinstance(message.raw_message, dict) else None
+            message.telegram_update_id = update_id if isinstance(update_id, int) else None
+        Message.objects.using(schema_editor.connection.alias).bulk_update(batch, ['telegram_update_id'])
+        last_pk = batch[-1].pk
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('django_telegram_app', '0007_backfill_correlation_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='telegram_update_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='update id'),
+        ),
+        migrations.RunPython(backfill_update_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='callbackdata',
+            name='command',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='command'),
+        ),
+        migrations.AlterField(
+            model_name='callbackdata',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created at'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, null=True, verbose_name='created at'),
+        ),
+    ]
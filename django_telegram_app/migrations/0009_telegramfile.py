@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_telegram_app', '0008_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='content hash')),
+                ('kind', models.CharField(choices=[('photo', 'photo'), ('document', 'document')], max_length=20, verbose_name='kind')),
+                ('bot', models.CharField(default='default', max_length=100, verbose_name='bot')),
+                ('file_id', models.CharField(max_length=255, verbose_name='file id')),
+                ('file_unique_id', models.CharField(blank=True, max_length=255, verbose_name='file unique id')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'telegram file',
+                'verbose_name_plural': 'telegram files',
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'kind', 'bot'), name='telegram_file_unique_content')],
+            },
+        ),
+    ]
@@ -9,6 +9,8 @@ from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from django_telegram_app.conf import DEFAULT_BOT
+
 if TYPE_CHECKING:
     from django_telegram_app.bot.base import TelegramUpdate
 
@@ -22,8 +24,22 @@ class Message(models.Model):
     https://core.telegram.org/bots/api#message
     """
 
+    class Status(models.TextChoices):
+        """Represent the processing status of a message."""
+
+        PENDING = "pending", _("pending")
+        PROCESSING = "processing", _("processing")
+        PROCESSED = "processed", _("processed")
+        FAILED = "failed", _("failed")
+
     raw_message = models.JSONField(verbose_name=_("raw message"))
+    telegram_update_id = models.BigIntegerField(verbose_name=_("update id"), null=True, blank=True, db_index=True)
+    bot = models.CharField(verbose_name=_("bot"), max_length=100, default=DEFAULT_BOT)
     error = models.TextField(verbose_name=_("error"), null=True, blank=True)
+    status = models.CharField(verbose_name=_("status"), max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(verbose_name=_("attempts"), default=0)
+    created_at = models.DateTimeField(verbose_name=_("created at"), auto_now_add=True, null=True, db_index=True)
+    claimed_at = models.DateTimeField(verbose_name=_("claimed at"), null=True, blank=True)
 
     @property
     def message_truncated(self):
@@ -38,6 +54,14 @@ class Message(models.Model):
         """Return the chat id from the raw message."""
         return self.raw_message.get("update_id", "unknown")
 
+    def save(self, *args, **kwargs):
+        """Save the message, copying the update id of the raw message to its indexed column."""
+        if self.telegram_update_id is None and isinstance(self.raw_message, dict):
+            update_id = self.raw_message.get("update_id")
+            if isinstance(update_id, int):
+                self.telegram_update_id = update_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         """Return the string representation of the message."""
         if self.error:
@@ -49,13 +73,14 @@ class Message(models.Model):
 
         verbose_name = _("message")
         verbose_name_plural = _("messages")
+        indexes = [models.Index(fields=["status", "id"], name="message_status_idx")]
 
 
 class AbstractTelegramSettings(models.Model):
     """Represent telegram settings."""
 
     if TYPE_CHECKING:
-        data: models.JSONField[dict[str, str]]
+        data: models.JSONField[dict[str, Any]]
 
     chat_id = models.IntegerField(verbose_name=_("chat id"), unique=True)
     data = models.JSONField(verbose_name=_("data"), default=dict, blank=True, encoder=DjangoJSONEncoder)
@@ -100,7 +125,7 @@ class CallbackData(models.Model):
         data: models.JSONField[dict[str, Any]]
 
     token = models.UUIDField(verbose_name=_("token"), default=uuid.uuid4, unique=True, db_index=True)
-    command = models.CharField(verbose_name=_("command"), max_length=255)
+    command = models.CharField(verbose_name=_("command"), max_length=255, db_index=True)
     step = models.CharField(verbose_name=_("step"), max_length=255)
     action = models.CharField(
         verbose_name=_("action"),
@@ -108,14 +133,16 @@ class CallbackData(models.Model):
         help_text=_("Name of a function on the command"),
     )
     data = models.JSONField(verbose_name=_("callback data"), default=dict, encoder=DjangoJSONEncoder)
-    created_at = models.DateTimeField(verbose_name=_("created at"), auto_now_add=True)
+    correlation_key = models.CharField(
+        verbose_name=_("correlation key"), max_length=255, null=True, blank=True, db_index=True
+    )
+    created_at = models.DateTimeField(verbose_name=_("created at"), auto_now_add=True, db_index=True)
 
     class Meta:
         """Set meta options."""
 
         verbose_name = _("callback data")
         verbose_name_plural = _("callback data")
-        indexes = [models.Index(models.F("data__correlation_key"), name="callback_correlation_key_idx")]
 
     def __str__(self):
         """Return a string representation of the callback data."""
@@ -128,3 +155,98 @@ class CallbackData(models.Model):
         if len(data_str) > 100:
             return data_str[:97] + "..."
         return data_str
+
+
+class CallbackKeyboard(models.Model):
+    """Store the callback data of all buttons of an inline keyboard in a single row.
+
+    The data shared by all buttons is stored once, each button only stores its step, action and the data that differs
+    from the shared data. Buttons refer to the keyboard with a compact token of the form "<key>:<index>".
+    The key is derived from the keyboard's content, so rendering an identical keyboard reuses the existing row.
+    """
+
+    if TYPE_CHECKING:
+        data: models.JSONField[dict[str, Any]]
+        buttons: models.JSONField[list[dict[str, Any]]]
+
+    key = models.CharField(verbose_name=_("key"), max_length=32, unique=True)
+    command = models.CharField(verbose_name=_("command"), max_length=255)
+    data = models.JSONField(verbose_name=_("shared data"), default=dict, encoder=DjangoJSONEncoder)
+    buttons = models.JSONField(
+        verbose_name=_("buttons"),
+        default=list,
+        encoder=DjangoJSONEncoder,
+        help_text=_("The step, action and data of each button"),
+    )
+    correlation_key = models.CharField(
+        verbose_name=_("correlation key"), max_length=255, null=True, blank=True, db_index=True
+    )
+    created_at = models.DateTimeField(verbose_name=_("created at"), auto_now_add=True)
+
+    class Meta:
+        """Set meta options."""
+
+        verbose_name = _("callback keyboard")
+        verbose_name_plural = _("callback keyboards")
+
+    def __str__(self):
+        """Return a string representation of the callback keyboard."""
+        return f"{self.key} - {len(self.buttons)} buttons"
+
+    def get_callback(self, index: int, argument: int | None = None) -> CallbackData:
+        """Return the (unsaved) callback data of the button at the given index.
+
+        Buttons with a parameter take an argument from their token, e.g. a page number or the index of a choice.
+        The argument, or the value of the choice it indexes in the shared list named by the parameter's "choices", is
+        stored in the data under the parameter's "key". The list of choices itself is not passed on.
+        Raise an IndexError if the keyboard has no button at the given index or the argument does not fit the button.
+        """
+        button = self.buttons[index]
+        data = {**self.data, **button["data"]}
+        parameter = button.get("parameter")
+        if (parameter is None) != (argument is None):
+            raise IndexError(f"Button {index} does not take the argument {argument!r}.")
+        if parameter is not None:
+            choices_key = parameter.get("choices")
+            data[parameter["key"]] = data.pop(choices_key)[argument][1] if choices_key else argument
+        return CallbackData(
+            command=self.command,
+            step=button["step"],
+            action=button["action"],
+            data=data,
+            correlation_key=self.correlation_key,
+        )
+
+
+class TelegramFile(models.Model):
+    """Cache the Telegram file_id of an uploaded file, keyed by the SHA-256 of its content.
+
+    A file_id can be reused to send the same file again without uploading it. File ids are only valid for the bot
+    that uploaded the file, so the bot is part of the key.
+    """
+
+    class Kind(models.TextChoices):
+        """Represent the kind of media the file was sent as."""
+
+        PHOTO = "photo", _("photo")
+        DOCUMENT = "document", _("document")
+
+    content_hash = models.CharField(verbose_name=_("content hash"), max_length=64)
+    kind = models.CharField(verbose_name=_("kind"), max_length=20, choices=Kind.choices)
+    bot = models.CharField(verbose_name=_("bot"), max_length=100, default=DEFAULT_BOT)
+    file_id = models.CharField(verbose_name=_("file id"), max_length=255)
+    file_unique_id = models.CharField(verbose_name=_("file unique id"), max_length=255, blank=True)
+    created_at = models.DateTimeField(verbose_name=_("created at"), auto_now_add=True)
+
+    class Meta:
+        """Set meta options."""
+
+        verbose_name = _("telegram file")
+        verbose_name_plural = _("telegram files")
+        constraints = [
+            models.UniqueConstraint(fields=["content_hash", "kind", "bot"], name="telegram_file_unique_content"),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the telegram file."""
+        return f"{self.kind} {self.content_hash[:12]}"
@@ -0,0 +1,180 @@
+"""Database-backed queue for incoming Telegram updates.
+
+When `QUEUE_UPDATES` is enabled, the webhook only persists the raw update as a pending `Message`.
+Workers (see the `runworkers` management command) claim pending messages in batches, handle them and record the
+outcome on the message itself.
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from django_telegram_app.bot import bot
+from django_telegram_app.bot.base import TelegramUpdate
+from django_telegram_app.conf import DEFAULT_BOT, settings
+from django_telegram_app.models import Message
+
+CLAIM_WINDOW_FACTOR = 10
+
+
+def enqueue(update: dict, bot_name: str = DEFAULT_BOT) -> Message:
+    """Persist the update for the given bot as a pending message."""
+    return Message.objects.create(raw_message=update, bot=bot_name, status=Message.Status.PENDING)
+
+
+def claim_batch(batch_size: int) -> list[Message]:
+    """Claim up to batch_size pending messages and mark them as processing.
+
+    At most one message is claimed per chat, and none of a chat that has a message in processing, so the messages of
+    a chat are handled one after another and in the order they were received. The first pending message of each chat
+    is looked for among the oldest CLAIM_WINDOW_FACTOR * batch_size pending messages.
+
+    On backends that support it, the pending rows are locked with `SELECT ... FOR UPDATE SKIP LOCKED` so concurrent
+    workers never wait on each other. Other backends (e.g. SQLite) fall back to a compare-and-set update per row.
+    """
+    db_alias = router.db_for_write(Message)
+    messages = Message.objects.using(db_alias)
+    pending = messages.filter(status=Message.Status.PENDING).order_by("id")
+    claim = {"status": Message.Status.PROCESSING, "claimed_at": timezone.now(), "attempts": F("attempts") + 1}
+
+    with transaction.atomic(using=db_alias):
+        processing = messages.filter(status=Message.Status.PROCESSING).values_list("id", "raw_message")
+        busy_chats = {_get_chat_key(message_id, raw_message) for message_id, raw_message in processing}
+        candidate_ids = []
+        for message_id, raw_message in pending.values_list("id", "raw_message")[: batch_size * CLAIM_WINDOW_FACTOR]:
+            chat_key = _get_chat_key(message_id, raw_message)
+            if chat_key not in busy_chats:
+                busy_chats.add(chat_key)  # Later messages of the chat wait for this one.
+                candidate_ids.append(message_id)
+        candidate_ids = candidate_ids[:batch_size]
+        if connections[db_alias].features.has_select_for_update_skip_locked:
+            candidates = pending.filter(id__in=candidate_ids).select_for_update(skip_locked=True)
+            ids = list(candidates.values_list("id", flat=True))
+            messages.filter(id__in=ids).update(**claim)
+        else:
+            ids = [pk for pk in candidate_ids if pending.filter(id=pk).update(**claim)]
+
+    return list(messages.filter(id__in=ids).order_by("id"))
+
+
+def renew_claim(message: Message) -> bool:
+    """Renew the claim of a message of a batch just before it is handled.
+
+    The claims of a batch are all made at once, so the messages at the end of a large batch could be released as stale
+    while the worker is still busy with the ones before them. Return False if the claim was released in the meantime,
+    the message must then not be handled.
+    """
+    now = timezone.now()
+    renewed = Message.objects.filter(
+        pk=message.pk, status=Message.Status.PROCESSING, claimed_at=message.claimed_at
+    ).update(claimed_at=now)
+    message.claimed_at = now
+    return bool(renewed)
+
+
+def release_stale(timeout: int | None = None) -> int:
+    """Release messages whose claim is older than timeout seconds, e.g. because their worker crashed.
+
+    Messages that have not yet reached `QUEUE_MAX_ATTEMPTS` are made pending again, all others are marked as failed.
+    Return the number of released messages.
+    """
+    claim_timeout: int = settings.QUEUE_CLAIM_TIMEOUT if timeout is None else timeout
+    stale = Message.objects.filter(
+        status=Message.Status.PROCESSING, claimed_at__lt=timezone.now() - timedelta(seconds=claim_timeout)
+    )
+    failed = stale.filter(attempts__gte=settings.QUEUE_MAX_ATTEMPTS).update(
+        status=Message.Status.FAILED, error="Abandoned after reaching the maximum number of attempts."
+    )
+    retried = stale.update(status=Message.Status.PENDING, claimed_at=None)
+    return failed + retried
+
+
+def process_message(message: Message) -> bool:
+    """Handle the update stored in the message with the message's bot and record the outcome.
+
+    Return True if the update was handled successfully, False otherwise.
+    """
+    try:
+        bot.handle_update(message.raw_message, bot_name=message.bot)
+    except Exception as exc:
+        message.error = str(exc)
+        message.status = Message.Status.FAILED
+        logging.exception("Error handling Telegram update")
+    else:
+        message.error = None
+        message.status = Message.Status.PROCESSED
+    finally:
+        message.save()
+    return message.status == Message.Status.PROCESSED
+
+
+def reprocess_failed(
+    messages: QuerySet[Message], workers: int = 1, progress: Callable[[int, int], None] | None = None
+) -> tuple[int, int]:
+    """Handle the failed messages in the queryset again and return the number that succeeded and failed again.
+
+    Messages of the same chat are handled one after another, in the order they were received. When a message fails
+    again, the later messages of its chat are left failed and unhandled. Different chats are handled in parallel by up
+    to `workers` threads, with workers=1 everything is handled in the current thread.
+    Each message is claimed before it is handled, so concurrent runs never handle a message twice.
+    If given, progress is called with the number of handled messages and the total after each message.
+    """
+    chats = _group_failed_by_chat(messages)
+    total = sum(len(message_ids) for message_ids in chats.values())
+    counts = {"done": 0, True: 0, False: 0}
+    lock = threading.Lock()
+
+    def reprocess_chat(message_ids: list[int]):
+        for message_id in message_ids:
+            if not Message.objects.filter(id=message_id, status=Message.Status.FAILED).update(
+                status=Message.Status.PROCESSING, claimed_at=timezone.now()
+            ):
+                continue  # Claimed by another run in the meantime.
+            succeeded = process_message(Message.objects.get(id=message_id))
+            with lock:
+                counts["done"] += 1
+                counts[succeeded] += 1
+                done = counts["done"]
+            if progress is not None:
+                progress(done, total)
+            if not succeeded:
+                return  # Leave the later messages of the chat failed, they must not overtake this one.
+
+    if workers <= 1:
+        for message_ids in chats.values():
+            reprocess_chat(message_ids)
+    else:
+
+        def reprocess_chat_in_thread(message_ids: list[int]):
+            try:
+                reprocess_chat(message_ids)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(reprocess_chat_in_thread, ids) for ids in chats.values()]:
+                future.result()
+    return counts[True], counts[False]
+
+
+def _group_failed_by_chat(messages: QuerySet[Message]) -> dict[object, list[int]]:
+    """Return the ids of the failed messages in the queryset, grouped by chat and in the order they were received."""
+    chats: dict[object, list[int]] = {}
+    failed = messages.filter(status=Message.Status.FAILED).order_by("id").values_list("id", "raw_message")
+    for message_id, raw_message in failed.iterator(chunk_size=1000):
+        chats.setdefault(_get_chat_key(message_id, raw_message), []).append(message_id)
+    return chats
+
+
+def _get_chat_key(message_id: int, raw_message: dict) -> object:
+    """Return the key that groups the messages of a chat, updates without a chat are not grouped."""
+    try:
+        return TelegramUpdate(raw_message).chat_id
+    except Exception:  # pylint: disable=broad-exception-caught
+        return ("message", message_id)
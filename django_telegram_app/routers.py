@@ -0,0 +1,122 @@
+"""Route the reads of the bot's tables to read replicas, while every chat keeps reading its own writes.
+
+Add the router to your project and list the aliases of the replicas in `REPLICA_DATABASES`:
+
+    DATABASE_ROUTERS = ["django_telegram_app.routers.ReplicaRouter"]
+
+While an update is handled, reads of the telegram settings, callback data and keyboards go to a random replica.
+A chat that wrote to these tables is pinned to the primary database for `REPLICA_STICKY_SECONDS` seconds, so the
+callback data and `_waiting_for` state it just created are never missed because of replication lag. The pins are
+kept in the cache configured by `CACHE_ALIAS`, so they are shared by all processes that use the same cache.
+Writes to these tables always go to `PRIMARY_DATABASE`, also for instances that were read from a replica.
+Reads outside of an update are left to the other routers, which usually means the primary database.
+"""
+
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.core.cache import caches
+from django.db.models import Model
+
+from django_telegram_app import get_telegram_settings_model
+from django_telegram_app.conf import settings
+
+KEY_PREFIX = "django_telegram_app:replica"
+
+
+@dataclass
+class ChatState:
+    """The chat whose update is being handled and whether its reads are pinned to the primary database."""
+
+    chat_id: int
+    pinned: bool = False
+    wrote: bool = False
+
+
+_chat: ContextVar[ChatState | None] = ContextVar("replica_chat", default=None)
+
+
+class ReplicaRouter:
+    """Send the reads made while handling an update to the replicas, unless the chat wrote recently.
+
+    Opening a transaction for the writes of a unit of work is not a write by itself, it is routed with the
+    `transaction=True` hint so that it does not pin the chat.
+    """
+
+    def db_for_read(self, model: type[Model], **hints) -> str | None:  # noqa: ARG002  # pylint: disable=unused-argument
+        """Return the database for reads of the bot's tables made while handling an update.
+
+        That is a replica, unless the chat is pinned to the primary database.
+        """
+        state = _chat.get()
+        if state is None or not settings.REPLICA_DATABASES or not _is_routed(model):
+            return None
+        if state.pinned:
+            return settings.PRIMARY_DATABASE
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model: type[Model], **hints) -> str | None:
+        """Return the primary database for writes to the bot's tables.
+
+        Without it, Django would save an instance read from a replica back to that replica. The chat whose update is
+        being handled is pinned to the primary database on its first write.
+        """
+        if not settings.REPLICA_DATABASES or not _is_routed(model):
+            return None
+        state = _chat.get()
+        if state is not None and not state.wrote and not hints.get("transaction"):
+            state.pinned = state.wrote = True
+            _pin(state.chat_id)
+        return settings.PRIMARY_DATABASE
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints) -> bool | None:  # noqa: ARG002  # pylint: disable=unused-argument
+        """Allow relations between objects read from the primary database and from the replicas."""
+        if obj1._state.db in settings.REPLICA_DATABASES or obj2._state.db in settings.REPLICA_DATABASES:
+            return True
+        return None
+
+
+@contextmanager
+def use_chat(chat_id: int | None) -> Iterator[ChatState | None]:
+    """Route the reads within the context as reads of the given chat.
+
+    The chat is pinned when it wrote within the last `REPLICA_STICKY_SECONDS` seconds. A chat that writes within the
+    context is pinned on its first write and again at the end of the context, so the window lasts until well after
+    its writes are committed.
+    """
+    if chat_id is None or not settings.REPLICA_DATABASES:
+        yield None
+        return
+
+    state = ChatState(chat_id, pinned=is_pinned(chat_id))
+    token = _chat.set(state)
+    try:
+        yield state
+    finally:
+        _chat.reset(token)
+        if state.wrote:
+            _pin(chat_id)
+
+
+def is_pinned(chat_id: int) -> bool:
+    """Return whether the reads of the chat go to the primary database because it wrote recently."""
+    return bool(caches[settings.CACHE_ALIAS].get(_get_key(chat_id)))
+
+
+def _pin(chat_id: int):
+    caches[settings.CACHE_ALIAS].set(_get_key(chat_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def _is_routed(model: type[Model]) -> bool:
+    from django_telegram_app.models import CallbackData, CallbackKeyboard
+
+    return model in (CallbackData, CallbackKeyboard, get_telegram_settings_model())
+
+
+def _get_key(chat_id: int) -> str:
+    return f"{KEY_PREFIX}:{chat_id}"
@@ -3,8 +3,13 @@
 from django.urls import path
 
 from django_telegram_app import views
-from django_telegram_app.conf import settings
+from django_telegram_app.conf import DEFAULT_BOT, settings
 
 urlpatterns = [
     path(settings.WEBHOOK_URL, views.webhook, name="webhook"),
 ]
+urlpatterns += [
+    path(bot.WEBHOOK_URL, views.webhook, {"bot_name": name}, name=f"webhook-{name}")
+    for name, bot in settings.get_bots().items()
+    if name != DEFAULT_BOT
+]
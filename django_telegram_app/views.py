@@ -1,31 +1,44 @@
 """Telegram views."""
 
 import json
-import logging
 
 from django.contrib.auth.decorators import login_not_required  # type: ignore[reportAttributeAccessIssue]
 from django.http import HttpRequest, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-from django_telegram_app import models
-from django_telegram_app.bot import bot
+from django_telegram_app import backpressure, models, queue
+from django_telegram_app.bot import bot, clicks
+from django_telegram_app.conf import DEFAULT_BOT, settings
 
 
 @csrf_exempt
 @login_not_required
-def webhook(request: HttpRequest):
-    """Handle incoming messages."""
-    if not bot.is_valid_token(request.headers.get("X-Telegram-Bot-Api-Secret-Token")):
-        return JsonResponse({"status": "error", "message": "Invalid token."}, status=403)
+def webhook(request: HttpRequest, bot_name: str = DEFAULT_BOT):
+    """Handle incoming messages for the given bot.
+
+    If `QUEUE_UPDATES` is enabled, the update is only persisted and handled later by a worker.
+    Updates past the in-flight limits are refused with a 503, so Telegram delivers them again later.
+    Updates of senders that flood the bot are dropped, see `backpressure.is_throttled`.
+    """
+    with bot.use_bot(bot_name):
+        if not bot.is_valid_token(request.headers.get("X-Telegram-Bot-Api-Secret-Token")):
+            return JsonResponse({"status": "error", "message": "Invalid token."}, status=403)
     update = json.loads(request.body)
-    message = models.Message(raw_message=update)
-    status = "ok"
+    if backpressure.is_throttled(update, bot_name):
+        return JsonResponse({"status": "ok", "message": "Message dropped."})
+    clicks.record_click(update, bot_name)
+    chat_id = backpressure.get_chat_id(update)
+    limiter = backpressure.get_limiter()
+    if not limiter.acquire(chat_id):
+        response = JsonResponse({"status": "error", "message": "Too many updates in flight."}, status=503)
+        response["Retry-After"] = str(settings.WEBHOOK_RETRY_AFTER)
+        return response
     try:
-        bot.handle_update(update)
-    except Exception as exc:
-        message.error = str(exc)
-        status = "error"
-        logging.exception("Error handling Telegram update")
+        if settings.QUEUE_UPDATES:
+            queue.enqueue(update, bot_name)
+            return JsonResponse({"status": "ok", "message": "Message received."})
+        message = models.Message(raw_message=update, bot=bot_name)
+        status = "ok" if queue.process_message(message) else "error"
+        return JsonResponse({"status": status, "message": "Message received."})
     finally:
-        message.save()
-    return JsonResponse({"status": status, "message": "Message received."})
+        limiter.release(chat_id)
@@ -4,9 +4,13 @@ import importlib
 from unittest.mock import MagicMock, patch
 
 from django.contrib.admin.options import InlineModelAdmin
-from django.test import SimpleTestCase
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
+from django.test import RequestFactory, SimpleTestCase, TestCase
 
 from django_telegram_app import admin
+from django_telegram_app.conf import settings
+from django_telegram_app.models import CallbackData, Message, TelegramSettings
 
 
 class AdminTests(SimpleTestCase):
@@ -30,6 +34,33 @@ class AdminTests(SimpleTestCase):
         assert not admin_instance.has_delete_permission(request)
         assert not admin_instance.has_change_permission(request)
 
+    def test_callbackkeyboard_admin_permissions(self):
+        """Test that CallbackKeyboardAdmin permissions are set correctly."""
+        from django.contrib.admin.sites import AdminSite
+
+        from django_telegram_app.admin import CallbackKeyboardAdmin
+        from django_telegram_app.models import CallbackKeyboard
+
+        admin_instance = CallbackKeyboardAdmin(CallbackKeyboard, AdminSite("test site"))
+        request = MagicMock()  # Mock request object
+
+        assert not admin_instance.has_add_permission(request)
+        assert not admin_instance.has_delete_permission(request)
+        assert not admin_instance.has_change_permission(request)
+
+    def test_telegramfile_admin_permissions(self):
+        """Test that TelegramFileAdmin only allows to view and delete cached file ids."""
+        from django.contrib.admin.sites import AdminSite
+
+        from django_telegram_app.admin import TelegramFileAdmin
+        from django_telegram_app.models import TelegramFile
+
+        admin_instance = TelegramFileAdmin(TelegramFile, AdminSite("test site"))
+        request = MagicMock()  # Mock request object
+
+        assert not admin_instance.has_add_permission(request)
+        assert not admin_instance.has_change_permission(request)
+
     def test_message_admin_permissions(self):
         """Test that MessageAdmin permissions are set correctly."""
         from django.contrib.admin.sites import AdminSite
@@ -55,3 +86,92 @@ class AdminTests(SimpleTestCase):
             importlib.reload(admin)
 
             assert "TelegramSettings" not in [model.__name__ for model in site._registry.keys()]
+
+
+class AdminChangeListTests(TestCase):
+    """Tests for the change lists of the admin."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.superuser = User.objects.create_superuser("admin", "admin@example.com", "password")
+        cls.ok = Message.objects.create(
+            raw_message={"update_id": 1, "text": "x" * 200}, status=Message.Status.PROCESSED
+        )
+        cls.failed = Message.objects.create(raw_message={"update_id": 2}, status=Message.Status.FAILED, error="boom")
+
+    def _get_changelist(self, model_admin, **params):
+        request = RequestFactory().get("/", params)
+        request.user = self.superuser
+        return model_admin.get_changelist_instance(request)
+
+    def test_message_update_id_column(self):
+        """Test that saving a message copies the update id to its indexed column."""
+        self.assertEqual(self.ok.telegram_update_id, 1)
+
+    def test_message_preview_is_computed_in_the_database(self):
+        """Test that the raw message is deferred and its preview is truncated."""
+        model_admin = admin.MessageAdmin(Message, AdminSite("test site"))
+        message = self._get_changelist(model_admin).result_list.get(pk=self.ok.pk)
+        self.assertIn("raw_message", message.get_deferred_fields())
+        preview = model_admin.message_preview(message)
+        self.assertEqual(len(preview), 100)
+        self.assertTrue(preview.endswith("..."))
+
+    def test_message_filters_and_search(self):
+        """Test the outcome filter and the search on update id."""
+        model_admin = admin.MessageAdmin(Message, AdminSite("test site"))
+        self.assertEqual(list(self._get_changelist(model_admin, outcome="error").result_list), [self.failed])
+        self.assertEqual(list(self._get_changelist(model_admin, outcome="ok").result_list), [self.ok])
+        self.assertEqual(list(self._get_changelist(model_admin, q="2").result_list), [self.failed])
+        self.assertEqual(list(self._get_changelist(model_admin, q="abc").result_list), [])
+
+    def test_callback_data_command_filter(self):
+        """Test that callback data can be filtered on command."""
+        CallbackData.objects.create(command="/poll", step="step", action="action", data={"a": 1})
+        CallbackData.objects.create(command="/echo", step="step", action="action")
+        model_admin = admin.CallbackDataAdmin(CallbackData, AdminSite("test site"))
+        changelist = self._get_changelist(model_admin, command="/poll")
+        self.assertEqual([callback.command for callback in changelist.result_list], ["/poll"])
+        self.assertEqual(model_admin.data_preview(changelist.result_list[0]), '{"a": 1}')
+
+    def test_telegram_settings_search_on_chat_id(self):
+        """Test that telegram settings are searched on their exact chat id."""
+        telegram_settings = TelegramSettings.objects.create(chat_id=-100123)
+        TelegramSettings.objects.create(chat_id=123)
+        model_admin = admin.TelegramSettingsAdmin(TelegramSettings, AdminSite("test site"))
+        self.assertEqual(list(self._get_changelist(model_admin, q="-100123").result_list), [telegram_settings])
+
+    def test_estimated_count(self):
+        """Test that the paginator uses the estimate for large tables and counts otherwise."""
+        queryset = Message.objects.order_by("pk")
+        self.assertIsNone(admin.get_estimated_count(queryset))
+        self.assertEqual(admin.EstimatedCountPaginator(queryset, 10).count, 2)
+        with patch("django_telegram_app.admin.get_estimated_count", return_value=5_000_000):
+            self.assertEqual(admin.EstimatedCountPaginator(queryset, 10).count, 5_000_000)
+
+    def test_reprocess_failed_action(self):
+        """Test that the admin action handles the selected failed messages again."""
+        model_admin = admin.MessageAdmin(Message, AdminSite("test site"))
+        request = RequestFactory().post("/")
+        request.user = self.superuser
+        with (
+            patch("django_telegram_app.admin.REPROCESS_WORKERS", 1),
+            patch.object(model_admin, "message_user") as message_user,
+            patch("django_telegram_app.queue.process_message", return_value=True) as process_message,
+        ):
+            model_admin.reprocess_failed(request, Message.objects.all())
+        process_message.assert_called_once()
+        self.assertEqual(process_message.call_args[0][0].pk, self.failed.pk)
+        self.assertIn("Reprocessed 1 messages, 0 failed again.", message_user.call_args[0][1])
+
+    def test_reprocess_failed_action_requeues_in_queue_mode(self):
+        """Test that the admin action makes failed messages pending again when updates are queued."""
+        model_admin = admin.MessageAdmin(Message, AdminSite("test site"))
+        request = RequestFactory().post("/")
+        request.user = self.superuser
+        with patch.object(settings, "QUEUE_UPDATES", True), patch.object(model_admin, "message_user"):
+            model_admin.reprocess_failed(request, Message.objects.all())
+        self.failed.refresh_from_db()
+        self.assertEqual(self.failed.status, Message.Status.PENDING)
+        self.assertTrue(model_admin.has_reprocess_permission(request))
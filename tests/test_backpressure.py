@@ -0,0 +1,135 @@
+"""Tests for webhook load shedding and flood protection."""
+
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from django_telegram_app import backpressure, get_telegram_settings_model
+from django_telegram_app.bot.testing.testcases import TelegramBotTestCase
+from django_telegram_app.conf import settings
+from django_telegram_app.models import Message
+
+
+class InFlightLimiterTests(SimpleTestCase):
+    """Tests for the InFlightLimiter."""
+
+    def test_limit(self):
+        """Test that updates past the limit are shed until an update finishes."""
+        limiter = backpressure.InFlightLimiter(limit=2)
+        self.assertTrue(limiter.acquire(1))
+        self.assertTrue(limiter.acquire(2))
+        self.assertFalse(limiter.acquire(3))
+        limiter.release(1)
+        self.assertTrue(limiter.acquire(3))
+        self.assertEqual(limiter.get_stats(), {"in_flight": 2, "chats_in_flight": 2, "shed": 1})
+
+    def test_per_chat_limit(self):
+        """Test that a chat past its limit is shed while other chats are admitted."""
+        limiter = backpressure.InFlightLimiter(per_chat_limit=1)
+        self.assertTrue(limiter.acquire(1))
+        self.assertFalse(limiter.acquire(1))
+        self.assertTrue(limiter.acquire(2))
+        self.assertTrue(limiter.acquire(None))
+        self.assertTrue(limiter.acquire(None))  # Updates without a chat only count towards the total
+        for chat_id in (1, 2, None, None):
+            limiter.release(chat_id)
+        self.assertEqual(limiter.get_stats(), {"in_flight": 0, "chats_in_flight": 0, "shed": 1})
+
+    def test_get_chat_id(self):
+        """Test that the chat id is read from messages and callback queries, and None is returned otherwise."""
+        self.assertEqual(backpressure.get_chat_id({"message": {"chat": {"id": 1}}}), 1)
+        self.assertEqual(backpressure.get_chat_id({"edited_message": {"chat": {"id": 2}}}), 2)
+        self.assertEqual(backpressure.get_chat_id({"callback_query": {"message": {"chat": {"id": 3}}}}), 3)
+        self.assertIsNone(backpressure.get_chat_id({"inline_query": {"from": {"id": 4}}}))
+        self.assertIsNone(backpressure.get_chat_id({"message": {}}))
+        self.assertIsNone(backpressure.get_chat_id([]))
+
+
+class WebhookLoadSheddingTests(TelegramBotTestCase):
+    """Tests for load shedding in the webhook."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        get_telegram_settings_model().objects.create(chat_id=123456789)
+
+    def setUp(self):
+        """Limit the webhook to a single update in flight."""
+        super().setUp()
+        patcher = patch.object(settings, "WEBHOOK_MAX_IN_FLIGHT", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        backpressure.get_limiter.cache_clear()
+        self.addCleanup(backpressure.get_limiter.cache_clear)
+
+    def test_webhook_sheds_updates_past_the_limit(self):
+        """Test that the webhook asks Telegram to retry later when too many updates are in flight."""
+        limiter = backpressure.get_limiter()
+        limiter.acquire(1)  # A slow update of another chat
+        response = self.send_text("/poll", verify=False)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(Message.objects.count(), 0)
+        self.fake_bot_post.assert_not_called()
+
+        limiter.release(1)
+        self.send_text("/poll")
+        self.assertEqual(limiter.get_stats(), {"in_flight": 0, "chats_in_flight": 0, "shed": 1})
+
+    def test_webhook_releases_failed_updates(self):
+        """Test that an update that fails is no longer counted as in flight."""
+        with patch("django_telegram_app.bot.bot.send_help", side_effect=RuntimeError("Simulated error")):
+            self.send_text("hello", verify=False)
+        self.assertEqual(backpressure.get_limiter().get_stats()["in_flight"], 0)
+
+
+class FloodProtectionTests(TelegramBotTestCase):
+    """Tests for throttling senders that flood the bot."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        get_telegram_settings_model().objects.create(chat_id=123456789)
+
+    def setUp(self):
+        """Allow two updates per window, in a fresh cache."""
+        super().setUp()
+        for patcher in (patch.object(settings, "FLOOD_RATE_LIMIT", 2), patch("time.time", return_value=600.0)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_sender_is_throttled_past_the_limit(self):
+        """Test that updates past the limit are dropped without database work and the sender is asked to slow down."""
+        self.send_text("/poll")
+        self.send_text("/poll")
+        self.fake_bot_post.reset_mock()
+        with self.assertNumQueries(0):
+            response = self.send_text("/poll", verify=False)
+        self.assertEqual(response.json(), {"status": "ok", "message": "Message dropped."})
+        self.assertEqual(self.last_bot_message, "You are sending too many messages, please slow down.")
+
+        self.fake_bot_post.reset_mock()
+        self.send_text("/poll", verify=False)
+        self.fake_bot_post.assert_not_called()  # The sender is told only once per window
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_flood_reply_can_be_disabled(self):
+        """Test that throttled updates get no reply when FLOOD_REPLY_TEXT is empty."""
+        with patch.object(settings, "FLOOD_REPLY_TEXT", ""):
+            for _ in range(3):
+                self.send_text("hello", verify=False)
+        self.assertEqual(self.fake_bot_post.call_count, 2)
+
+    def test_group_members_are_throttled_separately(self):
+        """Test that in groups, the updates are counted per member."""
+        group = {"id": -100, "type": "supergroup"}
+        updates = [{"message": {"chat": group, "from": {"id": user_id}, "text": "hi"}} for user_id in (1, 1, 1, 2)]
+        throttled = [backpressure.is_throttled(update, "default") for update in updates]
+        self.assertEqual(throttled, [False, False, True, False])
+        self.assertEqual(
+            backpressure.get_sender_id({"callback_query": {"from": {"id": 3}, "message": {"chat": group}}}), 3
+        )
+        self.assertEqual(backpressure.get_sender_id({"message": {"chat": {"id": 5, "type": "private"}}}), 5)
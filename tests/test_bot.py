@@ -1,21 +1,52 @@
 """Tests for the bot package."""
 
+import functools
+import importlib
+import json
+import tempfile
 import uuid
+from io import StringIO
+from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
-from django.test import SimpleTestCase
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
 
 from django_telegram_app import get_telegram_settings_model
-from django_telegram_app.bot import get_commands, load_command_class
+from django_telegram_app.bot import (
+    base,
+    build_command_manifest,
+    get_commands,
+    load_command_class,
+    load_command_manifest,
+    resilience,
+)
 from django_telegram_app.bot.base import BaseBotCommand, Step
-from django_telegram_app.bot.bot import DO_NOTHING, _call_command_step, _get_or_create_telegram_settings, send_help
+from django_telegram_app.bot.bot import (
+    DO_NOTHING,
+    _call_command_step,
+    _get_or_create_telegram_settings,
+    buffer_messages,
+    flush_messages,
+    send_help,
+    send_message,
+    send_message_many,
+    send_rendered_message_many,
+    use_bot,
+)
+from django_telegram_app.bot.testing.fakeserver import FakeBotAPI, use_fake_bot_api
 from django_telegram_app.bot.testing.testcases import TelegramBotTestCase
+from django_telegram_app.bot.unitofwork import unit_of_work
 from django_telegram_app.conf import settings
-from django_telegram_app.models import CallbackData, Message
+from django_telegram_app.models import CallbackData, CallbackKeyboard, Message
+from tests.testapps.samplebot.management.commands.poll import Command as PollManagementCommand
 from tests.testapps.samplebot.telegrambot.commands.echo import Command as EchoCommand
 from tests.testapps.samplebot.telegrambot.commands.hiddencommand import Command as HiddenCommand
 from tests.testapps.samplebot.telegrambot.commands.poll import Command as PollCommand
+from tests.testapps.samplebot.telegrambot.commands.report import Command as ReportCommand
 
 
 class BotTests(TelegramBotTestCase):
@@ -39,7 +70,12 @@ class BotTests(TelegramBotTestCase):
 
     def test_discovery_finds_poll_and_echo(self):
         """Test that the poll and echo commands are discovered and can be loaded."""
-        expected_commands = {"poll": PollCommand, "echo": EchoCommand, "hiddencommand": HiddenCommand}
+        expected_commands = {
+            "poll": PollCommand,
+            "echo": EchoCommand,
+            "hiddencommand": HiddenCommand,
+            "report": ReportCommand,
+        }
         for cmd, expected_class in expected_commands.items():
             assert cmd in get_commands().keys()
 
@@ -49,6 +85,25 @@ class BotTests(TelegramBotTestCase):
             assert cmd_instance.get_command_string() == f"/{cmd}"
         self.assertEqual(get_commands().keys(), expected_commands.keys())
 
+    def test_get_commands_reads_manifest(self):
+        """Test that get_commands and the help text use the manifest instead of scanning when it is configured."""
+        manifest = build_command_manifest()
+        manifest["echo"]["description"] = "Echo from the manifest."
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest_path = Path(tmpdir) / "commands.json"
+            manifest_path.write_text(json.dumps({"commands": manifest}), encoding="utf-8")
+            get_commands.cache_clear()
+            load_command_manifest.cache_clear()
+            self.addCleanup(get_commands.cache_clear)
+            self.addCleanup(load_command_manifest.cache_clear)
+            with patch.object(settings, "COMMAND_MANIFEST", str(manifest_path)):
+                with patch("django_telegram_app.bot.discover_commands") as fake_discover_commands:
+                    self.assertEqual(get_commands(), {name: info["app"] for name, info in manifest.items()})
+                    self.send_text("dummy text")
+                fake_discover_commands.assert_not_called()
+        self.assertIn("/echo - Echo from the manifest.", self.last_bot_message)
+        self.assertNotIn("hiddencommand", self.last_bot_message)
+
     def test_telegram_invalid_token(self):
         """Test the telegram app with an invalid token."""
         response = self.client.post(
@@ -120,6 +175,24 @@ class BotTests(TelegramBotTestCase):
         self.send_text("Hello, World!")
         self.assertEqual(self.last_bot_message, "You said: Hello, World!")
 
+    def test_waiting_for_input_receives_files(self):
+        """Test that a file sent while waiting for input is stored under the message key if the step accepts files."""
+        accepting_files = functools.partialmethod(Step.add_waiting_for, accepts_files=True)
+        with patch.object(Step, "add_waiting_for", accepting_files):
+            self.send_text("/echo")
+        document = {"file_id": "abc", "file_unique_id": "abc", "file_name": "notes.txt"}
+        self.post_data({"message": {"chat": {"id": 123456789}, "document": document}})
+        self.assertEqual(self.last_bot_message, f"You said: {document}")
+
+    def test_waiting_for_text_rejects_files(self):
+        """Test that a file sent to a step waiting for text is rejected and the step keeps waiting."""
+        self.send_text("/echo")
+        document = {"file_id": "abc", "file_unique_id": "abc", "file_name": "notes.txt"}
+        self.post_data({"message": {"chat": {"id": 123456789}, "document": document, "caption": "Hi"}})
+        self.assertEqual(self.last_bot_message, "Please send your answer as text.")
+        self.send_text("Hello, World!")
+        self.assertEqual(self.last_bot_message, "You said: Hello, World!")
+
     def test_unknown_command(self):
         """Test sending an unknown command."""
         self.send_text("/unknowncommand")
@@ -250,6 +323,177 @@ class BotTests(TelegramBotTestCase):
         callback_data = command.get_callback(callback_token)
         self.assertIn("correlation_key", callback_data.data)
 
+    def test_keyboard_stores_all_buttons_in_one_row(self):
+        """Test that a keyboard stores its shared data once and gives its buttons compact tokens."""
+        command = PollCommand(self.telegram_setting)
+        keyboard = command.steps[1].create_keyboard({"favourite_sport": "Hockey"})
+        keyboard.add_row(keyboard.next_step_button("✅ Yes", confirmed=True))
+        keyboard.add_row(keyboard.cancel_button("❌ No"), keyboard.previous_step_button("⬅️", steps_back=1))
+        inline_keyboard = keyboard.to_reply_markup()["inline_keyboard"]
+        self.assertEqual(CallbackData.objects.count(), 0)
+        stored_keyboard = CallbackKeyboard.objects.get()
+        self.assertEqual(len(stored_keyboard.buttons), 3)
+        tokens = [button["callback_data"] for row in inline_keyboard for button in row]
+        self.assertEqual(tokens, [f"{stored_keyboard.key}:{index}" for index in range(3)])
+        callback = command.get_callback(tokens[0])
+        self.assertEqual(callback.action, "next_step")
+        self.assertEqual(callback.data["favourite_sport"], "Hockey")
+        self.assertTrue(callback.data["confirmed"])
+
+    def test_identical_keyboards_are_reused(self):
+        """Test that rendering an identical keyboard reuses the stored keyboard."""
+        command = PollCommand(self.telegram_setting)
+        for _ in range(2):
+            keyboard = command.steps[1].create_keyboard({"correlation_key": "conversation"})
+            keyboard.add_row(keyboard.next_step_button("✅ Yes"))
+            keyboard.to_reply_markup()
+        self.assertEqual(CallbackKeyboard.objects.count(), 1)
+
+    def test_paginated_choice_step_pages_without_writes(self):
+        """Test that a paginated choice step stores its choices once and turns pages without storing anything."""
+        self.send_text("/poll")
+        keyboard = CallbackKeyboard.objects.get()
+        self.assertEqual(len(keyboard.buttons), 2)  # One to turn the page and one to choose
+        self.assertEqual(len(keyboard.data["_choices"]), 6)
+        inline_keyboard = self.fake_bot_post.call_args.kwargs["payload"]["reply_markup"]["inline_keyboard"]
+        tokens = [button["callback_data"] for row in inline_keyboard for button in row]
+        self.assertEqual(
+            tokens, [f"{keyboard.key}:1:0", f"{keyboard.key}:1:1", f"{keyboard.key}:1:2", f"{keyboard.key}:0:1"]
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.click_on_button("➡️ Next")
+            self.click_on_button("⬅️ Back")
+            self.click_on_button("➡️ Next")
+        callback_tables = (CallbackData._meta.db_table, CallbackKeyboard._meta.db_table)
+        writes = [
+            query["sql"]
+            for query in queries
+            if not query["sql"].startswith("SELECT") and any(table in query["sql"] for table in callback_tables)
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(CallbackKeyboard.objects.count(), 1)
+        self.assertEqual(self.last_bot_message, "What is your favourite sport?")
+
+    def test_paginated_choice_step_passes_only_the_choice(self):
+        """Test that the next step receives the chosen value but not the list of choices."""
+        self.send_text("/poll")
+        self.click_on_button("➡️ Next")
+        inline_keyboard = self.fake_bot_post.call_args.kwargs["payload"]["reply_markup"]["inline_keyboard"]
+        token = [
+            button["callback_data"] for row in inline_keyboard for button in row if button["text"] == "🏹 Archery"
+        ][0]
+        callback = PollCommand(self.telegram_setting).get_callback(token)
+        self.assertEqual(callback.step, "AskFavouriteSport")
+        self.assertEqual(callback.data["favourite_sport"], "Archery")
+        self.assertNotIn("_choices", callback.data)
+
+    def test_keyboard_keeps_plain_buttons(self):
+        """Test that buttons not created by the keyboard are rendered as is."""
+        command = PollCommand(self.telegram_setting)
+        keyboard = command.steps[0].create_keyboard()
+        keyboard.add_row({"text": "Docs", "url": "https://example.com"})
+        self.assertEqual(
+            keyboard.to_reply_markup(), {"inline_keyboard": [[{"text": "Docs", "url": "https://example.com"}]]}
+        )
+        self.assertEqual(CallbackKeyboard.objects.count(), 0)
+
+    def test_finish_clears_keyboards(self):
+        """Test that finishing a command deletes the keyboards of the conversation."""
+        self.send_text("/poll")
+        self.click_on_button("🏓 Ping Pong")
+        self.click_on_button("✅ Yes")
+        self.assertEqual(CallbackKeyboard.objects.count(), 0)
+        self.assertEqual(CallbackData.objects.count(), 0)
+
+    def test_static_keyboard_is_shared_and_cached(self):
+        """Test that a static keyboard is stored once without conversation data and then rendered without queries."""
+        self.addCleanup(base._static_reply_markups.clear)
+        other_setting = get_telegram_settings_model().objects.create(chat_id=987654321)
+        with self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+            reply_markup = ReportCommand(self.telegram_setting).steps[0].get_static_reply_markup()
+        with self.assertNumQueries(0):
+            self.assertEqual(ReportCommand(other_setting).steps[0].get_static_reply_markup(), reply_markup)
+        keyboard = CallbackKeyboard.objects.get()
+        self.assertEqual(keyboard.data, {})
+        self.assertIsNone(keyboard.correlation_key)
+
+    def test_static_keyboard_is_cached_per_bot_and_language(self):
+        """Test that the reply markup of a static keyboard is cached separately for each bot and language."""
+        self.addCleanup(base._static_reply_markups.clear)
+        step = ReportCommand(self.telegram_setting).steps[0]
+        with self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+            for bot_name, language in [("default", "en"), ("default", "nl"), ("echobot", "en")]:
+                with use_bot(bot_name), translation.override(language):
+                    step.get_static_reply_markup()
+        self.assertEqual(
+            {(bot_name, language) for bot_name, _command, _step, language in base._static_reply_markups},
+            {("default", "en"), ("default", "nl"), ("echobot", "en")},
+        )
+
+    def test_static_keyboard_outlives_conversations(self):
+        """Test that finishing a conversation started from a static keyboard keeps the static keyboard."""
+        self.send_text("/report")
+        reply_markup = self.fake_bot_post.call_args.kwargs["payload"]["reply_markup"]
+        with patch.object(settings, "OFFLOAD_EXECUTOR", "inline"), self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+            self.click_on_button("Small")
+        self.assertEqual(self.last_bot_message, "There are 25 primes below 100.")
+        self.assertEqual(CallbackData.objects.count(), 0)
+        self.assertIsNone(CallbackKeyboard.objects.get().correlation_key)
+
+        self.send_text("/report")
+        self.assertEqual(self.fake_bot_post.call_args.kwargs["payload"]["reply_markup"], reply_markup)
+        self.assertEqual(CallbackKeyboard.objects.count(), 1)
+
+    def test_call_command_step_malformed_tokens(self):
+        """Test that malformed or unknown tokens are treated as expired."""
+        self.send_text("/poll")
+        key = CallbackKeyboard.objects.get().key
+        for token in [
+            "not-a-token",
+            "unknownkey:0",
+            "unknownkey:x",
+            f"{key}:0",
+            f"{key}:1:99",
+            f"{key}:1:x",
+            f"{key}:1:1:1",
+        ]:
+            called = _call_command_step(token, MagicMock(), MagicMock())
+            self.assertFalse(called)
+
+    def test_clear_callback_data_deletes_by_correlation_key(self):
+        """Test that clearing callback data deletes the conversation's rows with one query per table."""
+        command = PollCommand(self.telegram_setting)
+        step = command.steps[0]
+        token = step.next_step_callback({"correlation_key": "conversation"})
+        step.next_step_callback({"correlation_key": "conversation"})
+        keyboard = step.create_keyboard({"correlation_key": "conversation"})
+        keyboard.add_row(keyboard.next_step_button("Yes"))
+        keyboard.to_reply_markup()
+        other_token = step.next_step_callback({"correlation_key": "other"})
+        CallbackData.objects.create(command="/poll", step="step", action="next_step")  # Without correlation key
+        self.assertEqual(CallbackData.objects.get(token=token).correlation_key, "conversation")
+
+        with self.assertNumQueries(2):
+            command._clear_callback_data(SimpleNamespace(callback_data=token))  # type: ignore[reportArgumentType]
+        self.assertFalse(CallbackData.objects.filter(correlation_key="conversation").exists())
+        self.assertFalse(CallbackKeyboard.objects.exists())
+        self.assertTrue(CallbackData.objects.filter(token=other_token).exists())
+        self.assertTrue(CallbackData.objects.filter(correlation_key__isnull=True).exists())
+
+    def test_backfill_correlation_keys(self):
+        """Test that the data migration copies the correlation key from the data to the column."""
+        from django.apps import apps
+
+        migration = importlib.import_module("django_telegram_app.migrations.0007_backfill_correlation_key")
+        callback = CallbackData.objects.create(
+            command="/poll", step="step", action="next_step", data={"correlation_key": "a"}
+        )
+        schema_editor = SimpleNamespace(connection=SimpleNamespace(alias="default"))
+        migration.backfill_correlation_keys(apps, schema_editor)
+        callback.refresh_from_db()
+        self.assertEqual(callback.correlation_key, "a")
+
     def test_click_on_text_deprecation(self):
         """Test that click_on_text raises a deprecation warning."""
         with self.assertWarns(DeprecationWarning) as cm:
@@ -278,6 +522,152 @@ class BotTests(TelegramBotTestCase):
 
         self.assertEqual(self.last_bot_message, "Custom Help Text")
 
+    def test_buffer_messages_coalesces_edits_of_the_same_message(self):
+        """Test that only the final edit of each message is sent, in the position of the last edit."""
+        with buffer_messages():
+            send_message("first", 123456789, message_id=1)
+            send_message("new message", 123456789)
+            send_message("second", 123456789, message_id=1)
+            send_message("other message", 123456789, message_id=2)
+            self.fake_bot_post.assert_not_called()
+
+        sent = [(call.args[0], call.kwargs["payload"]["text"]) for call in self.fake_bot_post.call_args_list]
+        expected = [("sendMessage", "new message"), ("editMessageText", "second"), ("editMessageText", "other message")]
+        self.assertEqual(sent, expected)
+
+    def test_flush_messages_sends_immediately(self):
+        """Test that flush_messages sends the buffered messages before the buffer exits."""
+        with buffer_messages():
+            send_message("working...", 123456789, message_id=1)
+            flush_messages()
+            self.assertEqual(self.last_bot_message, "working...")
+            send_message("done", 123456789, message_id=1)
+        self.assertEqual(self.fake_bot_post.call_count, 2)
+        self.assertEqual(self.last_bot_message, "done")
+
+    def test_buffer_messages_discards_messages_on_error(self):
+        """Test that buffered messages are discarded when an exception is raised."""
+        with self.assertRaises(RuntimeError):
+            with buffer_messages():
+                send_message("never sent", 123456789)
+                raise RuntimeError("Simulated error")
+        self.fake_bot_post.assert_not_called()
+
+    def test_update_saves_settings_once(self):
+        """Test that the writes of an update are gathered, so the telegram settings are saved only once."""
+        settings_table = self.telegram_setting._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            self.send_text("/echo")
+        updates = [query["sql"] for query in queries if query["sql"].startswith(f'UPDATE "{settings_table}"')]
+        self.assertEqual(len(updates), 1)
+        self.telegram_setting.refresh_from_db()
+        waiting_for = self.telegram_setting.data["_waiting_for"]
+        self.assertEqual(CallbackData.objects.get().token, uuid.UUID(waiting_for))
+
+    def test_failed_update_writes_nothing_and_sends_nothing(self):
+        """Test that an update that fails halfway rolls back its writes and discards its messages."""
+        self.telegram_setting.data = {"existing": "state"}
+        self.telegram_setting.save()
+        with patch("django_telegram_app.bot.bot.send_message", side_effect=RuntimeError("Simulated error")):
+            response = self.send_text("/echo", verify=False)
+        self.assertEqual(response.json()["status"], "error")
+        self.telegram_setting.refresh_from_db()
+        self.assertEqual(self.telegram_setting.data, {"existing": "state"})
+        self.assertEqual(CallbackData.objects.count(), 0)
+        self.fake_bot_post.assert_not_called()
+
+    def test_callbacks_created_in_the_update_can_be_resolved(self):
+        """Test that callback data and keyboards are found before the unit of work is flushed."""
+        command = PollCommand(self.telegram_setting)
+        with unit_of_work():
+            token = command.steps[1].next_step_callback({"favourite_sport": "Hockey"})
+            keyboard = command.steps[1].create_keyboard()
+            keyboard.add_row(keyboard.next_step_button("✅ Yes", confirmed=True))
+            keyboard_token = keyboard.to_reply_markup()["inline_keyboard"][0][0]["callback_data"]
+            self.assertEqual(CallbackData.objects.count(), 0)
+            self.assertEqual(command.get_callback_data(token)["favourite_sport"], "Hockey")
+            self.assertTrue(command.get_callback_data(keyboard_token)["confirmed"])
+        self.assertEqual(CallbackData.objects.count(), 1)
+        self.assertEqual(CallbackKeyboard.objects.count(), 1)
+
+    def test_atomic_updates_can_be_disabled(self):
+        """Test that the writes are made immediately when ATOMIC_UPDATES is disabled."""
+        with patch.object(settings, "ATOMIC_UPDATES", False):
+            with patch("django_telegram_app.bot.bot.send_message", side_effect=RuntimeError("Simulated error")):
+                self.send_text("/echo", verify=False)
+        self.assertEqual(CallbackData.objects.count(), 1)
+
+
+class MultiBotTests(TelegramBotTestCase):
+    """Tests for hosting multiple bots in one process."""
+
+    bot_name = "echobot"
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.telegram_setting = get_telegram_settings_model().objects.create(chat_id=123456789)
+
+    def test_bot_only_offers_its_commands(self):
+        """Test that a bot only starts and lists the commands in its COMMANDS setting."""
+        self.send_text("/poll")
+        self.assertIn("/echo - Responds with the same message.", self.last_bot_message)
+        self.assertNotIn("/poll", self.last_bot_message)
+
+    def test_update_is_handled_and_recorded_by_its_bot(self):
+        """Test that updates posted to a bot's webhook are handled and recorded for that bot."""
+        self.send_text("/echo")
+        self.send_text("Hello, World!")
+        self.assertEqual(self.last_bot_message, "You said: Hello, World!")
+        self.assertEqual(set(Message.objects.values_list("bot", flat=True)), {"echobot"})
+
+    def test_conversation_state_is_kept_per_bot(self):
+        """Test that bots sharing a chat's telegram settings neither consume nor clear each other's conversations."""
+        from django_telegram_app.bot.bot import handle_update
+
+        handle_update(self.construct_telegram_update("/echo"), bot_name="default")
+        self.send_text("Hello, World!")
+        self.assertNotIn("You said", self.last_bot_message)  # The echo bot has no conversation with the chat
+
+        self.send_text("/echo")
+        self.telegram_setting.refresh_from_db()
+        self.assertIn("_waiting_for", self.telegram_setting.data)  # The default bot's conversation is kept
+        self.assertIn("_waiting_for", self.telegram_setting.data["_bot:echobot"])
+
+        handle_update(self.construct_telegram_update("Hi"), bot_name="default")
+        self.assertEqual(self.last_bot_message, "You said: Hi")
+        self.send_text("Hello, World!")
+        self.assertEqual(self.last_bot_message, "You said: Hello, World!")
+
+    def test_tokens_of_commands_of_other_bots_are_expired(self):
+        """Test that a token of a command the bot does not have is treated as expired."""
+        token = PollCommand(self.telegram_setting).steps[1].next_step_callback()
+        self.post_data(self.construct_telegram_callback_query(token))
+        self.assertEqual(self.last_bot_message, "This command has expired.")
+
+    def test_webhook_token_is_validated_per_bot(self):
+        """Test that a bot's webhook rejects the token of another bot."""
+        response = self.client.post(
+            self.webhook_url,
+            data={},
+            headers={"X-Telegram-Bot-Api-Secret-Token": settings.WEBHOOK_TOKEN},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_use_bot_switches_endpoint(self):
+        """Test that outbound calls use the BOT_URL of the current bot."""
+        from django_telegram_app.bot.bot import _construct_endpoint, use_bot
+
+        self.assertEqual(_construct_endpoint("sendMessage"), "https://api.telegram.org/bot123:abc/sendMessage")
+        with use_bot("echobot"):
+            self.assertEqual(_construct_endpoint("sendMessage"), "https://api.telegram.org/bot456:def/sendMessage")
+
+    def test_missing_bot_url_is_reported(self):
+        """Test that bots without a BOT_URL are reported as missing settings."""
+        with patch.object(settings, "BOTS", {"broken": {}}):
+            self.assertEqual(settings.missing_settings(), ["BOTS.broken.BOT_URL"])
+
 
 class ExtraBotTests(SimpleTestCase):
     """Extra tests for bot functions which are mocked in BotTests."""
@@ -286,11 +676,59 @@ class ExtraBotTests(SimpleTestCase):
         """Test the post function sends a request to the correct endpoint."""
         from django_telegram_app.bot.bot import post
 
-        with patch("django_telegram_app.bot.bot.requests.post") as fake_requests_post:
+        with patch("django_telegram_app.bot.bot.get_session") as fake_get_session:
+            fake_requests_post = fake_get_session.return_value.post
             endpoint = "sendMessage"
             payload = {"chat_id": 123456789, "text": "Hello"}
             post(endpoint, payload)
 
+            fake_get_session.assert_called_once_with("default")
             fake_requests_post.assert_called_once_with(
                 "https://api.telegram.org/bot123:abc/sendMessage", json=payload, timeout=5
             )
+
+
+class SendMessageManyTests(TestCase):
+    """Tests for sending a message to many chats, against the fake Bot API server."""
+
+    def setUp(self):
+        """Start a fake Bot API server and point the default bot to it."""
+        self.server = FakeBotAPI()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        fake_bot_api = use_fake_bot_api(self.server)
+        fake_bot_api.__enter__()
+        self.addCleanup(fake_bot_api.__exit__, None, None, None)
+        resilience.get_circuit_breaker.cache_clear()
+        self.addCleanup(resilience.get_circuit_breaker.cache_clear)
+
+    def test_send_message_many(self):
+        """Test that the message is sent to all chats and blocked users are reported."""
+        self.server.block_chat(2)
+        summary = send_message_many("Hello", iter([1, 2, 3]), concurrency=2, rate_limit=1000)
+        self.assertEqual(sorted(summary.sent), [1, 3])
+        self.assertEqual(summary.blocked, [2])
+        self.assertEqual(summary.failed, [])
+        self.assertEqual(str(summary), "Sent 2 messages, 1 blocked, 0 failed.")
+        self.assertTrue(all(result.message_id for result in summary.results if result.status == "sent"))
+        self.assertEqual(len(self.server.get_calls("sendMessage")), 3)
+
+    def test_send_rendered_message_many_from_queryset(self):
+        """Test that the text is rendered per telegram settings streamed from a queryset."""
+        TelegramSettings = get_telegram_settings_model()
+        TelegramSettings.objects.create(chat_id=1, data={"name": "Ann"})
+        TelegramSettings.objects.create(chat_id=2, data={"name": "Bob"})
+        summary = send_rendered_message_many(
+            lambda telegram_settings: f"Hi {telegram_settings.data['name']}", TelegramSettings.objects.all()
+        )
+        self.assertEqual(sorted(summary.sent), [1, 2])
+        texts = {call.payload["chat_id"]: call.payload["text"] for call in self.server.get_calls()}
+        self.assertEqual(texts, {1: "Hi Ann", 2: "Hi Bob"})
+
+    def test_announce_from_management_command(self):
+        """Test that management commands can announce a message to the chats matching their filter."""
+        get_telegram_settings_model().objects.create(chat_id=1)
+        out = StringIO()
+        summary = PollManagementCommand(stdout=out).announce("Maintenance tonight")
+        self.assertEqual(summary.sent, [1])
+        self.assertIn("Sent 1 messages, 0 blocked, 0 failed.", out.getvalue())
@@ -0,0 +1,116 @@
+"""Tests for the cache tier of the callback data."""
+
+from datetime import UTC, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from django_telegram_app import get_telegram_settings_model
+from django_telegram_app.bot.callbacks import resolve_callback
+from django_telegram_app.bot.testing.testcases import TelegramBotTestCase
+from django_telegram_app.bot.unitofwork import flush, unit_of_work
+from django_telegram_app.conf import settings
+from django_telegram_app.models import CallbackData, CallbackKeyboard
+from tests.testapps.samplebot.telegrambot.commands.poll import Command as PollCommand
+
+CALLBACK_TABLES = (CallbackData._meta.db_table, CallbackKeyboard._meta.db_table)
+
+
+class CallbackCacheTests(TelegramBotTestCase):
+    """Tests for resolving tokens from the cache tier."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.telegram_setting = get_telegram_settings_model().objects.create(chat_id=123456789)
+
+    def setUp(self):
+        """Enable the cache tier with an empty cache."""
+        super().setUp()
+        patcher = patch.object(settings, "CALLBACK_CACHE_TIMEOUT", 300)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _get_token(self, text: str) -> str:
+        inline_keyboard = self.fake_bot_post.call_args.kwargs["payload"]["reply_markup"]["inline_keyboard"]
+        return [button["callback_data"] for row in inline_keyboard for button in row if button["text"] == text][0]
+
+    def _handle_and_commit(self, handle, text: str):
+        """Handle the update and run the callbacks its transaction would run on commit."""
+        with self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+            handle(text)
+
+    def _get_callback_reads(self, queries: CaptureQueriesContext) -> list[str]:
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT") and any(table in query["sql"] for table in CALLBACK_TABLES)
+        ]
+
+    def test_clicks_are_resolved_from_the_cache(self):
+        """Test that clicks on freshly rendered keyboards do not read the callback tables."""
+        self._handle_and_commit(self.send_text, "/poll")
+        with CaptureQueriesContext(connection) as queries:
+            self._handle_and_commit(self.click_on_button, "🏓 Ping Pong")
+            self._handle_and_commit(self.click_on_button, "✅ Yes")
+        self.assertEqual(self._get_callback_reads(queries), [])
+        self.assertEqual(self.last_bot_message, "Thank you! Your favourite sport Ping Pong has been recorded.")
+
+    def test_finished_conversations_are_not_resolved_from_the_cache(self):
+        """Test that the cached tokens of a finished conversation no longer resolve."""
+        self.send_text("/poll")
+        self.click_on_button("🏓 Ping Pong")
+        yes_token = self._get_token("✅ Yes")
+        self.click_on_button("✅ Yes")
+        self.assertEqual(CallbackData.objects.count(), 0)
+        with self.assertRaises(CallbackData.DoesNotExist):
+            resolve_callback(yes_token)
+        self.post_data(self.construct_telegram_callback_query(yes_token))
+        self.assertEqual(self.last_bot_message, "This command has expired.")
+
+    def test_cache_misses_are_read_from_the_database(self):
+        """Test that tokens missing from the cache are read from the database and cached."""
+        step = PollCommand(self.telegram_setting).steps[1]
+        with patch.object(settings, "CALLBACK_CACHE_TIMEOUT", None):
+            token = step.next_step_callback({"favourite_sport": "Hockey"})
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+            self.assertEqual(resolve_callback(token).data["favourite_sport"], "Hockey")
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_callback(token).data["favourite_sport"], "Hockey")
+
+    def test_rolled_back_rows_are_not_cached(self):
+        """Test that callback data and keyboards are cached only when their transaction commits."""
+        step = PollCommand(self.telegram_setting).steps[1]
+        buttons = [{"text": "Hockey", "action": None, "data": {}}]
+        with self.captureOnCommitCallbacks(execute=True), unit_of_work():  # type: ignore[reportAttributeAccessIssue]
+            token = step.next_step_callback({"favourite_sport": "Hockey"})
+            key = step.command.create_callback_keyboard({}, buttons)
+            flush()
+            transaction.set_rollback(True)
+        with self.assertRaises(CallbackData.DoesNotExist):
+            resolve_callback(token)
+
+        self.assertEqual(step.command.create_callback_keyboard({}, buttons), key)
+        self.assertTrue(CallbackKeyboard.objects.filter(key=key).exists())
+
+    def test_cached_values_match_the_database(self):
+        """Test that cached data is returned as the database would return it."""
+        step = PollCommand(self.telegram_setting).steps[1]
+        token = step.next_step_callback({"when": datetime(2025, 1, 31, 14, tzinfo=UTC), "amount": Decimal("1.50")})
+        with self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+            cached = resolve_callback(token)
+        cache.clear()
+        self.assertEqual(cached.data, resolve_callback(token).data)
+
+    def test_cache_tier_is_disabled_by_default(self):
+        """Test that nothing is cached when CALLBACK_CACHE_TIMEOUT is not set."""
+        with patch.object(settings, "CALLBACK_CACHE_TIMEOUT", None):
+            self.send_text("/poll")
+            self.click_on_button("🏓 Ping Pong")
+        with self.assertNumQueries(1):
+            resolve_callback(self._get_token("✅ Yes"))
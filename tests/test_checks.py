@@ -56,6 +56,29 @@ class ChecksTests(SimpleTestCase):
         self.assertEqual(len(errors), 1)
         self.assertEqual(errors[0].id, "telegram.E004")
 
+    def test_check_command_manifest_unreadable(self):
+        """Test that an error is returned when the configured command manifest cannot be read."""
+        from django_telegram_app.bot import load_command_manifest
+        from django_telegram_app.conf import settings
+
+        load_command_manifest.cache_clear()
+        self.addCleanup(load_command_manifest.cache_clear)
+        with patch.object(settings, "COMMAND_MANIFEST", "/non/existent/manifest.json"):
+            with patch("django_telegram_app.checks.get_commands"):
+                errors = self.run_telegram_checks()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].id, "telegram.E006")
+
+    def test_check_command_manifest_out_of_date(self):
+        """Test that a warning is returned when the command manifest does not match the discovered commands."""
+        from django_telegram_app.conf import settings
+
+        with patch.object(settings, "COMMAND_MANIFEST", "manifest.json"):
+            with patch("django_telegram_app.checks.load_command_manifest", return_value={}):
+                errors = self.run_telegram_checks()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].id, "telegram.W001")
+
     def test_check_get_commands_unexpected_error(self):
         """Test that an error is returned when an unexpected error occurs during command discovery."""
         with patch("django_telegram_app.checks.get_commands") as fake_get_commands:
@@ -0,0 +1,96 @@
+"""Tests for skipping concurrent and superseded clicks."""
+
+import json
+from unittest.mock import patch
+
+from django.core.cache import cache
+
+from django_telegram_app import get_telegram_settings_model, models
+from django_telegram_app.bot import bot, clicks
+from django_telegram_app.bot.testing.testcases import TelegramBotTestCase
+from django_telegram_app.conf import settings
+
+
+class ClickTests(TelegramBotTestCase):
+    """Tests for claiming clicks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        get_telegram_settings_model().objects.create(chat_id=123456789)
+
+    def setUp(self):
+        """Start every test with an empty cache and the poll's first question."""
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.send_text("/poll")
+
+    def _click(self, text: str, update_id: int | None = None, callback_query_id: str = "42") -> dict:
+        inline_keyboard = self.fake_bot_post.call_args.kwargs["payload"]["reply_markup"]["inline_keyboard"]
+        token = [button["callback_data"] for row in inline_keyboard for button in row if button["text"] == text][0]
+        update = self.construct_telegram_callback_query(token)
+        update["callback_query"]["id"] = callback_query_id
+        if update_id is not None:
+            update["update_id"] = update_id
+        return update
+
+    def test_click_is_handled_and_released(self):
+        """Test that a click is handled and its message can be clicked again afterwards."""
+        bot.handle_update(self._click("🏓 Ping Pong", update_id=1))
+        self.assertEqual(self.last_bot_message, "Would you like to submit Ping Pong as your favourite sport?")
+        self.assertIsNone(cache.get("django_telegram_app:click:default:123456789:123:claim"))
+
+    def test_superseded_click_is_skipped_and_answered(self):
+        """Test that a click is skipped when a later click on the same message was received."""
+        earlier, later = self._click("🏓 Ping Pong", update_id=1), self._click("🤺 Fencing", update_id=2)
+        clicks.record_click(earlier, "default")
+        clicks.record_click(later, "default")
+        self.fake_bot_post.reset_mock()
+        bot.handle_update(earlier)
+        self.fake_bot_post.assert_called_once_with("answerCallbackQuery", payload={"callback_query_id": "42"})
+        bot.handle_update(later)
+        self.assertEqual(self.last_bot_message, "Would you like to submit Fencing as your favourite sport?")
+
+    def test_concurrent_click_is_skipped_and_answered(self):
+        """Test that a click is skipped while another click on the same message is being handled."""
+        update = self._click("🏓 Ping Pong", update_id=1)
+        with clicks.claim_click(self._click("🤺 Fencing", update_id=2), "default") as claimed:
+            self.assertTrue(claimed)
+            self.fake_bot_post.reset_mock()
+            bot.handle_update(update)
+        self.fake_bot_post.assert_called_once_with("answerCallbackQuery", payload={"callback_query_id": "42"})
+
+    def test_clicks_without_id_are_always_handled(self):
+        """Test that clicks not sent by Telegram, e.g. by offload, are not skipped."""
+        update = self._click("🏓 Ping Pong", callback_query_id="")
+        with clicks.claim_click(self._click("🤺 Fencing", update_id=2), "default"):
+            bot.handle_update(update)
+        self.assertEqual(self.last_bot_message, "Would you like to submit Ping Pong as your favourite sport?")
+
+    def test_deduplication_can_be_disabled(self):
+        """Test that every click is handled when CLICK_DEDUPLICATION is disabled."""
+        update = self._click("🏓 Ping Pong", update_id=1)
+        with patch.object(settings, "CLICK_DEDUPLICATION", False):
+            with clicks.claim_click(self._click("🤺 Fencing", update_id=2), "default"):
+                bot.handle_update(update)
+        self.assertEqual(self.last_bot_message, "Would you like to submit Ping Pong as your favourite sport?")
+
+    def test_webhook_records_the_latest_click(self):
+        """Test that the webhook records each click as the latest click on its message."""
+        self.post_data(self._click("🏓 Ping Pong", update_id=7))
+        self.assertEqual(cache.get("django_telegram_app:click:default:123456789:123:latest"), 7)
+
+    def test_webhook_handles_bodies_that_are_not_objects(self):
+        """Test that a body that is not a JSON object is recorded as an error instead of failing the webhook."""
+        for body in ([], "x"):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    self.webhook_url,
+                    data=json.dumps(body),
+                    headers={"X-Telegram-Bot-Api-Secret-Token": settings.get_bot(self.bot_name).WEBHOOK_TOKEN},
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), {"status": "error", "message": "Message received."})
+                self.assertTrue(models.Message.objects.filter(raw_message=body, status="failed").exists())
@@ -0,0 +1,86 @@
+"""Tests for the fake Telegram Bot API server."""
+
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase
+
+from django_telegram_app.bot import bot, resilience
+from django_telegram_app.bot.testing.fakeserver import FakeBotAPI, use_fake_bot_api
+
+
+class FakeBotAPITests(SimpleTestCase):
+    """Tests for the fake Telegram Bot API server."""
+
+    def setUp(self):
+        """Start a fake server and point the default bot to it."""
+        self.server = FakeBotAPI()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        use_fake_bot_api_context = use_fake_bot_api(self.server)
+        use_fake_bot_api_context.__enter__()
+        self.addCleanup(use_fake_bot_api_context.__exit__, None, None, None)
+        resilience.get_circuit_breaker.cache_clear()
+        self.addCleanup(resilience.get_circuit_breaker.cache_clear)
+        patch("django_telegram_app.bot.resilience.time.sleep").start()
+        self.addCleanup(patch.stopall)
+
+    def test_calls_are_recorded(self):
+        """Test that calls through the bot reach the server and are recorded."""
+        response = bot.post("sendMessage", {"chat_id": 1, "text": "hi"})
+        self.assertEqual(response.json()["result"]["text"], "hi")
+        bot.post("editMessageText", {"chat_id": 1, "message_id": 7, "text": "edited"})
+        calls = self.server.get_calls()
+        self.assertEqual([call.method for call in calls], ["sendMessage", "editMessageText"])
+        self.assertEqual(calls[0].payload, {"chat_id": 1, "text": "hi"})
+
+    def test_rate_limits_and_errors_are_retried(self):
+        """Test that injected 429 and 5xx responses exercise the retries."""
+        self.server.fail_next(429)
+        self.server.fail_next(502)
+        response = bot.post("sendMessage", {"chat_id": 1, "text": "hi"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([call.status_code for call in self.server.get_calls()], [429, 502, 200])
+
+    def test_get_updates(self):
+        """Test that added updates are served by getUpdates from the offset."""
+        first = self.server.add_update({"message": {"chat": {"id": 1}, "text": "/poll"}})
+        second = self.server.add_update({"message": {"chat": {"id": 1}, "text": "/echo"}})
+        updates = bot.post("getUpdates", {"offset": first["update_id"] + 1}).json()["result"]
+        self.assertEqual(updates, [second])
+
+    def test_commands_are_stored(self):
+        """Test that setMyCommands is answered by getMyCommands."""
+        commands = [{"command": "poll", "description": "Poll"}]
+        bot.post("setMyCommands", {"commands": commands, "language_code": "nl"})
+        self.assertEqual(bot.post("getMyCommands", {"language_code": "nl"}).json()["result"], commands)
+        self.assertEqual(bot.post("getMyCommands", {}).json()["result"], [])
+
+    def test_latency_and_random_failures(self):
+        """Test that random failures are injected at the configured rate."""
+        self.server.error_rate = 1.0
+        with self.assertRaises(requests.HTTPError):
+            bot.post("sendMessage", {"chat_id": 1, "text": "hi"})
+
+
+class FakeBotAPISubprocessTests(SimpleTestCase):
+    """Tests for running the fake server as a subprocess."""
+
+    def test_subprocess(self):
+        """Test that the server can be started as a subprocess, without Django settings."""
+        process = subprocess.Popen(
+            [sys.executable, "-m", "django_telegram_app.bot.testing.fakeserver", "--port", "0"],
+            stdout=subprocess.PIPE,
+            env={k: v for k, v in os.environ.items() if k != "DJANGO_SETTINGS_MODULE"},
+            text=True,
+        )
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        assert process.stdout is not None  # Use assertion to satisfy type checker
+        bot_url = process.stdout.readline().strip().split("BOT_URL=")[1]
+        self.addCleanup(process.stdout.close)
+        response = requests.post(f"{bot_url}sendMessage", json={"chat_id": 1, "text": "hi"}, timeout=5)
+        self.assertTrue(response.json()["ok"])
@@ -1,13 +1,21 @@
 """Tests for the management package."""
 
+import json
+import tempfile
 from io import StringIO
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import requests
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.test import TestCase
 
 from django_telegram_app import get_telegram_settings_model
+from django_telegram_app.bot import resilience
 from django_telegram_app.bot.testing.testcases import TelegramBotTestCase
+from django_telegram_app.management.commands.replayupdates import Sandbox
+from django_telegram_app.models import Message
 
 SETWEBHOOK_PATH = "django_telegram_app.management.commands.setwebhook"
 
@@ -84,6 +92,24 @@ class ManagementCommandTests(TelegramBotTestCase):
                 call_command("setwebhook", "https://example.com", stdout=out)
         self.assertIn("Successfully set webhook to", out.getvalue())
 
+    def test_set_webhook_command_for_other_bot(self):
+        """Test that the set_webhook command uses the settings of the given bot."""
+        out = StringIO()
+        with patch(f"{SETWEBHOOK_PATH}.requests.post") as fake_post:
+            fake_post.return_value.status_code = 200
+            fake_post.return_value.json.return_value = {"ok": True, "result": True}
+            call_command("setwebhook", "https://example.com", "--bot=echobot", stdout=out)
+        fake_post.assert_called_once_with(
+            "https://api.telegram.org/bot456:def/setWebhook",
+            json={"url": "https://example.com/telegram/echobot/webhook", "secret_token": "echobot-webhook-token"},
+            timeout=5,
+        )
+
+    def test_set_webhook_command_unknown_bot(self):
+        """Test that the set_webhook command raises for an unknown bot."""
+        with self.assertRaises(CommandError):
+            call_command("setwebhook", "https://example.com", "--bot=unknown", stdout=StringIO())
+
     def test_set_webhook_command_failure(self):
         """Test that the set_webhook command handles failure correctly."""
         out = StringIO()
@@ -176,8 +202,144 @@ class ManagementCommandTests(TelegramBotTestCase):
             with self.assertRaises(CommandError, msg="Something went wrong while calling"):
                 call_command("setcommands", "--include-hidden", stdout=out)
 
+    def test_setcommands_error_response(self):
+        """Test that an error response of Telegram is raised as a CommandError with Telegram's description."""
+        response = requests.Response()
+        response.status_code = 400
+        response._content = b'{"ok": false, "description": "Bad Request: command is invalid"}'
+        with patch("django_telegram_app.management.commands.setcommands.requests.post", return_value=response):
+            with self.assertRaisesMessage(CommandError, "Bad Request: command is invalid"):
+                call_command("setcommands", stdout=StringIO(), stderr=StringIO())
+
+    def test_setcommands_skips_unchanged_locales(self):
+        """Test that setcommands does not set the commands of locales for which Telegram already has them."""
+        out = StringIO()
+        current_commands = [
+            {"command": "echo", "description": "Responds with the same message."},
+            {"command": "poll", "description": "Poll for a user's favourite sport."},
+            {"command": "report", "description": "Builds a report in the background."},
+        ]
+        with patch("django_telegram_app.management.commands.setcommands.requests.post") as fake_post:
+            fake_post.return_value.status_code = 200
+            fake_post.return_value.json.return_value = {"ok": True, "result": current_commands}
+            call_command("setcommands", "--locale=en", "--locale=nl", stdout=out)
+        self.assertIn("Commands for locale 'en' are unchanged.", out.getvalue())
+        self.assertEqual([], self._get_language_codes(fake_post))
+
+        with patch("django_telegram_app.management.commands.setcommands.requests.post") as fake_post:
+            fake_post.return_value.status_code = 200
+            fake_post.return_value.json.return_value = {"ok": True, "result": current_commands}
+            call_command("setcommands", "--locale=en", "--force", stdout=out)
+        self.assertEqual(["en"], self._get_language_codes(fake_post))
+
+    def test_buildcommandmanifest(self):
+        """Test that buildcommandmanifest writes the metadata of all commands."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = Path(tmpdir) / "commands.json"
+            out = StringIO()
+            call_command("buildcommandmanifest", f"--output={output}", stdout=out)
+            manifest = json.loads(output.read_text(encoding="utf-8"))["commands"]
+        self.assertIn("Wrote 4 commands to", out.getvalue())
+        self.assertEqual(
+            manifest["hiddencommand"],
+            {
+                "app": "tests.testapps.samplebot",
+                "class": "tests.testapps.samplebot.telegrambot.commands.hiddencommand.Command",
+                "command": "/hiddencommand",
+                "description": "A hidden command that does not appear in help.",
+                "exclude_from_help": True,
+                "translate": True,
+            },
+        )
+
+    def test_buildcommandmanifest_requires_output(self):
+        """Test that buildcommandmanifest raises if no output is provided or configured."""
+        with self.assertRaises(CommandError):
+            call_command("buildcommandmanifest", stdout=StringIO())
+
     def _get_command_names(self, fake_post: MagicMock):
         return [cmd["command"] for cmd in fake_post.call_args[1]["json"]["commands"]]
 
     def _get_language_codes(self, fake_post: MagicMock):
-        return [call_arg[1]["json"]["language_code"] for call_arg in fake_post.call_args_list]
+        """Return the sorted language codes of all calls except getMyCommands, locales are updated concurrently."""
+        return sorted(
+            call_arg[1]["json"]["language_code"]
+            for call_arg in fake_post.call_args_list
+            if not call_arg[0][0].endswith("/getMyCommands")
+        )
+
+
+class ReplayUpdatesTests(TestCase):
+    """Tests for the replayupdates command, which sends its Bot API calls to a fake server."""
+
+    def setUp(self):
+        """Avoid sleeping between retries of the fake Bot API calls."""
+        resilience.get_circuit_breaker.cache_clear()
+        self.addCleanup(resilience.get_circuit_breaker.cache_clear)
+        patch("django_telegram_app.bot.resilience.time.sleep").start()
+        self.addCleanup(patch.stopall)
+
+    def test_replay_stored_messages_into_sandbox(self):
+        """Test that stored updates are replayed with remapped chat ids and summarized."""
+        for text in ["/poll", "/echo", "/poll"]:
+            Message.objects.create(raw_message={"message": {"chat": {"id": 42}, "from": {"id": 42}, "text": text}})
+        out = StringIO()
+        call_command("replayupdates", "--limit=2", stdout=out)
+        self.assertIn("Replayed 2 updates in", out.getvalue())
+        self.assertIn("0 failed.", out.getvalue())
+        self.assertIn("Bot API calls: 2, 0 failed.", out.getvalue())
+        sandbox_settings = get_telegram_settings_model().objects.get()
+        self.assertEqual(sandbox_settings.chat_id, 2_000_000_000)
+
+    def test_replay_file_through_webhook(self):
+        """Test that archived updates are replayed through the webhook view and failures are counted."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive = Path(tmpdir) / "updates.jsonl"
+            updates = [{"update_id": 1, "message": {"chat": {"id": 42}, "text": "/poll"}}, {"unsupported": "update"}]
+            archive.write_text("\n".join(json.dumps(update) for update in updates), encoding="utf-8")
+            out = StringIO()
+            call_command("replayupdates", f"--file={archive}", "--target=webhook", "--rate=1000", stdout=out)
+        self.assertIn("Replayed 2 updates in", out.getvalue())
+        self.assertIn("1 failed.", out.getvalue())
+        self.assertEqual(
+            Message.objects.get(status=Message.Status.PROCESSED).raw_message["message"]["chat"]["id"], 2_000_000_000
+        )
+
+    def test_sandbox_remaps_ids_consistently(self):
+        """Test that the same chat id is always remapped to the same sandbox id."""
+        sandbox = Sandbox(start=1000)
+        update = sandbox.remap(
+            {"callback_query": {"from": {"id": 5}, "message": {"chat": {"id": 5}}}, "chat_id": 6, "text": "5"}
+        )
+        self.assertEqual(update["callback_query"]["from"]["id"], 1000)
+        self.assertEqual(update["callback_query"]["message"]["chat"]["id"], 1000)
+        self.assertEqual(update["chat_id"], 1001)
+        self.assertEqual(update["text"], "5")
+
+    def test_replay_unknown_bot(self):
+        """Test that replaying for an unknown bot raises a CommandError."""
+        with self.assertRaises(CommandError):
+            call_command("replayupdates", "--bot=unknown", stdout=StringIO())
+
+    def test_replay_to_real_chats_must_be_confirmed(self):
+        """Test that replaying the original chat ids against the real Bot API requires a confirmation."""
+        with self.assertRaises(CommandError):
+            call_command("replayupdates", "--no-remap", "--real-api", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("replayupdates", "--no-remap", "--cleanup", stdout=StringIO())
+        err = StringIO()
+        call_command("replayupdates", "--real-api", "--limit=0", stdout=StringIO(), stderr=err)
+        self.assertIn("may belong to real chats", err.getvalue())
+        call_command(
+            "replayupdates", "--no-remap", "--real-api", "--send-to-real-chats", "--limit=0", stdout=StringIO()
+        )
+
+    def test_replay_cleanup(self):
+        """Test that --cleanup removes the telegram settings and messages of the sandbox chats only."""
+        get_telegram_settings_model().objects.create(chat_id=42)
+        Message.objects.create(raw_message={"message": {"chat": {"id": 42}, "from": {"id": 42}, "text": "/poll"}})
+        out = StringIO()
+        call_command("replayupdates", "--target=webhook", "--cleanup", stdout=out)
+        self.assertIn("Removed 1 telegram settings and 1 messages of the sandbox chats.", out.getvalue())
+        self.assertEqual(list(get_telegram_settings_model().objects.values_list("chat_id", flat=True)), [42])
+        self.assertEqual(Message.objects.count(), 1)
@@ -0,0 +1,195 @@
+"""Tests for the media module."""
+
+import hashlib
+import io
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase
+
+from django_telegram_app.bot import bot, media, resilience
+from django_telegram_app.bot.base import TelegramUpdate
+from django_telegram_app.bot.testing.fakeserver import FakeBotAPI, use_fake_bot_api
+from django_telegram_app.models import TelegramFile
+
+
+class UnseekableFile(io.RawIOBase):
+    """A file-like object that can only be read once, like a pipe."""
+
+    def __init__(self, content: bytes):
+        """Initialize the file."""
+        self._content = io.BytesIO(content)
+
+    def readable(self):
+        """Return that the file is readable."""
+        return True
+
+    def readinto(self, buffer):
+        """Read into the buffer."""
+        data = self._content.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class MediaTests(TestCase):
+    """Tests for sending photos and documents to the fake Bot API server."""
+
+    def setUp(self):
+        """Start a fake Bot API server and point the default bot to it."""
+        self.server = FakeBotAPI()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        fake_bot_api = use_fake_bot_api(self.server)
+        fake_bot_api.__enter__()
+        self.addCleanup(fake_bot_api.__exit__, None, None, None)
+        resilience.get_circuit_breaker.cache_clear()
+        self.addCleanup(resilience.get_circuit_breaker.cache_clear)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.content = b"%PDF" + bytes(range(256)) * 1000
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+        self.path = Path(tmpdir.name) / "report.pdf"
+        self.path.write_bytes(self.content)
+
+    def test_document_is_uploaded_once(self):
+        """Test that a document is streamed once and sent by its cached file_id afterwards."""
+        media.send_document(self.path, 1, caption="Your report")
+        media.send_document(self.path, 2)
+        first, second = self.server.get_calls("sendDocument")
+        self.assertEqual(first.payload["document"], {"filename": "report.pdf", "size": 256004, "sha256": self.sha256})
+        self.assertEqual(first.payload["caption"], "Your report")
+        self.assertEqual(second.payload["document"], f"file-{self.sha256}")
+        self.assertEqual(TelegramFile.objects.get().content_hash, self.sha256)
+
+    def test_photo_from_file_object(self):
+        """Test that photos are streamed from file-like objects and cached by their largest size."""
+        photo = io.BytesIO(self.content)
+        media.send_photo(photo, 1, reply_markup={"inline_keyboard": []})
+        call = self.server.get_calls("sendPhoto")[0]
+        self.assertEqual(call.payload["photo"]["size"], len(self.content))
+        self.assertEqual(call.payload["reply_markup"], {"inline_keyboard": []})
+        self.assertEqual(TelegramFile.objects.get(kind=TelegramFile.Kind.PHOTO).file_id, f"file-{self.sha256}")
+
+    def test_unseekable_files_are_streamed_without_caching(self):
+        """Test that file-like objects that can only be read once are uploaded with chunked encoding."""
+        media.send_document(UnseekableFile(self.content), 1, filename="stream.bin")
+        call = self.server.get_calls("sendDocument")[0]
+        self.assertEqual(call.payload["document"]["sha256"], self.sha256)
+        self.assertFalse(TelegramFile.objects.exists())
+
+    def test_rejected_file_id_is_uploaded_again(self):
+        """Test that a cached file_id Telegram no longer accepts is replaced by a new upload."""
+        TelegramFile.objects.create(content_hash=self.sha256, kind="document", file_id="expired")
+        media.send_document(self.path, 1)
+        self.assertEqual([call.status_code for call in self.server.get_calls()], [400, 200])
+        self.assertEqual(TelegramFile.objects.get().file_id, f"file-{self.sha256}")
+
+    def test_other_errors_keep_the_cached_file_id(self):
+        """Test that a cached file_id is only replaced when Telegram rejects the file_id itself."""
+        TelegramFile.objects.create(content_hash=self.sha256, kind="document", file_id=f"file-{self.sha256}")
+        self.server.fail_next(400)
+        with self.assertRaises(requests.HTTPError):
+            media.send_document(self.path, 1)
+        self.assertEqual(len(self.server.get_calls()), 1)
+        self.assertTrue(TelegramFile.objects.exists())
+
+    def test_file_ids_and_urls_are_sent_as_is(self):
+        """Test that strings are sent as file_id or URL without uploading."""
+        media.send_photo("https://example.com/cat.jpg", 1)
+        self.assertEqual(self.server.get_calls()[0].payload["photo"], "https://example.com/cat.jpg")
+        with self.assertRaises(ValueError):
+            media.send_document(str(self.path), 1)
+        self.assertEqual(len(self.server.get_calls()), 1)
+
+    def test_media_is_sent_with_the_buffered_messages(self):
+        """Test that media sent while messages are buffered is sent in order with them, after the buffer is flushed."""
+        with bot.buffer_messages():
+            bot.send_message("Here is your report", 1)
+            with self.path.open("rb") as fileobj:
+                self.assertIsNone(media.send_document(fileobj, 1))
+            media.send_photo("https://example.com/cat.jpg", 1)
+            self.assertEqual(self.server.get_calls(), [])
+        methods = [call.method for call in self.server.get_calls()]
+        self.assertEqual(methods, ["sendMessage", "sendDocument", "sendPhoto"])
+        self.assertEqual(self.server.get_calls("sendDocument")[0].payload["document"]["filename"], "report.pdf")
+
+    def test_buffered_media_is_discarded_on_errors(self):
+        """Test that buffered media is not sent when handling the update fails."""
+        with self.assertRaises(RuntimeError), bot.buffer_messages():
+            media.send_document(self.path, 1)
+            raise RuntimeError
+        self.assertEqual(self.server.get_calls(), [])
+
+    def test_multipart_stream_reads_bounded_chunks(self):
+        """Test that the multipart body never reads more than CHUNK_SIZE bytes of a file at once."""
+        stream = media.MultipartStream({"chat_id": "1"}, {"document": ("a.bin", io.BytesIO(self.content), 256004)})
+        chunks = list(stream)
+        self.assertTrue(all(len(chunk) <= media.CHUNK_SIZE for chunk in chunks))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(stream))
+
+
+class DownloadTests(TestCase):
+    """Tests for downloading files users sent from the fake Bot API server."""
+
+    def setUp(self):
+        """Start a fake Bot API server with a file and point the default bot to it."""
+        self.server = FakeBotAPI()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        fake_bot_api = use_fake_bot_api(self.server)
+        fake_bot_api.__enter__()
+        self.addCleanup(fake_bot_api.__exit__, None, None, None)
+        resilience.get_circuit_breaker.cache_clear()
+        self.addCleanup(resilience.get_circuit_breaker.cache_clear)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = Path(tmpdir.name)
+        self.content = bytes(range(256)) * 1000
+        self.document = self.server.add_file(self.content, "documents/file_1.pdf")
+
+    def test_download_to_disk(self):
+        """Test that the file is written to the given path."""
+        path = media.download_file(self.document, self.tmpdir / "received.pdf")
+        self.assertEqual(Path(path).read_bytes(), self.content)
+        self.assertEqual(self.server.get_calls()[0].method, "getFile")
+
+    def test_download_to_file_object_and_storage(self):
+        """Test that the file can be written to a file-like object or saved in a Django storage."""
+        buffer = io.BytesIO()
+        media.download_file(self.document["file_id"], buffer)
+        self.assertEqual(buffer.getvalue(), self.content)
+
+        storage = FileSystemStorage(location=str(self.tmpdir))
+        name = media.download_file(self.document, "uploads/received.pdf", storage=storage)
+        with storage.open(name, "rb") as fileobj:
+            self.assertEqual(fileobj.read(), self.content)
+
+    def test_download_is_limited_in_size(self):
+        """Test that files larger than the maximum size are refused and partial files are removed."""
+        destination = self.tmpdir / "too-large.pdf"
+        with self.assertRaises(ValueError):
+            media.download_file(self.document, destination, max_size=1000)
+        file_info = {**media.get_file(self.document["file_id"]), "file_size": 0}  # Telegram did not report the size
+        with patch("django_telegram_app.bot.media.get_file", return_value=file_info):
+            with self.assertRaises(ValueError):
+                media.download_file(self.document, destination, max_size=1000)
+        self.assertFalse(destination.exists())
+
+    def test_download_in_background(self):
+        """Test that the file can be downloaded in a background thread."""
+        future = media.download_file_in_background(self.document, self.tmpdir / "received.pdf")
+        self.assertEqual(Path(future.result(timeout=5)).read_bytes(), self.content)
+
+    def test_telegram_update_with_files(self):
+        """Test that documents and the largest size of photos are exposed as the update's file."""
+        document_update = TelegramUpdate({"message": {"chat": {"id": 1}, "document": self.document, "caption": "Hi"}})
+        self.assertEqual(document_update.file, self.document)
+        self.assertEqual(document_update.message_text, "Hi")
+        photo_update = TelegramUpdate(
+            {"message": {"chat": {"id": 1}, "photo": [{"file_id": "small"}, {"file_id": "big"}]}}
+        )
+        self.assertEqual(photo_update.file, {"file_id": "big"})
+        self.assertFalse(photo_update.is_command())
@@ -0,0 +1,118 @@
+"""Tests for offloading slow step work."""
+
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from django_telegram_app import get_telegram_settings_model
+from django_telegram_app.bot import offload
+from django_telegram_app.bot.testing.testcases import TelegramBotTestCase
+from django_telegram_app.conf import settings
+from django_telegram_app.models import CallbackData, CallbackKeyboard
+from tests.testapps.samplebot.telegrambot.commands.report import count_primes
+
+
+class OffloadTests(TelegramBotTestCase):
+    """Tests for Step.offload and the offloaded decorator."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.telegram_setting = get_telegram_settings_model().objects.create(chat_id=123456789)
+
+    def setUp(self):
+        """Run the offloaded work inline."""
+        super().setUp()
+        patcher = patch.object(settings, "OFFLOAD_EXECUTOR", "inline")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_endpoints(self):
+        return [call.args[0] for call in self.fake_bot_post.call_args_list]
+
+    def test_offloaded_step_continues_with_its_result(self):
+        """Test that the result of the offloaded work is passed to the next step, which edits the working message."""
+        self.send_text("/report")
+        with self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+            self.click_on_button("Small")
+        self.assertEqual(self._get_endpoints(), ["sendMessage", "editMessageText", "sendChatAction", "editMessageText"])
+        working = self.fake_bot_post.call_args_list[1].kwargs["payload"]
+        self.assertEqual(working, {"chat_id": 123456789, "message_id": 123, "text": "Working…"})
+        self.assertEqual(self.last_bot_message, "There are 25 primes below 100.")
+        self.assertEqual(self.fake_bot_post.call_args.kwargs["payload"]["message_id"], 123)
+        self.assertEqual(CallbackData.objects.count(), 0)
+        self.assertFalse(CallbackKeyboard.objects.filter(correlation_key__isnull=False).exists())  # Only static ones
+
+    def test_result_is_read_past_the_callback_cache(self):
+        """Test that the next step receives the result when its callback data was cached before the work finished."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.send_text("/report")
+        with patch.object(settings, "CALLBACK_CACHE_TIMEOUT", 300):
+            with self.captureOnCommitCallbacks() as callbacks:  # type: ignore[reportAttributeAccessIssue]
+                self.click_on_button("Small")
+            for callback in reversed(callbacks):  # Write the cache before the job starts
+                callback()
+        self.assertEqual(self.last_bot_message, "There are 25 primes below 100.")
+
+    def test_work_starts_after_the_update_commits(self):
+        """Test that nothing is offloaded before the update's transaction commits."""
+        self.send_text("/report")
+        with self.captureOnCommitCallbacks() as callbacks:  # type: ignore[reportAttributeAccessIssue]
+            self.click_on_button("Large")
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self._get_endpoints(), ["sendMessage"])
+
+    def test_failed_work_sends_error_and_clears_callbacks(self):
+        """Test that the user is told when the offloaded work fails and the command's callback data is cleared."""
+        self.send_text("/report")
+        with patch("tests.testapps.samplebot.telegrambot.commands.report.count_primes", side_effect=ValueError):
+            with self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+                self.click_on_button("Small")
+        self.assertEqual(self.last_bot_message, "Something went wrong, please try again.")
+        self.assertEqual(CallbackData.objects.count(), 0)
+        self.assertFalse(CallbackKeyboard.objects.filter(correlation_key__isnull=False).exists())  # Only static ones
+
+    def test_thread_executor_runs_the_job_in_the_pool(self):
+        """Test that the thread executor submits the job to the offload thread pool."""
+        pool = MagicMock()
+        self.send_text("/report")
+        with patch.object(settings, "OFFLOAD_EXECUTOR", "thread"), patch.object(offload, "get_thread_pool") as get_pool:
+            get_pool.return_value = pool
+            with self.captureOnCommitCallbacks(execute=True):  # type: ignore[reportAttributeAccessIssue]
+                self.click_on_button("Small")
+        job = pool.submit.call_args.args[1]
+        self.assertEqual(pool.submit.call_args.args[0], offload._run_in_thread)  # pylint: disable=protected-access
+        self.assertEqual((job.chat_id, job.message_id, job.result_key), (123456789, 123, "result"))
+
+    def test_invalid_executor(self):
+        """Test that an unknown executor is reported."""
+        with patch.object(settings, "OFFLOAD_EXECUTOR", "fibers"), self.assertRaises(ImproperlyConfigured):
+            offload.submit(MagicMock())
+
+
+class OffloadExecutorTests(SimpleTestCase):
+    """Tests for the offload executors."""
+
+    def test_process_executor(self):
+        """Test that the process executor runs the call in another process while chat actions are sent."""
+        job = offload.OffloadJob(
+            bot_name="default",
+            chat_id=1,
+            message_id=0,
+            language_code=None,
+            token="token",
+            result_key="result",
+            working_text="Working…",
+            error_text="Error",
+            fn=count_primes,
+            args=(100,),
+        )
+        self.addCleanup(offload.get_process_pool.cache_clear)
+        self.addCleanup(lambda: offload.get_process_pool().shutdown())
+        with patch.object(settings, "OFFLOAD_EXECUTOR", "process"), patch("django_telegram_app.bot.bot.post") as post:
+            result = offload._call_with_chat_actions(job)  # pylint: disable=protected-access
+        self.assertEqual(result, 25)
+        post.assert_called_with("sendChatAction", payload={"chat_id": 1, "action": "typing"})
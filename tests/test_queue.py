@@ -0,0 +1,156 @@
+"""Tests for the queue module and the runworkers command."""
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_telegram_app import get_telegram_settings_model, queue
+from django_telegram_app.bot.testing.testcases import TelegramBotTestCase
+from django_telegram_app.conf import settings
+from django_telegram_app.models import Message
+
+
+class QueueTests(TelegramBotTestCase):
+    """Tests for the queue module and the runworkers command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.telegram_setting = get_telegram_settings_model().objects.create(chat_id=123456789)
+
+    def test_webhook_only_enqueues_when_queue_updates_enabled(self):
+        """Test that the webhook persists a pending message without handling it."""
+        with patch.object(settings, "QUEUE_UPDATES", True):
+            self.send_text("/poll")
+        self.fake_bot_post.assert_not_called()
+        message = Message.objects.get()
+        self.assertEqual(message.status, Message.Status.PENDING)
+
+    def test_webhook_records_status_when_handling_inline(self):
+        """Test that the webhook records the outcome when updates are handled inline."""
+        self.send_text("/poll")
+        self.assertEqual(Message.objects.get().status, Message.Status.PROCESSED)
+
+    def _construct_update(self, message_text: str, chat_id: int) -> dict:
+        update = self.construct_telegram_update(message_text)
+        update["message"]["chat"]["id"] = chat_id
+        return update
+
+    def test_claim_batch_claims_pending_messages_once(self):
+        """Test that claimed messages are marked as processing and are not claimed again."""
+        for chat_id in range(3):
+            queue.enqueue(self._construct_update("/poll", chat_id))
+        batch = queue.claim_batch(2)
+        self.assertEqual(len(batch), 2)
+        self.assertTrue(all(message.status == Message.Status.PROCESSING for message in batch))
+        self.assertTrue(all(message.attempts == 1 for message in batch))
+        self.assertEqual(len(queue.claim_batch(10)), 1)
+        self.assertEqual(queue.claim_batch(10), [])
+
+    def test_release_stale(self):
+        """Test that stale claims are released or failed depending on the number of attempts."""
+        queue.enqueue(self._construct_update("/poll", 1))
+        queue.enqueue(self._construct_update("/echo", 2))
+        retry, abandon = queue.claim_batch(2)
+        Message.objects.filter(pk=abandon.pk).update(attempts=settings.QUEUE_MAX_ATTEMPTS)
+        Message.objects.update(claimed_at=timezone.now() - timedelta(seconds=settings.QUEUE_CLAIM_TIMEOUT + 1))
+
+        self.assertEqual(queue.release_stale(), 2)
+        retry.refresh_from_db()
+        abandon.refresh_from_db()
+        self.assertEqual(retry.status, Message.Status.PENDING)
+        self.assertEqual(abandon.status, Message.Status.FAILED)
+
+    def test_claim_batch_keeps_the_order_of_a_chat(self):
+        """Test that a chat's next message is only claimed once the message before it is no longer processing."""
+        first = queue.enqueue(self._construct_update("/poll", 1))
+        second = queue.enqueue(self._construct_update("/echo", 1))
+        other = queue.enqueue(self._construct_update("/poll", 2))
+        self.assertEqual([message.pk for message in queue.claim_batch(10)], [first.pk, other.pk])
+        self.assertEqual(queue.claim_batch(10), [])
+        Message.objects.filter(pk=first.pk).update(status=Message.Status.PROCESSED)
+        self.assertEqual([message.pk for message in queue.claim_batch(10)], [second.pk])
+
+    def test_claims_are_renewed_per_message(self):
+        """Test that a message of a batch is only handled if its claim was not released before its turn came."""
+        queue.enqueue(self._construct_update("/poll", 1))
+        queue.enqueue(self._construct_update("/echo", 2))
+        first, second = queue.claim_batch(2)
+        stale = timezone.now() - timedelta(seconds=settings.QUEUE_CLAIM_TIMEOUT + 1)
+        Message.objects.update(claimed_at=stale)
+        first.claimed_at = second.claimed_at = stale
+
+        self.assertTrue(queue.renew_claim(first))
+        self.assertEqual(queue.release_stale(), 1)  # Only the second message is still stale
+        self.assertEqual(queue.claim_batch(10), [second])  # Claimed by another worker
+        self.assertFalse(queue.renew_claim(second))
+
+    def test_runworkers_once(self):
+        """Test that runworkers handles all pending updates and records the outcome."""
+        queue.enqueue(self.construct_telegram_update("/poll"))
+        queue.enqueue({"unsupported": "update"})
+        out = StringIO()
+        call_command("runworkers", "--once", stdout=out)
+        self.assertIn("Processed 1 updates, 1 failed.", out.getvalue())
+        self.assertEqual(self.last_bot_message, "What is your favourite sport?")
+        failed = Message.objects.get(status=Message.Status.FAILED)
+        self.assertIn("Unsupported Telegram update format", str(failed.error))
+
+    def test_reprocessfailed(self):
+        """Test that failed updates are handled again per chat in order and their error is cleared on success."""
+        first = Message.objects.create(
+            raw_message=self.construct_telegram_update("/poll"), status=Message.Status.FAILED, error="boom"
+        )
+        Message.objects.create(raw_message={"unsupported": "update"}, status=Message.Status.FAILED, error="boom")
+        second = Message.objects.create(
+            raw_message=self.construct_telegram_update("/echo"), status=Message.Status.FAILED, error="boom"
+        )
+        Message.objects.create(raw_message=self.construct_telegram_update("/poll"), status=Message.Status.PROCESSED)
+
+        handled = []
+        process_message = queue.process_message
+        with patch(
+            "django_telegram_app.queue.process_message",
+            side_effect=lambda message: handled.append(message.pk) or process_message(message),
+        ):
+            out = StringIO()
+            call_command("reprocessfailed", "--workers=1", "--progress-every=1", stdout=out)
+
+        self.assertIn("Reprocessed 1/3 updates.", out.getvalue())
+        self.assertIn("Reprocessed 3 updates, 2 succeeded, 1 failed again.", out.getvalue())
+        self.assertLess(handled.index(first.pk), handled.index(second.pk))
+        first.refresh_from_db()
+        self.assertEqual(first.status, Message.Status.PROCESSED)
+        self.assertIsNone(first.error)
+        self.assertEqual(Message.objects.filter(status=Message.Status.FAILED).count(), 1)
+
+    def test_reprocess_failed_stops_a_chat_that_fails_again(self):
+        """Test that the later messages of a chat are left failed when an earlier message of the chat fails again."""
+        first = Message.objects.create(
+            raw_message=self.construct_telegram_update("/poll"), status=Message.Status.FAILED, error="boom"
+        )
+        second = Message.objects.create(
+            raw_message=self.construct_telegram_update("/echo"), status=Message.Status.FAILED, error="boom"
+        )
+
+        with patch("django_telegram_app.bot.bot.handle_update", side_effect=RuntimeError("boom again")) as handle:
+            self.assertEqual(queue.reprocess_failed(Message.objects.all()), (0, 1))
+        handle.assert_called_once_with(first.raw_message, bot_name=first.bot)
+        second.refresh_from_db()
+        self.assertEqual(second.status, Message.Status.FAILED)
+        self.assertEqual(second.error, "boom")
+
+    def test_reprocess_failed_skips_claimed_messages(self):
+        """Test that messages that are no longer failed when their turn comes are skipped."""
+        Message.objects.create(
+            raw_message=self.construct_telegram_update("/poll"), status=Message.Status.FAILED, error="boom"
+        )
+
+        def claim_everything(done, total):  # noqa: ARG001  # pylint: disable=unused-argument
+            Message.objects.update(status=Message.Status.PROCESSING)
+
+        self.assertEqual(queue.reprocess_failed(Message.objects.all(), progress=claim_everything), (1, 0))
+        self.assertEqual(queue.reprocess_failed(Message.objects.all()), (0, 0))
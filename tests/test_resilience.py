@@ -0,0 +1,147 @@
+"""Tests for the resilience module."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.test import SimpleTestCase
+
+from django_telegram_app.bot import resilience
+from django_telegram_app.bot.resilience import CircuitBreaker, CircuitOpenError, RateLimiter
+from django_telegram_app.conf import settings
+
+
+def _response(status_code: int, json_data: dict | None = None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(json_data or {}).encode()
+    return response
+
+
+class ResilienceTests(SimpleTestCase):
+    """Tests for the resilience module."""
+
+    def setUp(self):
+        """Reset the circuit breakers and avoid actually sleeping."""
+        resilience.get_circuit_breaker.cache_clear()
+        self.addCleanup(resilience.get_circuit_breaker.cache_clear)
+        self.fake_sleep = patch("django_telegram_app.bot.resilience.time.sleep").start()
+        self.addCleanup(patch.stopall)
+
+    def test_transient_errors_are_retried(self):
+        """Test that transient status codes are retried until the call succeeds."""
+        send = MagicMock(side_effect=[_response(502), _response(503), _response(200)])
+        response = resilience.call("sendMessage", send)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(send.call_count, 3)
+        send.assert_called_with(5)
+        self.assertEqual(self.fake_sleep.call_count, 2)
+
+    def test_retries_are_bounded(self):
+        """Test that the last error is raised once the retries are exhausted."""
+        send = MagicMock(side_effect=requests.ConnectionError("unreachable"))
+        with self.assertRaises(requests.ConnectionError):
+            resilience.call("sendMessage", send)
+        self.assertEqual(send.call_count, 1 + resilience.DEFAULT_API_POLICY["RETRIES"])
+
+    def test_too_many_requests_waits_for_retry_after(self):
+        """Test that a 429 response is retried after its retry_after parameter."""
+        too_many_requests = _response(429, {"ok": False, "parameters": {"retry_after": 3}})
+        send = MagicMock(side_effect=[too_many_requests, _response(200)])
+        resilience.call("sendMessage", send)
+        self.fake_sleep.assert_called_once_with(3.0)
+
+    def test_client_errors_and_read_timeouts_are_not_retried(self):
+        """Test that non-transient errors and read timeouts are raised immediately."""
+        for error in [_response(400), requests.ReadTimeout("slow")]:
+            send = MagicMock(side_effect=[error])
+            with self.assertRaises((requests.HTTPError, requests.ReadTimeout)):
+                resilience.call("sendMessage", send)
+            self.assertEqual(send.call_count, 1)
+
+    def test_policy_per_api_method(self):
+        """Test that the policy of an API method overrides the defaults."""
+        policies = {"default": {"RETRIES": 0}, "sendMessage": {"TIMEOUT": 2}}
+        with patch.object(settings, "API_POLICIES", policies):
+            self.assertEqual(resilience.get_policy("sendMessage")["RETRIES"], 0)
+            self.assertEqual(resilience.get_policy("sendMessage")["TIMEOUT"], 2)
+            self.assertEqual(resilience.get_policy("editMessageText")["TIMEOUT"], 5)
+
+    def test_open_circuit_fails_fast(self):
+        """Test that calls are refused once the failure threshold is reached."""
+        with patch.object(settings, "API_POLICIES", {"default": {"RETRIES": 0, "FAILURE_THRESHOLD": 2}}):
+            send = MagicMock(side_effect=requests.ConnectionError("unreachable"))
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    resilience.call("sendMessage", send)
+            with self.assertRaises(CircuitOpenError):
+                resilience.call("sendMessage", send)
+        self.assertEqual(send.call_count, 2)
+
+    def test_too_many_requests_do_not_open_the_circuit(self):
+        """Test that flood limits are retried but never count as a failure of the API."""
+        too_many_requests = _response(429, {"ok": False, "parameters": {"retry_after": 1}})
+        with patch.object(settings, "API_POLICIES", {"default": {"RETRIES": 1, "FAILURE_THRESHOLD": 1}}):
+            send = MagicMock(return_value=too_many_requests)
+            for _ in range(2):
+                with self.assertRaises(requests.HTTPError):
+                    resilience.call("sendMessage", send)
+            self.assertEqual(send.call_count, 4)
+        self.assertFalse(resilience.get_circuit_breaker("sendMessage").is_open)
+
+    def test_circuits_are_kept_per_bot(self):
+        """Test that the failures of one bot do not open the circuit of another bot."""
+        with patch.object(settings, "API_POLICIES", {"default": {"RETRIES": 0, "FAILURE_THRESHOLD": 1}}):
+            with self.assertRaises(requests.ConnectionError):
+                resilience.call("sendMessage", MagicMock(side_effect=requests.ConnectionError("unreachable")), "other")
+            with self.assertRaises(CircuitOpenError):
+                resilience.call("sendMessage", MagicMock(), "other")
+            response = resilience.call("sendMessage", MagicMock(return_value=_response(200)))
+        self.assertEqual(response.status_code, 200)
+
+    def test_retries_continue_when_the_circuit_opens(self):
+        """Test that a call that was let through uses its retries even if its failures open the circuit."""
+        error = requests.ConnectionError("unreachable")
+        send = MagicMock(side_effect=[error, error, _response(200)])
+        with patch.object(settings, "API_POLICIES", {"default": {"RETRIES": 2, "FAILURE_THRESHOLD": 1}}):
+            self.assertEqual(resilience.call("sendMessage", send).status_code, 200)
+        self.assertEqual(send.call_count, 3)
+        self.assertFalse(resilience.get_circuit_breaker("sendMessage").is_open)
+
+    def test_circuit_breaker_probes_for_recovery(self):
+        """Test that a single probe is allowed after the recovery timeout and closes the breaker on success."""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        with patch("django_telegram_app.bot.resilience.time.monotonic", return_value=100):
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+        with patch("django_telegram_app.bot.resilience.time.monotonic", return_value=131):
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())  # Only one probe at a time
+            breaker.record_success()
+            self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.is_open)
+
+    def test_probe_ending_without_a_verdict_does_not_block_the_circuit(self):
+        """Test that probes answered with a client error or raising an unexpected error release the circuit."""
+        policies = {"default": {"RETRIES": 0, "FAILURE_THRESHOLD": 1, "RECOVERY_TIMEOUT": 30}}
+        monotonic = patch("django_telegram_app.bot.resilience.time.monotonic", return_value=100).start()
+        with patch.object(settings, "API_POLICIES", policies):
+            for probe_error, expected_exception in [
+                (ValueError("bug"), ValueError),
+                (_response(400), requests.HTTPError),
+            ]:
+                with self.assertRaises(requests.ConnectionError):
+                    resilience.call("sendMessage", MagicMock(side_effect=requests.ConnectionError("unreachable")))
+                monotonic.return_value += 31
+                with self.assertRaises(expected_exception):
+                    resilience.call("sendMessage", MagicMock(side_effect=[probe_error]))
+                response = resilience.call("sendMessage", MagicMock(return_value=_response(200)))
+                self.assertEqual(response.status_code, 200)
+
+    def test_rate_limiter_spaces_out_calls(self):
+        """Test that the rate limiter waits so calls are spaced by the interval."""
+        limiter = RateLimiter(rate=4)
+        with patch("django_telegram_app.bot.resilience.time.monotonic", return_value=100):
+            for _ in range(3):
+                limiter.wait()
+        self.assertEqual([call.args[0] for call in self.fake_sleep.call_args_list], [0.25, 0.5])
@@ -0,0 +1,130 @@
+"""Tests for routing reads to read replicas."""
+
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from django_telegram_app import get_telegram_settings_model, routers
+from django_telegram_app.bot.testing.testcases import TelegramBotTestCase
+from django_telegram_app.conf import settings
+from django_telegram_app.models import CallbackData, Message
+
+
+class RecordingReplicaRouter(routers.ReplicaRouter):
+    """Replica router that records where the reads of the bot's tables went."""
+
+    def __init__(self):
+        """Initialize the router without any reads."""
+        self.reads = []
+
+    def db_for_read(self, model, **hints):
+        """Record the replica chosen for the read, or "primary"."""
+        database = super().db_for_read(model, **hints)
+        state = routers._chat.get()
+        if routers._is_routed(model):
+            from_replica = database is not None and state is not None and not state.pinned
+            self.reads.append((model._meta.model_name, database if from_replica else "primary"))
+        return database
+
+
+class ReplicaRouterTests(TelegramBotTestCase):
+    """Tests for the ReplicaRouter."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        get_telegram_settings_model().objects.create(chat_id=123456789)
+
+    def setUp(self):
+        """Install the router, with the default database standing in for the replica."""
+        super().setUp()
+        self.router = RecordingReplicaRouter()
+        routers_override = override_settings(DATABASE_ROUTERS=[self.router])
+        routers_override.enable()
+        self.addCleanup(routers_override.disable)
+        patcher = patch.object(settings, "REPLICA_DATABASES", ["default"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_reads_go_to_the_primary_after_the_chat_wrote(self):
+        """Test that a chat reads from the replicas until it writes, and from the primary afterwards."""
+        self.send_text("hello")
+        self.assertEqual(self.router.reads, [("telegramsettings", "default")])
+        self.assertFalse(routers.is_pinned(123456789))
+
+        self.send_text("/poll")
+        self.assertTrue(routers.is_pinned(123456789))
+        self.router.reads.clear()
+        self.click_on_button("🏓 Ping Pong")
+        self.assertTrue(self.router.reads)
+        self.assertEqual({database for _model, database in self.router.reads}, {"primary"})
+
+    def test_writes_outside_a_unit_of_work_pin_the_chat(self):
+        """Test that writes made without a unit of work pin the chat as well."""
+        with patch.object(settings, "ATOMIC_UPDATES", False):
+            self.send_text("/poll")
+            self.router.reads.clear()
+            self.click_on_button("🏓 Ping Pong")
+        self.assertEqual({database for _model, database in self.router.reads}, {"primary"})
+
+    def test_routing(self):
+        """Test that only the bot's tables are routed, only while an update is handled, and only until a write."""
+        router = routers.ReplicaRouter()
+        with patch.object(settings, "REPLICA_DATABASES", ["replica"]):
+            self.assertIsNone(router.db_for_read(CallbackData))
+            self.assertEqual(router.db_for_write(CallbackData), "default")
+            with routers.use_chat(1):
+                self.assertEqual(router.db_for_read(CallbackData), "replica")
+                self.assertIsNone(router.db_for_read(Message))
+                self.assertIsNone(router.db_for_write(Message))
+                # Opening a transaction is not a write
+                self.assertEqual(router.db_for_write(CallbackData, transaction=True), "default")
+                self.assertEqual(router.db_for_read(CallbackData), "replica")
+            with routers.use_chat(2):
+                self.assertEqual(router.db_for_write(CallbackData), "default")
+                self.assertEqual(router.db_for_read(CallbackData), "default")
+        self.assertFalse(routers.is_pinned(1))
+        self.assertTrue(routers.is_pinned(2))
+
+    def test_router_is_disabled_without_replicas(self):
+        """Test that all reads go to the primary when REPLICA_DATABASES is empty."""
+        with patch.object(settings, "REPLICA_DATABASES", []):
+            self.send_text("/poll")
+        self.assertEqual({database for _model, database in self.router.reads}, {"primary"})
+
+
+class ReplicaDatabaseTests(TestCase):
+    """Tests for the ReplicaRouter with a replica that is a separate database."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        """Install the router with the replica."""
+        super().setUp()
+        routers_override = override_settings(DATABASE_ROUTERS=[routers.ReplicaRouter()])
+        routers_override.enable()
+        self.addCleanup(routers_override.disable)
+        patcher = patch.object(settings, "REPLICA_DATABASES", ["replica"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_instances_read_from_the_replica_are_saved_to_the_primary(self):
+        """Test that telegram settings read from the replica are written to the primary database."""
+        model = get_telegram_settings_model()
+        primary = model.objects.using("default").create(chat_id=123456789)
+        model.objects.using("replica").create(pk=primary.pk, chat_id=123456789)
+
+        with routers.use_chat(123456789):
+            telegram_settings = model.objects.get(chat_id=123456789)
+            self.assertEqual(telegram_settings._state.db, "replica")
+            telegram_settings.data = {"_waiting_for": "poll"}
+            telegram_settings.save()
+            self.assertTrue(routers.is_pinned(123456789))
+
+        self.assertEqual(model.objects.using("default").get(pk=primary.pk).data, {"_waiting_for": "poll"})
+        self.assertEqual(model.objects.using("replica").get(pk=primary.pk).data, {})
@@ -0,0 +1,54 @@
+"""Tests for warming up worker processes."""
+
+from unittest.mock import patch
+
+from django.apps import apps
+from django.test import SimpleTestCase, override_settings
+
+from django_telegram_app.bot import get_commands, warmup
+from django_telegram_app.conf import settings
+
+
+class WarmupTests(SimpleTestCase):
+    """Tests for the warmup entry point."""
+
+    def setUp(self):
+        """Fake the Bot API."""
+        patcher = patch("django_telegram_app.bot.bot.post")
+        self.fake_bot_post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_warmup_runs_and_times_all_phases(self):
+        """Test that every phase runs, the commands are discovered and every bot connects."""
+        get_commands.cache_clear()
+        with self.assertLogs(level="INFO") as logs:
+            timings = warmup.warmup()
+        self.assertEqual(list(timings), ["commands", "imports", "translations", "help", "http"])
+        self.assertTrue(all(seconds >= 0 for seconds in timings.values()))
+        self.assertEqual(get_commands.cache_info().currsize, 1)
+        self.assertEqual(self.fake_bot_post.call_count, len(settings.get_bots()))
+        self.assertIn("Warmed up: commands", logs.output[-1])
+
+    def test_failing_phases_are_logged_and_skipped(self):
+        """Test that a failing phase does not stop the other phases."""
+        with (
+            patch("django_telegram_app.bot.bot.get_help_text", side_effect=RuntimeError("Simulated error")),
+            self.assertLogs(level="ERROR") as logs,
+        ):
+            timings = warmup.warmup(connect=False)
+        self.assertEqual(list(timings), ["commands", "imports", "translations", "help"])
+        self.assertIn("Warm-up phase help failed", logs.output[0])
+        self.fake_bot_post.assert_not_called()
+
+    @override_settings(LANGUAGES=[("en", "English"), ("nl", "Dutch")])
+    def test_languages(self):
+        """Test that the configured languages are warmed up, or the default language if none are configured."""
+        self.assertEqual(warmup.get_languages(), [None, "en", "nl"])
+        with override_settings(USE_I18N=False):
+            self.assertEqual(warmup.get_languages(), [None])
+
+    def test_warmup_on_ready(self):
+        """Test that the app warms up without connecting when WARMUP_ON_READY is enabled."""
+        with patch.object(settings, "WARMUP_ON_READY", True), patch.object(warmup, "warmup") as fake_warmup:
+            apps.get_app_config("django_telegram_app").ready()
+        fake_warmup.assert_called_once_with(connect=False)
@@ -1,7 +1,7 @@
 """Poll command for the sample bot."""
 
 from django_telegram_app.bot import bot
-from django_telegram_app.bot.base import BaseBotCommand, Step, TelegramUpdate
+from django_telegram_app.bot.base import BaseBotCommand, PaginatedChoiceStep, Step, TelegramUpdate
 
 
 class Command(BaseBotCommand):
@@ -15,30 +15,13 @@ class Command(BaseBotCommand):
         return [AskFavouriteSport(self), Confirm(self), Respond(self)]
 
 
-class AskFavouriteSport(Step):
+class AskFavouriteSport(PaginatedChoiceStep):
     """Ask favourite sport step."""
 
-    def handle(self, telegram_update: TelegramUpdate):
-        """Handle the step."""
-        data = self.get_callback_data(telegram_update)
-        current_page: int = data.get("current_page", 1)
-        start = (current_page - 1) * 3
-        end = start + 3
-        data.pop("favourite_sport", None)  # Remove any previous selection
-        options = self.get_possible_answers()
-        keyboard = [
-            [{"text": text, "callback_data": self.next_step_callback(data, favourite_sport=value)}]
-            for text, value in options[start:end]
-        ]
-        self._maybe_add_pagination_buttons(keyboard, options, data, current_page, end=end)
-        bot.send_message(
-            "What is your favourite sport?",
-            self.command.settings.chat_id,
-            reply_markup={"inline_keyboard": keyboard},
-            message_id=telegram_update.message_id,
-        )
+    choice_key = "favourite_sport"
+    page_size = 3
 
-    def get_possible_answers(self):
+    def get_choices(self, data):  # noqa: ARG002  # pylint: disable=unused-argument
         """Get the possible options for the poll command."""
         return [
             ("🏓 Ping Pong", "Ping Pong"),
@@ -49,13 +32,9 @@ class AskFavouriteSport(Step):
             ("🏒 Hockey", "Hockey"),
         ]
 
-    def _maybe_add_pagination_buttons(self, keyboard: list, days: list, data: dict, current_page: int, end: int):
-        if current_page > 1:
-            back_callback = self.current_step_callback(data, current_page=current_page - 1)
-            keyboard.append([{"text": "⬅️ Back", "callback_data": back_callback}])
-        if len(days) > end:
-            next_callback = self.current_step_callback(data, current_page=current_page + 1)
-            keyboard.append([{"text": "➡️ Next", "callback_data": next_callback}])
+    def get_text(self, data):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Return the question."""
+        return "What is your favourite sport?"
 
 
 class Confirm(Step):
@@ -0,0 +1,59 @@
+"""Report command for the sample bot."""
+
+from django_telegram_app.bot import bot
+from django_telegram_app.bot.base import BaseBotCommand, StaticKeyboard, Step, TelegramUpdate, offloaded
+
+
+def count_primes(limit: int) -> int:
+    """Count the primes below the limit, slowly."""
+    return sum(all(number % divisor for divisor in range(2, number)) for number in range(2, limit))
+
+
+class Command(BaseBotCommand):
+    """Report command."""
+
+    description = "Builds a report in the background."
+
+    @property
+    def steps(self):
+        """Return the steps of the command."""
+        return [AskSize(self), BuildReport(self), ShowReport(self)]
+
+
+class AskSize(Step):
+    """Ask size step, the sizes are the same for every chat."""
+
+    def build_static_keyboard(self, keyboard: StaticKeyboard):
+        """Add the sizes to the keyboard."""
+        keyboard.add_row(keyboard.next_step_button("Small", limit=100), keyboard.next_step_button("Large", limit=1000))
+
+    def handle(self, telegram_update: TelegramUpdate):  # noqa: ARG002  # pylint: disable=unused-argument
+        """Handle the step."""
+        bot.send_message(
+            "How large should the report be?",
+            self.command.settings.chat_id,
+            reply_markup=self.get_static_reply_markup(),
+        )
+
+
+class BuildReport(Step):
+    """Build report step, the report is built in the offload executor."""
+
+    @offloaded
+    def handle(self, data):
+        """Count the primes below the chosen limit."""
+        return count_primes(data["limit"])
+
+
+class ShowReport(Step):
+    """Show report step."""
+
+    def handle(self, telegram_update: TelegramUpdate):
+        """Handle the step."""
+        data = self.get_callback_data(telegram_update)
+        bot.send_message(
+            f"There are {data['result']} primes below {data['limit']}.",
+            self.command.settings.chat_id,
+            message_id=telegram_update.message_id,
+        )
+        self.command.next_step(self.name, telegram_update)
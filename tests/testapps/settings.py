@@ -16,7 +16,10 @@ INSTALLED_APPS = [
     "tests.testapps.samplebot",  # tiny sample app
 ]
 
-DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+DATABASES = {
+    "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+    "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},  # Used by the router tests only
+}
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
@@ -49,4 +52,11 @@ TELEGRAM = {
     "ROOT_URL": "telegram/",
     "WEBHOOK_URL": "webhook",
     "WEBHOOK_TOKEN": "test-webhook-token",
+    "BOTS": {
+        "echobot": {
+            "BOT_URL": "https://api.telegram.org/bot456:def/",
+            "WEBHOOK_TOKEN": "echobot-webhook-token",
+            "COMMANDS": ["echo"],
+        },
+    },
 }